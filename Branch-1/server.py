@@ -1,12 +1,19 @@
 import socket
 import argparse
+import asyncio
 import sys
+from supervisor import Supervisor
+
+# Counters kept in `server.stats` (summed over workers by the supervisor)
+STATS_KEYS = ("connections", "requests", "errors")
 
 class HelloServer:
-    def __init__(self, host="127.0.0.1", port=-1, bufsize=4096):
+    def __init__(self, host="127.0.0.1", port=-1, bufsize=4096, reuse_port=False, stats=None):
         self.host = host
         self.port = port
         self.bufsize = bufsize
+        self.reuse_port = reuse_port
+        self.stats = stats if stats is not None else dict.fromkeys(STATS_KEYS, 0)
         self.sock = None
 
     def start(self):
@@ -15,6 +22,9 @@ class HelloServer:
             sys.exit(1)
 
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as self.sock:
+            if self.reuse_port:
+                # Several worker processes share the port; the kernel spreads connections over them
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             self.sock.bind((self.host, self.port))
             self.sock.listen()
             print(f"Server listening on {self.host} : {self.port}")
@@ -23,31 +33,122 @@ class HelloServer:
                 conn, addr = self.sock.accept()
                 with conn: 
                     print(f"Connected by {addr}")
+                    self.stats["connections"] += 1
                     conn.settimeout(2.0)
                     try:
                         data = conn.recv(self.bufsize + 1)
                     except socket.timeout:
                         print("Connection timed out")
+                        self.stats["errors"] += 1
                         conn.sendall(b"Empty message")
                         continue
 
                     if not data:
+                        self.stats["errors"] += 1
                         conn.sendall(b"Empty message")
                     elif len(data) > self.bufsize:
+                        self.stats["errors"] += 1
                         conn.sendall(b"ERROR: message too long")
                     else: 
-                        msg = data.decode("utf-8")
+                        try:
+                            msg = data.decode("utf-8")
+                        except UnicodeDecodeError:
+                            self.stats["errors"] += 1
+                            conn.sendall(b"ERROR: message is not valid UTF-8")
+                            continue
                         response = f"Hello, {msg}"
+                        self.stats["requests"] += 1
                         conn.sendall(response.encode("utf-8"))
 
     def stop(self):
         if self.sock:
             self.sock.close()
 
+class AsyncHelloServer:
+    """
+    asyncio variant of HelloServer: every connection is a coroutine on one
+    event loop, so a slow client no longer holds up the others.
+    Replies are the same as HelloServer's.
+    """
+    def __init__(self, host="127.0.0.1", port=-1, bufsize=4096, backlog=1024, reuse_port=False,
+                 stats=None):
+        self.host = host
+        self.port = port
+        self.bufsize = bufsize
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.stats = stats if stats is not None else dict.fromkeys(STATS_KEYS, 0)
+        self.server = None
+
+    def start(self):
+        if self.port == -1:
+            print("Error: Port not set. Use --port <number>.")
+            sys.exit(1)
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.server = await asyncio.start_server(
+            self.handle, self.host, self.port, backlog=self.backlog, reuse_address=True,
+            reuse_port=self.reuse_port or None
+        )
+        print(f"Server listening on {self.host} : {self.port}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle(self, reader, writer):
+        self.stats["connections"] += 1
+        try:
+            try:
+                data = await asyncio.wait_for(reader.read(self.bufsize + 1), 2.0)
+            except asyncio.TimeoutError:
+                print("Connection timed out")
+                data = b""
+
+            if not data:
+                self.stats["errors"] += 1
+                writer.write(b"Empty message")
+            elif len(data) > self.bufsize:
+                self.stats["errors"] += 1
+                writer.write(b"ERROR: message too long")
+            else:
+                try:
+                    msg = data.decode("utf-8")
+                except UnicodeDecodeError:
+                    self.stats["errors"] += 1
+                    writer.write(b"ERROR: message is not valid UTF-8")
+                else:
+                    response = f"Hello, {msg}"
+                    self.stats["requests"] += 1
+                    writer.write(response.encode("utf-8"))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def stop(self):
+        if self.server:
+            self.server.close()
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Hello Server")
     parser.add_argument("--port", type=int, default=-1, help="Port number to bind the server on")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Serve all connections concurrently on an asyncio event loop")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes sharing the port via SO_REUSEPORT")
+    parser.add_argument("--stats-interval", type=float, default=10.0,
+                        help="Seconds between aggregated stats lines (with --workers)")
     args = parser.parse_args()
 
-    server = HelloServer(port=args.port)
-    server.start()
+    def make_server(worker=None, stats=None):
+        cls = AsyncHelloServer if args.use_async else HelloServer
+        return cls(port=args.port, reuse_port=worker is not None, stats=stats)
+
+    if args.workers > 1:
+        if args.port == -1:
+            print("Error: Port not set. Use --port <number>.")
+            sys.exit(1)
+        Supervisor(make_server, args.workers, STATS_KEYS, interval=args.stats_interval).run()
+    else:
+        make_server().start()
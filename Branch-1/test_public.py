@@ -3,6 +3,7 @@ import unittest
 import subprocess
 import time
 import socket
+import asyncio
 
 # add assignment folder to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
@@ -58,3 +59,91 @@ class TestHelloSockets(unittest.TestCase):
         reply = cli.send_and_receive(long_msg)
         self.assertEqual(reply, "ERROR: message too long")
 
+
+ASYNC_PORT = PORT + 1
+CONCURRENCY = 1000
+
+async def _one_request(port, message):
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write(message.encode("utf-8"))
+    await writer.drain()
+    reply = await reader.read(BUF)
+    writer.close()
+    return reply.decode("utf-8"), time.perf_counter() - start
+
+async def _load(port, clients):
+    """Fire `clients` concurrent requests; return (replies, sorted latencies)."""
+    results = await asyncio.gather(*(_one_request(port, f"client{i}") for i in range(clients)))
+    return [r for r, _ in results], sorted(t for _, t in results)
+
+class TestAsyncHelloServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = subprocess.Popen(
+            ["python3", "server.py", "--port", str(ASYNC_PORT), "--async"]
+        )
+        time.sleep(0.5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+
+    # 6. Same replies as the blocking server
+    def test_async_echo(self):
+        cli = HelloClient(HOST, ASYNC_PORT, BUF)
+        self.assertEqual(cli.send_and_receive("World"), "Hello, World")
+        self.assertEqual(cli.send_and_receive("A" * (BUF + 1)), "ERROR: message too long")
+        with socket.create_connection((HOST, ASYNC_PORT)) as s:
+            s.sendall(b"\xff\xfe")
+            self.assertEqual(s.recv(BUF), b"ERROR: message is not valid UTF-8")
+
+    # 7. A silent client does not block the others
+    def test_slow_client_does_not_stall(self):
+        idle = socket.create_connection((HOST, ASYNC_PORT))
+        try:
+            start = time.perf_counter()
+            reply = HelloClient(HOST, ASYNC_PORT, BUF).send_and_receive("fast")
+            self.assertEqual(reply, "Hello, fast")
+            self.assertLess(time.perf_counter() - start, 1.0)
+        finally:
+            idle.close()
+
+    # 8. Load: 1k concurrent clients, report p50/p99 latency
+    def test_concurrent_load(self):
+        replies, lat = asyncio.run(_load(ASYNC_PORT, CONCURRENCY))
+        self.assertEqual(replies, [f"Hello, client{i}" for i in range(CONCURRENCY)])
+        p50, p99 = lat[len(lat) // 2], lat[int(len(lat) * 0.99)]
+        print(f"\n{CONCURRENCY} concurrent clients: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
+        self.assertLess(p99, 5.0)
+
+
+WORKERS_PORT = PORT + 2
+
+class TestWorkers(unittest.TestCase):
+    # 9. --workers: requests are served by several processes, crashed workers restart
+    def test_workers_restart(self):
+        proc = subprocess.Popen(
+            ["python3", "server.py", "--port", str(WORKERS_PORT), "--async", "--workers", "2"],
+            stdout=subprocess.PIPE, text=True
+        )
+        try:
+            time.sleep(0.5)
+            cli = HelloClient(HOST, WORKERS_PORT, BUF)
+            for i in range(20):
+                self.assertEqual(cli.send_and_receive(f"w{i}"), f"Hello, w{i}")
+            with open(f"/proc/{proc.pid}/task/{proc.pid}/children") as f:
+                workers = f.read().split()
+            self.assertEqual(len(workers), 2)
+            os.kill(int(workers[0]), 9)
+            time.sleep(1.5)
+            for i in range(20):
+                self.assertEqual(cli.send_and_receive(f"w{i}"), f"Hello, w{i}")
+        finally:
+            proc.terminate()
+            out, _ = proc.communicate()
+        self.assertIn("restarting", out)
+        totals = out.strip().splitlines()[-1]
+        self.assertIn("'requests': 40", totals)
+        self.assertIn("'restarts': 1", totals)
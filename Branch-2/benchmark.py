@@ -0,0 +1,92 @@
+"""
+Client benchmarks for Branch-2, against the asyncio server in a subprocess.
+
+    python3 benchmark.py pool --count 5000 --threads 8
+
+Each scenario returns a dict of results and prints one line per result.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from client import HelloClient, HelloClientPool
+
+HOST = "127.0.0.1"
+
+
+@contextmanager
+def _server():
+    """Run `server.py --async` on a free port for the duration of the block."""
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, "server.py", "--port", str(port), "--async"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection((HOST, port)).close()
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        yield port
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def _rps(fn, count: int, threads: int) -> float:
+    """Requests per second when `threads` threads each call `fn(n)` for an equal share of `count`."""
+    share = count // threads
+    workers = [threading.Thread(target=fn, args=(share,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return share * threads / (time.perf_counter() - start)
+
+
+def bench_pool(count: int = 5000, threads: int = 8, depth: int = 16) -> dict:
+    """One connection per request vs a pool of kept-alive connections vs pipelining on the pool."""
+    with _server() as port:
+        def one_shot(n):
+            client = HelloClient(HOST, port)
+            for i in range(n):
+                client.send_and_receive(f"m{i}")
+
+        with HelloClientPool(HOST, port, size=threads) as pool:
+            def pooled(n):
+                for i in range(n):
+                    pool.send_and_receive(f"m{i}")
+
+            def pipelined(n):
+                for i in range(0, n, depth):
+                    pool.send_many([f"m{j}" for j in range(i, min(i + depth, n))], depth)
+
+            return {
+                "one_shot_rps": _rps(one_shot, count, threads),
+                "pooled_rps": _rps(pooled, count, threads),
+                "pipelined_rps": _rps(pipelined, count, threads),
+            }
+
+
+SCENARIOS = {
+    "pool": bench_pool,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Branch-2 client benchmarks")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS), help="Benchmark to run")
+    parser.add_argument("--count", type=int, default=5000, help="Requests per measurement")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent client threads")
+    args = parser.parse_args()
+
+    for name, value in SCENARIOS[args.scenario](args.count, args.threads).items():
+        print(f"{name:24s} {value:14,.0f}")
@@ -1,38 +1,230 @@
 import socket
 import argparse
+import select
 import sys
-from packet import Packet, TYPE_DATA
+import threading
+from contextlib import contextmanager
+import checksums
+import compression
+from packet import Packet, StreamReassembler, TYPE_DATA
 
 class HelloClient:
-    def __init__(self, host="127.0.0.1", port=-1, bufsize=4096):
+    """
+    By default every `send_and_receive` opens, uses and closes its own
+    connection. With `keepalive=True` one connection is reused for all calls
+    until `close()`; if the server dropped it in between, the call reconnects
+    once. `checksum` names the packets' checksum algorithm (see checksums.py),
+    `compress` the codec requests are compressed with (see compression.py);
+    the server answers with the same codec.
+    """
+    def __init__(self, host="127.0.0.1", port=-1, bufsize=4096, keepalive=False, timeout=None,
+                 checksum="crc32", compress=None):
         self.host = host
         self.port = port
         self.bufsize = bufsize
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.csum = checksums.get(checksum).id
+        self.compress = compression.get(compress) if compress else None
+        self.sock = None
+        self.stream = None
+        self.codec = None       # compression.Stream of the connection
+        self.replies = []       # reassembled replies not yet returned
 
     def send_and_receive(self, message: str) -> str:
         if self.port == -1:
             print("Error: Port not set. Use --port <number>.")
             sys.exit(1)
 
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
+        reused = self.sock is not None
+        try:
+            try:
+                data = self._exchange(message)
+            except ConnectionError:
+                # A kept-alive connection may have been closed by the server while idle
+                if not reused:
+                    raise
+                self.close()
+                data = self._exchange(message)
+            pkt_type, msg = Packet.parse(data, self.codec)
+        finally:
+            if not self.keepalive:
+                self.close()
+        return msg
+
+    def send_many(self, messages, depth: int = 16) -> list[str]:
+        """
+        Pipeline `messages` over one connection: send up to `depth` requests
+        back to back, then read their replies in order. `depth` bounds the
+        unread replies so neither side blocks on a full socket buffer.
+        """
+        if self.port == -1:
+            print("Error: Port not set. Use --port <number>.")
+            sys.exit(1)
 
-        # Create packet
-        packet = Packet.create(message, TYPE_DATA)
-        s.sendall(packet)
+        messages = list(messages)
+        replies = []
+        try:
+            for i in range(0, len(messages), depth):
+                if self.sock is None:
+                    self.connect()
+                batch = b"".join(Packet.create(m, TYPE_DATA, self.csum, self.codec)
+                                 for m in messages[i:i + depth])
+                self.sock.sendall(batch)
+                for _ in range(min(depth, len(messages) - i)):
+                    replies.append(Packet.parse(self._recv_packet(), self.codec)[1])
+        except Exception:
+            # Replies of a broken pipeline cannot be matched up any more
+            self.close()
+            raise
+        finally:
+            if not self.keepalive:
+                self.close()
+        return replies
 
-        # Receive reply
-        data = s.recv(self.bufsize)
-        s.close()
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), self.timeout)
+        self.stream = StreamReassembler()
+        # Compression context starts over with every connection
+        self.codec = compression.Stream(self.compress) if self.compress is not None else None
+        self.replies = []
 
-        pkt_type, msg = Packet.parse(data)
-        return msg
+    def _exchange(self, message: str) -> bytes:
+        if self.sock is None:
+            self.connect()
+        self.sock.sendall(Packet.create(message, TYPE_DATA, self.csum, self.codec))
+        return self._recv_packet()
+
+    def _recv_packet(self) -> bytes:
+        """Return the next reply packet, receiving until one is complete."""
+        while not self.replies:
+            data = self.sock.recv(self.bufsize)
+            if not data:
+                raise ConnectionError("Connection closed by server")
+            self.replies.extend(self.stream.feed(data))
+        return self.replies.pop(0)
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+        self.sock = None
+        self.stream = None
+        self.codec = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class HelloClientPool:
+    """
+    A bounded, thread-safe pool of kept-alive connections to one server.
+
+    At most `size` connections exist at a time; callers beyond that wait for
+    one to be returned. Idle connections are health-checked before reuse and
+    evicted if the server closed them, and a connection whose request failed
+    is never put back.
+    """
+    def __init__(self, host="127.0.0.1", port=-1, size=8, bufsize=4096, timeout=None, checksum="crc32",
+                 compress=None):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.bufsize = bufsize
+        self.timeout = timeout
+        self.checksum = checksum
+        self.compress = compress
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(size)
+        self.stats = {"connects": 0, "evicted": 0}
+        self.closed = False
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connected HelloClient; it goes back to the pool afterwards."""
+        self.slots.acquire()
+        client = None
+        try:
+            client = self._take()
+            yield client
+        except BaseException:
+            if client is not None:
+                client.close()
+            client = None
+            raise
+        finally:
+            if client is not None:
+                with self.lock:
+                    if self.closed:
+                        client.close()
+                    else:
+                        self.idle.append(client)
+            self.slots.release()
+
+    def send_and_receive(self, message: str) -> str:
+        with self.connection() as client:
+            return client.send_and_receive(message)
+
+    def send_many(self, messages, depth: int = 16) -> list[str]:
+        with self.connection() as client:
+            return client.send_many(messages, depth)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for client in idle:
+            client.close()
+
+    def _take(self) -> HelloClient:
+        while True:
+            with self.lock:
+                client = self.idle.pop() if self.idle else None
+            if client is None:
+                break
+            if _is_alive(client.sock):
+                return client
+            client.close()
+            with self.lock:
+                self.stats["evicted"] += 1
+        client = HelloClient(self.host, self.port, self.bufsize, keepalive=True, timeout=self.timeout,
+                             checksum=self.checksum, compress=self.compress)
+        client.connect()
+        with self.lock:
+            self.stats["connects"] += 1
+        return client
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _is_alive(sock) -> bool:
+    """An idle connection is healthy if it has nothing to read: no EOF, no error, no stray data."""
+    if sock is None or sock.fileno() == -1:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Hello Client")
     parser.add_argument("--port", type=int, default=-1)
     parser.add_argument("--message", type=str, required=True)
+    parser.add_argument("--count", type=int, default=1,
+                        help="Send the message this many times over one kept-alive connection")
+    parser.add_argument("--checksum", choices=sorted(checksums.BY_NAME), default="crc32",
+                        help="Checksum algorithm of the packets")
+    parser.add_argument("--compress", choices=sorted(compression.BY_NAME), default=None,
+                        help="Compress the packets with this codec")
     args = parser.parse_args()
 
-    client = HelloClient(port=args.port)
-    print("Received:", client.send_and_receive(args.message))
+    with HelloClient(port=args.port, keepalive=args.count > 1, checksum=args.checksum,
+                     compress=args.compress) as client:
+        for _ in range(args.count):
+            print("Received:", client.send_and_receive(args.message))
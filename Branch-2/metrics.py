@@ -0,0 +1,162 @@
+"""
+Metrics and tracing for the servers and the client.
+
+A server or client given a `Metrics` keeps counters, gauges and histograms
+in it and calls its trace hook, if any, for every packet. Without one (the
+default) each instrumented spot costs a single `is not None` test.
+
+    metrics = Metrics(prefix="udp_server", trace=print)
+    server = UDPServer(port=6000, metrics=metrics)
+    MetricsServer(metrics, port=9100).start()
+
+    curl localhost:9100/metrics          # Prometheus text format
+    curl localhost:9100/metrics.json     # the same as JSON
+
+The trace hook is called as `trace(event, addr, conn_id, seq, pkt_type, size)`
+with event "recv", "send" or "retransmit"; fields a packet does not have
+(e.g. SEQ on Branch-2) are None. It runs on the hot path, so it should only
+append to a list or a queue.
+
+Histograms have fixed buckets, so observing a value is one bisect and
+quantiles are bucket bounds. Counters are plain ints updated without a
+lock; the endpoint reads copies of them from its own thread.
+
+Every branch runs on its own, so Branch-2 and Branch-3 each carry a copy of
+this module. Keep the two the same: a fix goes into both (Branch-2's test 23
+checks that they match).
+"""
+import bisect
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds: 10 us to about 10 s, doubling
+LATENCY_BOUNDS = tuple(1e-5 * 2 ** i for i in range(21))
+# Counts (queue depths, batch sizes): 1 to 65536, doubling
+COUNT_BOUNDS = tuple(2 ** i for i in range(17))
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)     # the last bucket is above every bound
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf above the last bound)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "p50": self.quantile(0.5), "p99": self.quantile(0.99),
+                "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.counts))}
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms of one server or client. `include(stats)`
+    exports an existing counter dict (such as `server.stats`) with them;
+    counters of the same name in several of them are summed.
+    """
+    def __init__(self, prefix: str = "", trace=None):
+        self.prefix = prefix
+        self.trace = trace      # trace(event, addr, conn_id, seq, pkt_type, size), or None
+        self.counters = {}
+        self.gauges = {}        # name -> function returning the current value
+        self.histograms = {}
+        self.sources = []       # counter dicts kept elsewhere
+
+    def inc(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value, bounds=LATENCY_BOUNDS):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(bounds)
+        histogram.observe(value)
+
+    def gauge(self, name: str, read):
+        """Report `read()` as gauge `name` (read when the metrics are)."""
+        self.gauges[name] = read
+
+    def include(self, stats):
+        self.sources.append(stats)
+
+    def snapshot(self) -> dict:
+        counters = {}
+        for stats in [*self.sources, self.counters]:
+            for name, value in (stats.as_dict() if hasattr(stats, "as_dict") else dict(stats)).items():
+                counters[name] = counters.get(name, 0) + value
+        return {
+            "counters": counters,
+            "gauges": {name: read() for name, read in list(self.gauges.items())},
+            "histograms": {name: h.as_dict() for name, h in list(self.histograms.items())},
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        prefix = f"{self.prefix}_" if self.prefix else ""
+        lines = []
+        snapshot = self.snapshot()
+        for name, value in snapshot["counters"].items():
+            lines += [f"# TYPE {prefix}{name}_total counter", f"{prefix}{name}_total {value}"]
+        for name, value in snapshot["gauges"].items():
+            lines += [f"# TYPE {prefix}{name} gauge", f"{prefix}{name} {value}"]
+        for name, h in list(self.histograms.items()):
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            total = 0
+            for bound, n in zip([*map(repr, h.bounds), "+Inf"], h.counts):
+                total += n
+                lines.append(f'{prefix}{name}_bucket{{le="{bound}"}} {total}')
+            lines += [f"{prefix}{name}_sum {h.sum}", f"{prefix}{name}_count {h.count}"]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves a Metrics over HTTP from a background thread: /metrics and /metrics.json."""
+    def __init__(self, metrics: Metrics, host="127.0.0.1", port=9100):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, kind = metrics.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, kind = metrics.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass    # no line on stdout per scrape
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.httpd.server_address[1]
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
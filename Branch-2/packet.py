@@ -1,5 +1,6 @@
 import struct
 import zlib
+from checksums import by_id
 
 # Protocol constants
 MAGIC = 0xC0DE
@@ -15,6 +16,18 @@ _HDR_FMT = "!HBBBHH"
 _HDR_SIZE = struct.calcsize(_HDR_FMT)
 MAX_PAYLOAD = 4096
 
+# The reserved byte holds flags: bits 0-2 are the ID of the checksum
+# algorithm (see checksums.py; 0 = CRC32, as in packets without flags),
+# bits 3-4 the codec the payload is compressed with (see compression.py; 0 = none)
+_CSUM_MASK = 0x07
+_CODEC_SHIFT = 3
+_CODEC_MASK = 0x03
+_CHK_OFFSET = 7
+_ZERO_CHK = bytes(2)
+
+class ChecksumError(ValueError):
+    """CHK does not match the packet: corrupted on the way (counted apart from other errors)."""
+
 class Packet:
     @staticmethod
     def checksum(data: bytes) -> int:
@@ -23,30 +36,70 @@ class Packet:
         return zlib.crc32(data) & 0xFFFF
 
     @staticmethod
-    def create(msg: str, pkt_type: int = TYPE_DATA) -> bytes:
-        """Create a packet with header + payload."""
+    def create(msg: str, pkt_type: int = TYPE_DATA, csum: int = 0, stream=None) -> bytes:
+        """
+        Create a packet with header + payload; `csum` is the checksum algorithm's ID.
+        With `stream` (a compression.Stream), the payload is compressed if that helps.
+        """
         payload = msg.encode("utf-8")
-        length = len(payload)
-        if length > MAX_PAYLOAD:
+        if len(payload) > MAX_PAYLOAD:
             raise ValueError("Payload too large")
+        flags = csum
+        if stream is not None:
+            codec_id, payload = stream.encode(payload)
+            flags |= codec_id << _CODEC_SHIFT
+        length = len(payload)
 
         # TODO: Pack header with checksum=0
         # HINT: header = struct.pack(_HDR_FMT, Other fields)
-        header =  struct.pack(_HDR_FMT, MAGIC, VER, pkt_type, 0, length, 0 )
+        header =  struct.pack(_HDR_FMT, MAGIC, VER, pkt_type, flags, length, 0 )
 
         # TODO: Calculate checksum over header+payload
-        checksum = Packet.checksum(header + payload)
+        # (continued from the header over the payload, no concatenation needed)
+        update = by_id(csum).update
+        checksum = update(payload, update(header)) & 0xFFFF
 
         # TODO: Repack header with real checksum
-        header = struct.pack(_HDR_FMT, MAGIC, VER, pkt_type, 0, length, checksum)
+        header = struct.pack(_HDR_FMT, MAGIC, VER, pkt_type, flags, length, checksum)
 
         # return header + payload
         return header + payload
 
 
     @staticmethod
-    def parse(packet: bytes) -> tuple[int, str]:
-        """Parse a packet, return (type, decoded_message)."""
+    def packet_type(packet: bytes) -> int:
+        """TYPE field of a packet's header."""
+        if len(packet) < _HDR_SIZE:
+            raise ValueError("Incomplete header")
+        return packet[3]
+
+    @staticmethod
+    def checksum_id(packet: bytes) -> int:
+        """ID of the checksum algorithm named in a packet's header."""
+        if len(packet) < _HDR_SIZE:
+            raise ValueError("Incomplete header")
+        return packet[4] & _CSUM_MASK
+
+    @staticmethod
+    def codec_id(packet: bytes) -> int:
+        """ID of the codec a packet's payload is compressed with (0: none)."""
+        if len(packet) < _HDR_SIZE:
+            raise ValueError("Incomplete header")
+        return packet[4] >> _CODEC_SHIFT & _CODEC_MASK
+
+    @staticmethod
+    def payload_length(header: bytes) -> int:
+        """Read LEN from a header, to know how many payload bytes follow on a stream."""
+        if len(header) < _HDR_SIZE:
+            raise ValueError("Incomplete header")
+        return struct.unpack(_HDR_FMT, header[:_HDR_SIZE])[4]
+
+    @staticmethod
+    def parse(packet: bytes, stream=None) -> tuple[int, str]:
+        """
+        Parse a packet, return (type, decoded_message). A compressed payload
+        needs the `stream` (compression.Stream) of the connection it came on.
+        """
         if len(packet) < _HDR_SIZE:
             raise ValueError("Incomplete header")
 
@@ -64,11 +117,47 @@ class Packet:
 
         # TODO: recompute checksum, compare with header field
         payload = packet[_HDR_SIZE:]
-        header_with_zero_cksum = struct.pack(_HDR_FMT, magic, ver, pkt_type, reserved, length, 0)
-        computed_cksum = Packet.checksum(header_with_zero_cksum + payload)
+        update = by_id(reserved & _CSUM_MASK).update
+        computed_cksum = update(payload, update(_ZERO_CHK, update(packet[:_CHK_OFFSET]))) & 0xFFFF
         if computed_cksum != checksum:
-            raise ValueError("Error in checksum")
+            raise ChecksumError("Error in checksum")
+
+        codec_id = reserved >> _CODEC_SHIFT & _CODEC_MASK
+        if stream is not None:
+            payload = stream.decode(codec_id, payload, MAX_PAYLOAD)
+        elif codec_id:
+            raise ValueError("Compressed payload without a stream")
 
         # TODO: decode payload into string and return
         return pkt_type, payload.decode("utf-8")
 
+
+class StreamReassembler:
+    """
+    Splits a TCP byte stream back into packets. `feed` takes whatever one
+    `recv` returned (part of a packet, or several packets coalesced) and
+    returns the packets that are now complete; the rest stays buffered.
+    """
+    def __init__(self):
+        self.buf = bytearray()
+
+    def feed(self, data: bytes) -> list[bytes]:
+        self.buf += data
+        packets = []
+        while len(self.buf) >= _HDR_SIZE:
+            magic, _, _, _, length, _ = struct.unpack_from(_HDR_FMT, self.buf)
+            # Without a sane header there is no way to find the next packet boundary
+            if magic != MAGIC:
+                raise ValueError("Error in magic")
+            if length > MAX_PAYLOAD:
+                raise ValueError("Error in length")
+            end = _HDR_SIZE + length
+            if len(self.buf) < end:
+                break
+            packets.append(bytes(self.buf[:end]))
+            del self.buf[:end]
+        return packets
+
+    def pending(self) -> bytes:
+        """Bytes of an incomplete packet still waiting for the rest."""
+        return bytes(self.buf)
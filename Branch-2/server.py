@@ -1,13 +1,64 @@
 import socket
 import argparse
+import asyncio
 import sys
-from packet import Packet, TYPE_DATA, TYPE_ERR
+import time
+from packet import Packet, ChecksumError, StreamReassembler, TYPE_DATA, TYPE_ERR, MAX_PAYLOAD, _HDR_SIZE
+from compression import CODECS, Stream
+from supervisor import Supervisor
+from metrics import Metrics, MetricsServer, COUNT_BOUNDS
+
+# Counters kept in `server.stats` (summed over workers by the supervisor)
+STATS_KEYS = ("connections", "requests", "errors")
+
+def make_reply(data: bytes, stats=None, stream=None, metrics=None) -> bytes:
+    """
+    Reply packet for one received packet (shared by both servers), counted in
+    `stats` (and checksum failures in `metrics`). `stream` is the connection's
+    compression.Stream; replies are compressed with the first codec the
+    client compresses with.
+    """
+    key = "errors"
+    try:
+        if stream is not None and stream.codec is None:
+            stream.codec = CODECS.get(Packet.codec_id(data))
+        pkt_type, msg = Packet.parse(data, stream)
+        # Answer with the checksum algorithm the client chose
+        csum = Packet.checksum_id(data)
+        if pkt_type == TYPE_DATA:
+            reply = Packet.create(f"Hello, {msg}", TYPE_DATA, csum, stream)
+            key = "requests"
+        else:
+            reply = Packet.create("Unexpected packet", TYPE_ERR, csum, stream)
+    except Exception as e:
+        if metrics is not None and isinstance(e, ChecksumError):
+            metrics.inc("checksum_failures")
+        reply = Packet.create(f"ERROR: {str(e)}", TYPE_ERR, stream=stream)
+    if stats is not None:
+        stats[key] += 1
+    return reply
 
 class HelloServer:
-    def __init__(self, host="127.0.0.1", port=-1, bufsize=4096):
+    """
+    Serves one connection at a time. A connection may carry any number of
+    packets (keep-alive): they are reassembled from the byte stream and each
+    one is answered, until the client closes or stays idle for `idle_timeout`.
+
+    With `metrics` (see metrics.py), it also counts bytes and checksum
+    failures, and records how many packets each read brought (the queue a
+    pipelining client builds up) and how long each one waited for its reply.
+    """
+    def __init__(self, host="127.0.0.1", port=-1, bufsize=4096, idle_timeout=2.0, reuse_port=False,
+                 stats=None, metrics=None):
         self.host = host
         self.port = port
         self.bufsize = bufsize
+        self.idle_timeout = idle_timeout
+        self.reuse_port = reuse_port
+        self.stats = stats if stats is not None else dict.fromkeys(STATS_KEYS, 0)
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.include(self.stats)
         self.sock = None
 
     def start(self):
@@ -17,6 +68,9 @@ class HelloServer:
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            # Several worker processes share the port; the kernel spreads connections over them
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.sock.bind((self.host, self.port))
         self.sock.listen(1)
         print(f"Server listening on {self.host}:{self.port}")
@@ -24,27 +78,166 @@ class HelloServer:
         while True:
             conn, addr = self.sock.accept()
             with conn:
-                data = conn.recv(self.bufsize)
-                if not data:
-                    continue
+                self.stats["connections"] += 1
+                conn.settimeout(self.idle_timeout)
+                self.serve_connection(conn)
 
-                try:
-                    pkt_type, msg = Packet.parse(data)
-                    if pkt_type == TYPE_DATA:
-                        reply = Packet.create(f"Hello, {msg}")
-                    else:
-                        reply = Packet.create("Unexpected packet", TYPE_ERR)
-                except Exception as e:
-                    reply = Packet.create(f"ERROR: {str(e)}", TYPE_ERR)
+    def serve_connection(self, conn):
+        stream = StreamReassembler()
+        codec = Stream()
+        metrics = self.metrics
+        if metrics is not None:
+            trace, addr = metrics.trace, conn.getpeername()
+        while True:
+            try:
+                data = conn.recv(self.bufsize)
+            except socket.timeout:
+                data = b""
+            except ConnectionError:
+                return
+            if not data:
+                # Client closed (or went idle) mid-packet: answer what we have with an error
+                if stream.pending():
+                    conn.sendall(make_reply(stream.pending(), self.stats, codec))
+                return
 
-                conn.sendall(reply)
+            try:
+                packets = stream.feed(data)
+            except ValueError as e:
+                # Framing is lost, so the connection cannot continue
+                self.stats["errors"] += 1
+                conn.sendall(Packet.create(f"ERROR: {str(e)}", TYPE_ERR))
+                return
+            if metrics is None:
+                if packets:
+                    conn.sendall(b"".join(make_reply(pkt, self.stats, codec) for pkt in packets))
+                continue
+            received = time.perf_counter()
+            metrics.inc("bytes_received", len(data))
+            metrics.observe("packets_per_read", len(packets), COUNT_BOUNDS)
+            if packets:
+                replies = [make_reply(pkt, self.stats, codec, metrics) for pkt in packets]
+                conn.sendall(b"".join(replies))
+                latency = time.perf_counter() - received
+                for pkt, reply in zip(packets, replies):
+                    metrics.observe("request_seconds", latency)
+                    metrics.inc("bytes_sent", len(reply))
+                    if trace is not None:
+                        trace("recv", addr, None, None, Packet.packet_type(pkt), len(pkt))
+                        trace("send", addr, None, None, Packet.packet_type(reply), len(reply))
 
     def stop(self):
         if self.sock:
             self.sock.close()
 
+class AsyncHelloServer:
+    """
+    asyncio variant of HelloServer: every connection is a coroutine on one
+    event loop. Packets are framed by their header: read the header, then
+    exactly LEN payload bytes, and repeat until the client closes.
+
+    With `metrics`, it also counts bytes and checksum failures, times each
+    request from its last byte in to its reply flushed out, and reports the
+    open connections.
+    """
+    def __init__(self, host="127.0.0.1", port=-1, bufsize=4096, backlog=1024, reuse_port=False,
+                 stats=None, metrics=None):
+        self.host = host
+        self.port = port
+        self.bufsize = bufsize
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.stats = stats if stats is not None else dict.fromkeys(STATS_KEYS, 0)
+        self.open = 0           # connections being served
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.include(self.stats)
+            metrics.gauge("connections_open", lambda: self.open)
+        self.server = None
+
+    def start(self):
+        if self.port == -1:
+            print("Error: Port not set. Use --port <number>.")
+            sys.exit(1)
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.server = await asyncio.start_server(
+            self.handle, self.host, self.port, backlog=self.backlog, reuse_address=True,
+            reuse_port=self.reuse_port or None
+        )
+        print(f"Server listening on {self.host}:{self.port}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle(self, reader, writer):
+        self.stats["connections"] += 1
+        self.open += 1
+        codec = Stream()
+        metrics = self.metrics
+        if metrics is not None:
+            trace, addr = metrics.trace, writer.get_extra_info("peername")
+        try:
+            while True:
+                header = await reader.readexactly(_HDR_SIZE)
+                length = Packet.payload_length(header)
+                if length > MAX_PAYLOAD:
+                    # Framing is lost, so the connection cannot continue
+                    self.stats["errors"] += 1
+                    writer.write(Packet.create("ERROR: Error in length", TYPE_ERR))
+                    await writer.drain()
+                    break
+                if metrics is None:
+                    writer.write(make_reply(header + await reader.readexactly(length), self.stats, codec))
+                    await writer.drain()
+                    continue
+                pkt = header + await reader.readexactly(length)
+                received = time.perf_counter()
+                reply = make_reply(pkt, self.stats, codec, metrics)
+                writer.write(reply)
+                await writer.drain()
+                metrics.observe("request_seconds", time.perf_counter() - received)
+                metrics.inc("bytes_received", len(pkt))
+                metrics.inc("bytes_sent", len(reply))
+                if trace is not None:
+                    trace("recv", addr, None, None, Packet.packet_type(pkt), len(pkt))
+                    trace("send", addr, None, None, Packet.packet_type(reply), len(reply))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # Closed between packets (or mid-packet): nothing more to answer
+            pass
+        finally:
+            self.open -= 1
+            writer.close()
+
+    def stop(self):
+        if self.server:
+            self.server.close()
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Hello Server")
     parser.add_argument("--port", type=int, default=-1)
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Serve all connections concurrently on an asyncio event loop")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes sharing the port via SO_REUSEPORT")
+    parser.add_argument("--stats-interval", type=float, default=10.0,
+                        help="Seconds between aggregated stats lines (with --workers)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve /metrics and /metrics.json on this port (worker N: port + N)")
     args = parser.parse_args()
-    HelloServer(port=args.port).start()
+
+    def make_server(worker=None, stats=None):
+        cls = AsyncHelloServer if args.use_async else HelloServer
+        metrics = None
+        if args.metrics_port is not None:
+            metrics = Metrics(prefix="hello_server")
+            MetricsServer(metrics, port=args.metrics_port + (worker or 0)).start()
+        return cls(port=args.port, reuse_port=worker is not None, stats=stats, metrics=metrics)
+
+    if args.workers > 1:
+        if args.port == -1:
+            print("Error: Port not set. Use --port <number>.")
+            sys.exit(1)
+        Supervisor(make_server, args.workers, STATS_KEYS, interval=args.stats_interval).run()
+    else:
+        make_server().start()
@@ -1,7 +1,28 @@
 import unittest
 import sys, os
+import asyncio
+import subprocess
+import time
+import socket
+import threading
+import json
+import ast
+import urllib.request
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from packet import Packet, TYPE_DATA
+from packet import Packet, StreamReassembler, TYPE_DATA, TYPE_ERR, _HDR_SIZE
+from client import HelloClient, HelloClientPool
+from server import HelloServer
+import checksums
+import compression
+import metrics
+
+BRANCH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = "127.0.0.1"
+ASYNC_PORT = 5179
+SYNC_PORT = 5180
+WORKERS_PORT = 5181
+METRICS_PORT = 5182     # 5183-5184: /metrics and the server started from the command line
+CONCURRENCY = 1000
 
 class TestPublic(unittest.TestCase):
     # 6. Magic number must be 0xC0DE
@@ -33,6 +54,251 @@ class TestPublic(unittest.TestCase):
         t, msg = Packet.parse(pkt)
         self.assertEqual(msg, "check")
 
+class TestStreamReassembler(unittest.TestCase):
+    # 11. Packets split across reads and coalesced into one read both come out whole
+    def test_partial_and_coalesced(self):
+        pkts = [Packet.create(f"msg{i}" * i) for i in range(5)]
+        stream = StreamReassembler()
+        out = []
+        for b in b"".join(pkts[:2]):
+            out += stream.feed(bytes([b]))
+        out += stream.feed(b"".join(pkts[2:]))
+        self.assertEqual(out, pkts)
+        self.assertEqual(stream.pending(), b"")
+
+    # 12. A header with a bad LEN cannot be framed
+    def test_bad_length(self):
+        pkt = bytearray(Packet.create("x"))
+        pkt[5:7] = (0xFFFF).to_bytes(2, "big")
+        with self.assertRaises(ValueError):
+            StreamReassembler().feed(bytes(pkt))
+
+class TestKeepAlive(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = subprocess.Popen(
+            [sys.executable, "server.py", "--port", str(SYNC_PORT)], cwd=BRANCH_DIR
+        )
+        time.sleep(0.5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+
+    # 13. Many requests (including full-size ones) over one connection
+    def test_keepalive_many_requests(self):
+        with HelloClient(HOST, SYNC_PORT, keepalive=True) as cli:
+            for i in range(200):
+                self.assertEqual(cli.send_and_receive(f"n{i}"), f"Hello, n{i}")
+            sock = cli.sock
+            big = "b" * (4096 - len("Hello, "))
+            self.assertEqual(cli.send_and_receive(big), "Hello, " + big)
+            self.assertIs(cli.sock, sock)
+
+    # 14. One-shot clients still work
+    def test_one_shot(self):
+        self.assertEqual(HelloClient(HOST, SYNC_PORT).send_and_receive("once"), "Hello, once")
+
+class TestWorkers(unittest.TestCase):
+    # 15. --workers: connections are spread over processes, stats are summed
+    def test_workers(self):
+        proc = subprocess.Popen(
+            [sys.executable, "server.py", "--port", str(WORKERS_PORT), "--workers", "2"],
+            cwd=BRANCH_DIR, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            time.sleep(0.5)
+            for i in range(20):
+                self.assertEqual(HelloClient(HOST, WORKERS_PORT).send_and_receive(f"w{i}"), f"Hello, w{i}")
+        finally:
+            proc.terminate()
+            out, _ = proc.communicate()
+        self.assertIn("'requests': 20", out.strip().splitlines()[-1])
+
+async def _one_request(port, message):
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write(Packet.create(message))
+    await writer.drain()
+    header = await reader.readexactly(_HDR_SIZE)
+    reply = Packet.parse(header + await reader.readexactly(Packet.payload_length(header)))
+    writer.close()
+    return reply, time.perf_counter() - start
+
+class TestAsyncHelloServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = subprocess.Popen(
+            [sys.executable, "server.py", "--port", str(ASYNC_PORT), "--async"], cwd=BRANCH_DIR
+        )
+        time.sleep(0.5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+
+    # 16. Oversized LEN in the header gets an ERR packet
+    def test_async_bad_length(self):
+        async def run():
+            reader, writer = await asyncio.open_connection(HOST, ASYNC_PORT)
+            pkt = bytearray(Packet.create("x"))
+            pkt[5:7] = (0xFFFF).to_bytes(2, "big")
+            writer.write(pkt)
+            header = await reader.readexactly(_HDR_SIZE)
+            reply = Packet.parse(header + await reader.readexactly(Packet.payload_length(header)))
+            writer.close()
+            return reply
+        pkt_type, _ = asyncio.run(run())
+        self.assertEqual(pkt_type, TYPE_ERR)
+
+    # 17. Load: 1k concurrent clients, report p50/p99 latency
+    def test_concurrent_load(self):
+        async def load():
+            return await asyncio.gather(*(_one_request(ASYNC_PORT, f"c{i}") for i in range(CONCURRENCY)))
+        results = asyncio.run(load())
+        self.assertEqual([r for r, _ in results], [(TYPE_DATA, f"Hello, c{i}") for i in range(CONCURRENCY)])
+        lat = sorted(t for _, t in results)
+        p50, p99 = lat[len(lat) // 2], lat[int(len(lat) * 0.99)]
+        print(f"\n{CONCURRENCY} concurrent clients: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
+        self.assertLess(p99, 5.0)
+
+    # 18. The pool bounds its connections across threads and pipelines in order
+    def test_pool(self):
+        with HelloClientPool(HOST, ASYNC_PORT, size=4) as pool:
+            def work(k):
+                for i in range(50):
+                    self.assertEqual(pool.send_and_receive(f"t{k}-{i}"), f"Hello, t{k}-{i}")
+            threads = [threading.Thread(target=work, args=(k,)) for k in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertLessEqual(pool.stats["connects"], 4)
+            msgs = [f"p{i}" for i in range(40)]
+            self.assertEqual(pool.send_many(msgs, depth=8), [f"Hello, {m}" for m in msgs])
+
+    # 19. A connection closed while idle is evicted, not reused
+    def test_pool_evicts_dead(self):
+        with HelloClientPool(HOST, ASYNC_PORT, size=1) as pool:
+            pool.send_and_receive("a")
+            pool.idle[0].sock.shutdown(socket.SHUT_RDWR)
+            self.assertEqual(pool.send_and_receive("b"), "Hello, b")
+            self.assertEqual(pool.stats["evicted"], 1)
+
+    # 20. The checksum algorithm is chosen per connection and echoed by the server
+    def test_checksum_backends(self):
+        for name in sorted(checksums.BY_NAME):
+            csum = checksums.get(name).id
+            pkt = Packet.create("sum", TYPE_DATA, csum)
+            self.assertEqual(Packet.checksum_id(pkt), csum)
+            self.assertEqual(Packet.parse(pkt), (TYPE_DATA, "sum"))
+            with HelloClient(HOST, ASYNC_PORT, keepalive=True, checksum=name) as cli:
+                self.assertEqual(cli.send_and_receive(name), f"Hello, {name}")
+                self.assertEqual(cli.send_many(["x", "y"]), ["Hello, x", "Hello, y"])
+        corrupted = bytearray(Packet.create("test", TYPE_DATA, checksums.CRC32C.id))
+        corrupted[-1] ^= 0xFF
+        with self.assertRaises(ValueError):
+            Packet.parse(bytes(corrupted))
+
+    # 21. Compressed requests and replies share one context per connection
+    def test_compression(self):
+        stream = compression.Stream(compression.ZLIB)
+        msg = "GET /index.html " * 50
+        first, second = Packet.create(msg, TYPE_DATA, stream=stream), Packet.create(msg, TYPE_DATA, stream=stream)
+        self.assertEqual(Packet.codec_id(first), compression.ZLIB.id)
+        self.assertLess(len(second), len(first))
+        receiver = compression.Stream()
+        self.assertEqual([Packet.parse(p, receiver)[1] for p in (first, second)], [msg, msg])
+        with self.assertRaises(ValueError):
+            Packet.parse(first)
+
+        for name in sorted(compression.BY_NAME):
+            with HelloClient(HOST, ASYNC_PORT, keepalive=True, compress=name) as cli:
+                self.assertEqual(cli.send_and_receive(msg), f"Hello, {msg}")
+                self.assertEqual(cli.send_many([msg, "x"]), [f"Hello, {msg}", "Hello, x"])
+
+class TestMetrics(unittest.TestCase):
+    # 22. Metrics: counters, latency histograms and the trace hook; /metrics serves them
+    def test_metrics(self):
+        h = metrics.Histogram(bounds=(1, 2, 4))
+        for value in (0.5, 1.5, 3, 3, 100):
+            h.observe(value)
+        self.assertEqual(h.counts, [1, 1, 2, 1])
+        self.assertEqual(h.quantile(0.5), 4)
+        self.assertEqual(h.quantile(1.0), float("inf"))
+
+        # In process: the blocking server with a trace hook
+        events = []
+        m = metrics.Metrics(trace=lambda *event: events.append(event))
+        server = HelloServer(HOST, METRICS_PORT, metrics=m)
+        threading.Thread(target=server.start, daemon=True).start()
+        time.sleep(0.3)
+        with HelloClient(HOST, METRICS_PORT, keepalive=True) as cli:
+            self.assertEqual(cli.send_many(["a", "b", "c"]), ["Hello, a", "Hello, b", "Hello, c"])
+        with socket.create_connection((HOST, METRICS_PORT)) as s:
+            corrupted = bytearray(Packet.create("x"))
+            corrupted[-1] ^= 0xFF
+            s.sendall(corrupted)
+            s.recv(4096)
+        time.sleep(0.1)
+        server.stop()
+        snapshot = m.snapshot()
+        self.assertEqual(snapshot["counters"]["requests"], 3)
+        self.assertEqual(snapshot["counters"]["checksum_failures"], 1)
+        self.assertEqual(snapshot["histograms"]["request_seconds"]["count"], 4)
+        self.assertEqual([e[0] for e in events[:2]], ["recv", "send"])
+        self.assertEqual(events[1][4], TYPE_DATA)
+
+        # From the command line: the async server with --metrics-port
+        proc = subprocess.Popen([sys.executable, "server.py", "--port", str(METRICS_PORT + 2), "--async",
+                                 "--metrics-port", str(METRICS_PORT + 1)], cwd=BRANCH_DIR)
+        try:
+            time.sleep(0.5)
+            HelloClient(HOST, METRICS_PORT + 2).send_and_receive("hi")
+            url = f"http://{HOST}:{METRICS_PORT + 1}"
+            text = urllib.request.urlopen(url + "/metrics").read().decode()
+            self.assertIn("hello_server_requests_total 1", text)
+            self.assertIn('hello_server_request_seconds_bucket{le="+Inf"} 1', text)
+            stats = json.loads(urllib.request.urlopen(url + "/metrics.json").read())
+            self.assertEqual(stats["counters"]["connections"], 1)
+            self.assertEqual(stats["gauges"]["connections_open"], 0)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+def _code(path):
+    """A module's code without its docstrings, to compare copies that explain themselves differently."""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        body = getattr(node, "body", None)
+        if (isinstance(body, list) and body and isinstance(body[0], ast.Expr)
+                and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str)):
+            node.body = body[1:]
+    return ast.dump(tree)
+
+class TestSharedModules(unittest.TestCase):
+    # Every branch runs on its own, with only its directory on the import path,
+    # so a module several branches need is copied into each; the copies must not drift
+    SHARED = {
+        "compression.py": ("Branch-3",),
+        "metrics.py": ("Branch-3",),
+        "supervisor.py": ("Branch-1", "Branch-3"),
+    }
+
+    # 23. Modules copied across branches stay the same code
+    def test_copies_match(self):
+        root = os.path.dirname(BRANCH_DIR)
+        for name, branches in self.SHARED.items():
+            for branch in branches:
+                other = os.path.join(root, branch, name)
+                if not os.path.exists(other):
+                    continue
+                with self.subTest(module=name, branch=branch):
+                    self.assertEqual(_code(os.path.join(BRANCH_DIR, name)), _code(other))
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -0,0 +1,155 @@
+"""
+Batched datagram I/O for the Branch-3 transfer.
+
+Python has no sendmmsg/recvmmsg, but Linux offers the same effect for UDP
+through segmentation offload:
+
+* UDP_SEGMENT (GSO): one `sendmsg` with a list of equally sized packets is
+  split by the kernel into one datagram per packet.
+* UDP_GRO: the kernel coalesces a burst of datagrams from the same flow into
+  one buffer, returned by a single `recvmsg_into` together with the segment size.
+
+Where these are not available (other platforms, old kernels, NICs without
+offload) `BatchIO` falls back to one `sendto` per packet, and to draining the
+socket with non-blocking `recvfrom_into` calls into preallocated buffers.
+
+The socket is switched to non-blocking mode; waiting is done with one
+`poll` per batch. Every syscall is counted in `stats` so the batched and
+per-datagram (`batch=False`) paths can be compared.
+"""
+import select
+import socket
+import struct
+
+SOL_UDP = getattr(socket, "SOL_UDP", 17)
+UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103)
+UDP_GRO = getattr(socket, "UDP_GRO", 104)
+
+MAX_SEGMENTS = 64           # kernel limit for one GSO send
+MAX_DATAGRAM = 65507        # largest UDP payload over IPv4
+_U16 = struct.Struct("=H")  # GSO segment size, native byte order
+_I32 = struct.Struct("=i")  # GRO segment size in the control message
+
+
+class BatchIO:
+    def __init__(self, sock, max_batch: int = 64, bufsize: int = 2048, batch: bool = True):
+        self.sock = sock
+        self.gso = batch and _try_setsockopt(sock, UDP_SEGMENT, 0)
+        self.gro = batch and _try_setsockopt(sock, UDP_GRO, 1)
+        # With GRO one buffer can hold a whole burst of coalesced datagrams
+        self.bufsize = 65536 if self.gro else bufsize
+        self.buffers = [bytearray(self.bufsize) for _ in range(max_batch if batch else 1)]
+        self.views = [memoryview(b) for b in self.buffers]
+        self.ancsize = socket.CMSG_SPACE(_I32.size)
+        self.stats = {"send_calls": 0, "recv_calls": 0, "poll_calls": 0, "sent": 0,
+                      "received": 0, "bytes_sent": 0, "bytes_received": 0}
+        sock.setblocking(False)
+        self.poller = select.poll()
+        self.poller.register(sock, select.POLLIN)
+
+    def syscalls(self) -> int:
+        s = self.stats
+        return s["send_calls"] + s["recv_calls"] + s["poll_calls"]
+
+    def send(self, pkt, addr):
+        self.send_batch([pkt], addr)
+
+    def send_batch(self, packets, addr):
+        """Send a list of packets to `addr` with as few syscalls as possible."""
+        stats = self.stats
+        i, n = 0, len(packets)
+        while i < n:
+            j = self._gso_group(packets, i) if self.gso else i + 1
+            try:
+                if j - i > 1:
+                    cmsg = [(SOL_UDP, UDP_SEGMENT, _U16.pack(len(packets[i])))]
+                    self.sock.sendmsg(packets[i:j], cmsg, 0, addr)
+                else:
+                    self.sock.sendto(packets[i], addr)
+            except BlockingIOError:
+                # Send buffer full: wait until it drains, then retry
+                stats["send_calls"] += 1
+                self._wait(select.POLLOUT, None)
+                continue
+            except OSError:
+                if j - i == 1:
+                    raise
+                # e.g. EIO from a device without segmentation offload: stop trying
+                self.gso = False
+                continue
+            stats["send_calls"] += 1
+            stats["sent"] += j - i
+            for pkt in packets[i:j]:
+                stats["bytes_sent"] += len(pkt)
+            i = j
+
+    def _gso_group(self, packets, i):
+        """End index of the run of packets starting at `i` that fits one GSO send."""
+        size = len(packets[i])
+        limit = min(len(packets), i + MAX_SEGMENTS, i + MAX_DATAGRAM // max(size, 1))
+        j = i + 1
+        while j < limit and len(packets[j]) == size:
+            j += 1
+        # A shorter packet may close the group (the kernel allows a short last segment)
+        if j < limit and len(packets[j]) < size:
+            j += 1
+        return j
+
+    def recv_batch(self, timeout=None):
+        """
+        Wait up to `timeout` seconds (None: forever) and return a list of
+        (memoryview, addr) for every datagram that is queued, or [] on timeout.
+        Views point into the pool buffers and are only valid until the next call.
+        """
+        if not self._wait(select.POLLIN, timeout):
+            return []
+        return self.drain()
+
+    def drain(self):
+        """recv_batch without waiting, for a socket an event loop found readable."""
+        out = []
+        for k in range(len(self.buffers)):
+            try:
+                self._recv_into(k, out)
+            except (BlockingIOError, InterruptedError):
+                break
+        return out
+
+    def _wait(self, events, timeout) -> bool:
+        self.stats["poll_calls"] += 1
+        if events != select.POLLIN:
+            self.poller.modify(self.sock, events)
+        ready = self.poller.poll(None if timeout is None else timeout * 1000)
+        if events != select.POLLIN:
+            self.poller.modify(self.sock, select.POLLIN)
+        return bool(ready)
+
+    def _recv_into(self, k, out):
+        stats = self.stats
+        stats["recv_calls"] += 1
+        if self.gro:
+            nbytes, ancdata, _, addr = self.sock.recvmsg_into([self.buffers[k]], self.ancsize)
+            seg = nbytes
+            for level, kind, data in ancdata:
+                if level == SOL_UDP and kind == UDP_GRO:
+                    seg = _I32.unpack_from(data)[0]
+        else:
+            nbytes, addr = self.sock.recvfrom_into(self.buffers[k])
+            seg = nbytes
+        stats["bytes_received"] += nbytes
+        view = self.views[k]
+        if nbytes == 0:
+            out.append((view[:0], addr))
+            stats["received"] += 1
+            return
+        for off in range(0, nbytes, seg):
+            out.append((view[off:off + seg if off + seg < nbytes else nbytes], addr))
+            stats["received"] += 1
+
+
+def _try_setsockopt(sock, opt, value) -> bool:
+    try:
+        sock.setsockopt(SOL_UDP, opt, value)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,441 @@
+"""
+Micro-benchmarks for the Branch-3 transfer.
+
+    python3 benchmark.py packet --count 200000
+    python3 benchmark.py io --count 20000
+    python3 benchmark.py sessions --count 200
+    python3 benchmark.py stripes --count 20000
+    python3 benchmark.py mmap --count 20000
+    python3 benchmark.py chunks --count 20000
+    python3 benchmark.py checksum --count 2000
+    python3 benchmark.py batch --count 100000
+    python3 benchmark.py compress --count 20000
+    python3 benchmark.py fec --count 2000
+    python3 benchmark.py reassembly --count 1000000
+
+Each scenario returns a dict of results and prints one line per result.
+"""
+import argparse
+import checksums
+import compression
+import contextlib
+import packet
+import io
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from packet import (Packet, MAGIC, VER, TYPE_DATA, MAX_PAYLOAD, MAX_CHUNK, _HDR_FMT, _HDR_SIZE,
+                    _HDR_LAST_FMT, _HDR_LAST_SIZE)
+from client import UDPClient
+from server import UDPServer
+from relay import LossyRelay
+from window import RecvWindow
+
+
+def _rate(fn, count: int, repeat: int = 3) -> float:
+    """Calls per second of `fn` over `count` calls (best of `repeat` runs)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+# The original create/parse (pack twice, concatenate twice), kept as the baseline
+def _legacy_create(seq, data, pkt_type=TYPE_DATA, file_checksum=None, conn_id=0):
+    length = len(data)
+    if file_checksum is not None:
+        header = struct.pack(_HDR_LAST_FMT, MAGIC, VER, pkt_type, conn_id, seq, length, 0, file_checksum)
+        chk = zlib.crc32(header + data) & 0xFFFFFFFF
+        header = struct.pack(_HDR_LAST_FMT, MAGIC, VER, pkt_type, conn_id, seq, length, chk, file_checksum)
+    else:
+        header = struct.pack(_HDR_FMT, MAGIC, VER, pkt_type, conn_id, seq, length, 0)
+        chk = zlib.crc32(header + data) & 0xFFFFFFFF
+        header = struct.pack(_HDR_FMT, MAGIC, VER, pkt_type, conn_id, seq, length, chk)
+    return header + data
+
+
+def _legacy_parse(packet):
+    if len(packet) < _HDR_SIZE:
+        raise ValueError("Incomplete header")
+    magic, ver, pkt_type, conn_id, seq, length, chk = struct.unpack(_HDR_FMT, packet[:_HDR_SIZE])
+    if magic != MAGIC or ver != VER or length > MAX_PAYLOAD:
+        raise ValueError("Bad header")
+    if len(packet) == _HDR_SIZE + length:
+        payload = packet[_HDR_SIZE:_HDR_SIZE + length]
+        header = struct.pack(_HDR_FMT, magic, ver, pkt_type, conn_id, seq, length, 0)
+        fchk = None
+    elif len(packet) == _HDR_LAST_SIZE + length:
+        fchk = struct.unpack(_HDR_LAST_FMT, packet[:_HDR_LAST_SIZE])[-1]
+        payload = packet[_HDR_LAST_SIZE:_HDR_LAST_SIZE + length]
+        header = struct.pack(_HDR_LAST_FMT, magic, ver, pkt_type, conn_id, seq, length, 0, fchk)
+    else:
+        raise ValueError("Error in length")
+    if zlib.crc32(header + payload) & 0xFFFFFFFF != chk:
+        raise ValueError("Error in checksum")
+    return pkt_type, seq, payload, fchk
+
+
+# The original RecvWindow (out-of-order payloads in a dict), kept as the baseline
+class _DictRecvWindow:
+    def __init__(self, size: int = 64):
+        self.size = size
+        self.expected = 0
+        self.pending = {}
+
+    def offer(self, seq, data):
+        if seq < self.expected or seq >= self.expected + self.size:
+            return []
+        if seq != self.expected:
+            self.pending[seq] = bytes(data)
+            return []
+        ready = [data]
+        self.expected += 1
+        while self.expected in self.pending:
+            ready.append(self.pending.pop(self.expected))
+            self.expected += 1
+        return ready
+
+    def sack_ranges(self):
+        ranges = []
+        for seq in sorted(self.pending):
+            if ranges and ranges[-1][1] == seq:
+                ranges[-1] = (ranges[-1][0], seq + 1)
+            else:
+                ranges.append((seq, seq + 1))
+        return ranges
+
+
+def bench_packet(count: int = 100_000) -> dict:
+    """Packets per second for encode/decode of full-size packets, before and after."""
+    payload = os.urandom(MAX_PAYLOAD)
+    pkt = Packet.create(1, payload)
+    buf = memoryview(bytearray(2048))
+    return {
+        "legacy_create_pps": _rate(lambda: _legacy_create(1, payload), count),
+        "create_pps": _rate(lambda: Packet.create(1, payload), count),
+        "pack_into_pps": _rate(lambda: Packet.pack_into(buf, 0, 1, payload), count),
+        "legacy_parse_pps": _rate(lambda: _legacy_parse(pkt), count),
+        "parse_pps": _rate(lambda: Packet.parse(pkt), count),
+        "parse_from_pps": _rate(lambda: Packet.parse_from(pkt), count),
+    }
+
+
+def _transfer(data: bytes, client_kwargs=None, server_kwargs=None):
+    """
+    Send `data` over loopback to a fresh server thread.
+    Returns (seconds, client, server); the server is stopped afterwards.
+    """
+    outfile = os.path.join(tempfile.mkdtemp(), "received.bin")
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = UDPServer(port=0, outfile=outfile, **(server_kwargs or {}))
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        client = UDPClient(port=server.sock.getsockname()[1], **(client_kwargs or {}))
+        start = time.perf_counter()
+        client.send_data(data)
+        elapsed = time.perf_counter() - start
+        server.stop()
+        thread.join()
+        client.close()
+    return elapsed, client, server
+
+
+def bench_io(count: int = 20_000) -> dict:
+    """Loopback transfer of `count` full packets, per-datagram vs batched I/O."""
+    data = os.urandom(count * MAX_PAYLOAD)
+    mb = len(data) / 1e6
+    results = {}
+    for label, batch in (("single", False), ("batched", True)):
+        elapsed, client, server = _transfer(data, {"window": 64, "batch": batch}, {"batch": batch})
+        syscalls = client.io.syscalls() + server.io.syscalls()
+        results[f"{label}_pps"] = count / elapsed
+        results[f"{label}_MBps"] = mb / elapsed
+        results[f"{label}_syscalls_per_MB"] = syscalls / mb
+    return results
+
+
+def bench_sessions(count: int = 200, packets: int = 100) -> dict:
+    """`count` uploads of `packets` full packets each: one after another, then all at once."""
+    data = [os.urandom(packets * MAX_PAYLOAD) for _ in range(count)]
+    mb = count * packets * MAX_PAYLOAD / 1e6
+    outdir = tempfile.mkdtemp()
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = UDPServer(port=0, outfile=os.path.join(outdir, "{id}.bin"), max_sessions=count)
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        port = server.sock.getsockname()[1]
+
+        def upload(payload):
+            client = UDPClient(port=port, window=32)
+            client.send_data(payload)
+            client.close()
+
+        start = time.perf_counter()
+        for payload in data:
+            upload(payload)
+        sequential = time.perf_counter() - start
+
+        uploads = [threading.Thread(target=upload, args=(payload,)) for payload in data]
+        start = time.perf_counter()
+        for t in uploads:
+            t.start()
+        for t in uploads:
+            t.join()
+        concurrent = time.perf_counter() - start
+        server.stop()
+        thread.join()
+    return {
+        "sequential_MBps": mb / sequential,
+        "concurrent_MBps": mb / concurrent,
+        "transfers": server.stats["transfers"],
+        "evicted": server.stats["evicted"],
+    }
+
+
+def bench_stripes(count: int = 20_000) -> dict:
+    """One file of `count` full packets, sent over 1, 2, 4 and 8 striped flows."""
+    path = os.path.join(tempfile.mkdtemp(), "input.bin")
+    with open(path, "wb") as f:
+        f.write(os.urandom(count * MAX_PAYLOAD))
+    mb = count * MAX_PAYLOAD / 1e6
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = UDPServer(port=0, outfile=os.path.join(tempfile.mkdtemp(), "received.bin"))
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        for streams in (1, 2, 4, 8):
+            client = UDPClient(port=server.sock.getsockname()[1], window=64)
+            start = time.perf_counter()
+            client.send_file_striped(path, streams)
+            results[f"streams_{streams}_MBps"] = mb / (time.perf_counter() - start)
+            client.close()
+        server.stop()
+        thread.join()
+    return results
+
+
+def bench_mmap(count: int = 20_000) -> dict:
+    """One file of `count` full packets, sent with read() chunks vs through memory maps."""
+    path = os.path.join(tempfile.mkdtemp(), "input.bin")
+    with open(path, "wb") as f:
+        f.write(os.urandom(count * MAX_PAYLOAD))
+    mb = count * MAX_PAYLOAD / 1e6
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = UDPServer(port=0, outfile=os.path.join(tempfile.mkdtemp(), "received.bin"))
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        for name, use_mmap in (("read", False), ("mmap", True)):
+            client = UDPClient(port=server.sock.getsockname()[1], window=64)
+            start = time.perf_counter()
+            client.send_file(path, use_mmap=use_mmap)
+            results[f"{name}_MBps"] = mb / (time.perf_counter() - start)
+            client.close()
+        server.stop()
+        thread.join()
+    return results
+
+
+def bench_chunks(count: int = 20_000) -> dict:
+    """
+    A file of `count` default-size packets, sent with negotiated chunk sizes:
+    the default, the largest that fit a 1500 and a 9000 byte MTU, and up to
+    the largest a datagram can hold (loopback's MTU is 64K).
+    """
+    path = os.path.join(tempfile.mkdtemp(), "input.bin")
+    with open(path, "wb") as f:
+        f.write(os.urandom(count * MAX_PAYLOAD))
+    mb = count * MAX_PAYLOAD / 1e6
+    ip_udp = 28
+    sizes = (MAX_PAYLOAD, 1500 - ip_udp - _HDR_LAST_SIZE, 9000 - ip_udp - _HDR_LAST_SIZE,
+             16_000, 32_000, MAX_CHUNK)
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = UDPServer(port=0, outfile=os.path.join(tempfile.mkdtemp(), "received.bin"))
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        for chunk in sizes:
+            client = UDPClient(port=server.sock.getsockname()[1], window=64, chunk_size=chunk)
+            start = time.perf_counter()
+            client.send_file(path)
+            results[f"chunk_{chunk}_MBps"] = mb / (time.perf_counter() - start)
+            client.close()
+        server.stop()
+        thread.join()
+    return results
+
+
+def bench_checksum(count: int = 2000) -> dict:
+    """
+    MB/s of every checksum backend over 64 KiB buffers, plus full-size packets
+    per second parsed with each. The pure-Python CRC32C fallback runs 1/1000
+    of the iterations, or it would take minutes.
+    """
+    block = os.urandom(64 * 1024)
+    payload = os.urandom(MAX_PAYLOAD)
+    results = {}
+    for backend in checksums.BACKENDS:
+        n = count if backend.name != "crc32c" or checksums.HARDWARE_CRC32C else max(1, count // 1000)
+        results[f"{backend.name}_MBps"] = _rate(lambda: backend.update(block), n) * len(block) / 1e6
+    for backend in checksums.BACKENDS:
+        n = 50 * count if backend.name != "crc32c" or checksums.HARDWARE_CRC32C else count
+        pkt = Packet.create(1, payload, csum=backend.id)
+        results[f"{backend.name}_parse_pps"] = _rate(lambda: Packet.parse_from(pkt), n)
+    return results
+
+
+def bench_batch(count: int = 100_000) -> dict:
+    """
+    Packets per second when packetizing `count` full payloads one `create`
+    at a time vs with `create_many` in batches of 1024 (with and without
+    NumPy), and when parsing them one `parse_from` at a time vs with `parse_many`.
+    """
+    data = memoryview(os.urandom(count * MAX_PAYLOAD))
+    batch = 1024
+    buf = bytearray(batch * (_HDR_SIZE + MAX_PAYLOAD))
+
+    def one_by_one():
+        return [Packet.create(i, data[i * MAX_PAYLOAD:(i + 1) * MAX_PAYLOAD]) for i in range(count)]
+
+    def batched():
+        # Batches of `batch` packets, built in one reused buffer
+        for seq in range(0, count, batch):
+            Packet.create_many(data[seq * MAX_PAYLOAD:(seq + batch) * MAX_PAYLOAD], seq, buf=buf)
+
+    def check():
+        # `buf` holds the timed batches by now: one more must still parse cleanly
+        pkts = Packet.create_many(data[:batch * MAX_PAYLOAD], 0, buf=buf)
+        assert None not in Packet.parse_many(pkts), "create_many built invalid packets in a reused buffer"
+
+    results = {"create_pps": _rate(one_by_one, 1) * count}
+    if packet.np is not None:
+        results["create_many_numpy_pps"] = _rate(batched, 1) * count
+        check()
+    saved, packet.np = packet.np, None
+    try:
+        results["create_many_pps"] = _rate(batched, 1) * count
+        check()
+    finally:
+        packet.np = saved
+    packets = Packet.create_many(data)
+    results["parse_from_pps"] = _rate(lambda: [Packet.parse_from(p) for p in packets], 1) * count
+    results["parse_many_pps"] = _rate(lambda: Packet.parse_many(packets), 1) * count
+    return results
+
+
+def bench_compress(count: int = 20_000) -> dict:
+    """
+    Loopback transfer of `count` full packets of log-like text, raw and with
+    every available codec: bytes received by the server per byte of data, and
+    MB/s of data. Random (incompressible) data shows what the raw fallback costs.
+    """
+    lines = (b"%d 10.0.%d.%d GET /api/items/%d 200 %d ms\n" % (i, i % 7, i % 251, i % 1000, i % 97)
+             for i in range(count * MAX_PAYLOAD // 20))
+    text = b"".join(lines)[:count * MAX_PAYLOAD]
+    noise = os.urandom(len(text))
+    mb = len(text) / 1e6
+    results = {}
+    for name in [None] + sorted(compression.BY_NAME):
+        label = name or "raw"
+        for kind, data in (("text", text), ("random", noise)):
+            elapsed, _, server = _transfer(data, {"window": 64, "compress": name})
+            results[f"{label}_{kind}_wire_pct"] = 100 * server.stats["bytes"] / len(data)
+            results[f"{label}_{kind}_MBps"] = mb / elapsed
+    return results
+
+
+def bench_fec(count: int = 2000) -> dict:
+    """
+    Seconds to send `count` full packets through a LossyRelay at several loss
+    rates, without FEC, with XOR parity (8 data + 1 parity) and with
+    Reed-Solomon parity (16 data + 4 parity). Same relay seed for every run.
+    """
+    data = os.urandom(count * MAX_PAYLOAD)
+    schemes = (("none", {}), ("xor_8_1", {"fec_group": 8, "fec_parity": 1}),
+               ("rs_16_4", {"fec_group": 16, "fec_parity": 4}))
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = UDPServer(port=0, outfile=os.path.join(tempfile.mkdtemp(), "received.bin"))
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        for loss in (0.0, 0.01, 0.05, 0.1):
+            for name, kwargs in schemes:
+                relay = LossyRelay(("127.0.0.1", server.sock.getsockname()[1]), loss=loss, seed=1)
+                relay.start()
+                client = UDPClient(port=relay.port, window=64, min_rto=0.05, **kwargs)
+                start = time.perf_counter()
+                try:
+                    client.send_data(data)
+                finally:
+                    relay.stop()
+                    client.close()
+                results[f"loss_{loss:.0%}_{name}_ms"] = 1000 * (time.perf_counter() - start)
+        results["recovered"] = server.stats["recovered"]
+        server.stop()
+        thread.join()
+    return results
+
+
+def bench_reassembly(count: int = 1_000_000) -> dict:
+    """
+    Chunks per second through the receive window, dict vs ring buffer, for
+    `count` full payloads: with 10% of them late by 1-16 packets (window 64),
+    the same with 1% duplicates on top, and with 1% lost and resent 200-800
+    packets later (window 1024). A SACK is built every 16 chunks, as the
+    server does.
+    """
+    payload = memoryview(bytearray(os.urandom(MAX_PAYLOAD)))
+    rng = random.Random(1)
+    late = [seq + rng.randint(1, 16) if rng.random() < 0.1 else seq for seq in range(count)]
+    reordered = sorted(range(count), key=late.__getitem__)
+    duplicated = [seq for seq in reordered for _ in range(2 if rng.random() < 0.01 else 1)]
+    resent = [seq + rng.randint(200, 800) if rng.random() < 0.01 else seq for seq in range(count)]
+    lost = sorted(range(count), key=resent.__getitem__)
+
+    def run(window, order):
+        flushed = 0
+        for n, seq in enumerate(order):
+            for chunk in window.offer(seq, payload):
+                flushed += len(chunk)
+            if not n & 15:
+                window.sack_ranges()
+        assert window.expected == count and flushed == count * MAX_PAYLOAD
+
+    results = {}
+    for name, order, size in (("reordered", reordered, 64), ("duplicates", duplicated, 64),
+                              ("lost", lost, 1024)):
+        for label, make in (("dict", _DictRecvWindow), ("ring", RecvWindow)):
+            results[f"{name}_{label}_cps"] = _rate(lambda: run(make(size), order), 1, repeat=1) * count
+    return results
+
+
+SCENARIOS = {
+    "packet": bench_packet,
+    "io": bench_io,
+    "sessions": bench_sessions,
+    "stripes": bench_stripes,
+    "mmap": bench_mmap,
+    "chunks": bench_chunks,
+    "checksum": bench_checksum,
+    "batch": bench_batch,
+    "compress": bench_compress,
+    "fec": bench_fec,
+    "reassembly": bench_reassembly,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Branch-3 micro-benchmarks")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS), help="Benchmark to run")
+    parser.add_argument("--count", type=int, default=100_000, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    for name, value in SCENARIOS[args.scenario](args.count).items():
+        print(f"{name:24s} {value:14,.0f}")
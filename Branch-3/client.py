@@ -1,59 +1,618 @@
+import errno
+import os
+import mmap
 import socket
 import argparse
+import random
+import time
 import zlib
-from packet import Packet, TYPE_DATA
+from packet import (Packet, ChecksumError, StripeInfo, Setup, TYPE_DATA, TYPE_ACK, TYPE_SACK, TYPE_RESUME,
+                    TYPE_SETUP, COMPRESSED, MAX_PAYLOAD, MAX_CHUNK, FEC_EXTRA, _HDR_LAST_SIZE)
+from window import SendWindow, MODES, SELECTIVE_REPEAT
+from rto import RTTEstimator
+from batchio import BatchIO
+from engine import Engine
+import checksums
+import compression
+import congestion
+import fec
+from metrics import Metrics, COUNT_BOUNDS
+
+# Later packets ACKed before a missing one that trigger its fast retransmit
+DUPACK_THRESHOLD = 3
+
+# Path MTU discovery (Linux values where the socket module lacks them)
+IP_MTU_DISCOVER = getattr(socket, "IP_MTU_DISCOVER", 10)
+IP_PMTUDISC_DO = getattr(socket, "IP_PMTUDISC_DO", 2)
+IP_MTU = getattr(socket, "IP_MTU", 14)
+IP_UDP_OVERHEAD = 20 + 8    # IPv4 + UDP headers
 
 class UDPClient:
-    def __init__(self, host="127.0.0.1", port=6000):
+    def __init__(self, host="127.0.0.1", port=6000, window=32, mode=SELECTIVE_REPEAT,
+                 initial_rto=1.0, min_rto=0.02, max_rto=8.0, max_retries=10, cc="reno",
+                 batch=True, chunk_size=MAX_PAYLOAD, probe_mtu=False, checksum="crc32", compress=None,
+                 fec_group=0, fec_parity=1, metrics=None):
+        """
+        `chunk_size` other than MAX_PAYLOAD is proposed to the server at the start
+        of every transfer; with `probe_mtu` the proposal is the largest chunk that
+        fits the path MTU instead. `checksum` names the CHK algorithm of the
+        data packets (see checksums.py). `compress` names a codec (see
+        compression.py) to propose for the payloads. With `fec_group` N > 0,
+        every N data packets are followed by `fec_parity` K parity packets
+        (see fec.py) if the server agrees. `metrics` (see metrics.py) collects
+        retransmits, timeouts, RTT samples, packets in flight and transfer
+        durations with the socket's I/O counters, and traces every packet.
+        """
         self.host = host
         self.port = port
+        self.window = window
+        self.mode = mode
+        self.cc_name = cc
+        self.cc = None          # strategy of the last transfer, keeps its cwnd trace
+        self.conn_id = None     # transfer ID (CONN) of the last transfer
+        self.chunk_size = chunk_size
+        self.probe_mtu = probe_mtu
+        self.chunk = MAX_PAYLOAD    # chunk size agreed for the last transfer
+        self.dupacks = DUPACK_THRESHOLD     # later packets ACKed that make a hole lost
+        self.csum = checksums.get(checksum).id
+        self.compress = compression.get(compress) if compress else None
+        if fec_group:
+            fec.parity_matrix(fec_group, fec_parity)     # validates N and K
+        self.fec = (fec_group, fec_parity) if fec_group else (0, 0)
+        self.max_retries = max_retries
+        self.rtt = RTTEstimator(initial_rto, min_rto, max_rto)
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.settimeout(1)
+        self.io = BatchIO(self.sock, batch=batch)
+        self.engine = None      # Engine driving the transfer in progress, if any
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.include(self.io.stats)
+        # Settings for the extra flows of a striped transfer
+        self.settings = dict(window=window, mode=mode, initial_rto=initial_rto, min_rto=min_rto,
+                             max_rto=max_rto, max_retries=max_retries, cc=cc, batch=batch,
+                             chunk_size=chunk_size, probe_mtu=probe_mtu, checksum=checksum,
+                             compress=compress, fec_group=fec_group, fec_parity=fec_parity)
+
+    def close(self):
+        """Release the socket (unregistering it from a transfer's engine first)."""
+        if self.engine is not None:
+            self.engine.unregister(self.sock)
+            self.engine = None
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def send_data(self, data: bytes):
-        file_checksum = zlib.crc32(data) & 0xFFFFFFFF
-        seq = 0
-        for i in range(0, len(data), 1000):
-            chunk = data[i:i+1000]
+        conn_id, setup = self._open()
+        chunk = setup.chunk
+        view = memoryview(data)     # slices without copying
+        return self.send_stream((view[i:i+chunk] for i in range(0, len(view), chunk)),
+                                conn_id=conn_id, setup=setup)
+
+    def send_file(self, path: str, resume: bool = False, use_mmap: bool = False):
+        """
+        Stream a file from disk, one chunk at a time (memory does not grow with file size).
+        With `resume`, first ask the server which chunks it already has from an
+        earlier, interrupted attempt, and send only the missing ones.
+        With `use_mmap`, map the file instead of reading it (see `_send_mapped`).
+        """
+        conn_id, setup = self._open()
+        if resume:
+            return self._send_resumable(path, conn_id, setup)
+        if use_mmap and os.path.getsize(path) > 0:     # an empty file cannot be mapped
+            return self._send_mapped(path, conn_id, setup)
+        with open(path, "rb") as f:
+            return self.send_stream(iter(lambda: f.read(setup.chunk), b""), conn_id=conn_id, setup=setup)
+
+    def _send_resumable(self, path: str, conn_id: int, setup: Setup):
+        size, chunk = os.path.getsize(path), setup.chunk
+        file_checksum = _file_crc(path)
+        # Same file, same ID: lets a later attempt (even from a new process) find the partial upload
+        resume_id = zlib.crc32(f"{os.path.abspath(path)}:{size}".encode())
+        ranges = self._handshake(Packet.create_resume(resume_id, size, file_checksum, conn_id), conn_id)
+        missing = sum(end - start for start, end in ranges)
+        print(f"Server needs {missing} of {max(1, -(-size // chunk))} chunks")
+        return self.send_stream(_read_chunks(path, ranges, chunk), conn_id=conn_id, fchk=file_checksum,
+                                setup=setup)
+
+    def _send_mapped(self, path: str, conn_id: int, setup: Setup):
+        """
+        Send a file through a read-only memory map: packets are built from
+        slices of the page cache, with no read() copy per chunk. SEQ 0
+        announces the size, so the server can map its output file too.
+        """
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)
+        try:
+            size, chunk = len(view), setup.chunk
+            return self.send_stream((view[i:i+chunk] for i in range(0, size, chunk)),
+                                    conn_id=conn_id, size=size, setup=setup)
+        finally:
+            view.release()
+            try:
+                mm.close()
+            except BufferError:
+                pass    # a slice is still referenced; the map goes away with it
+
+    def _handshake(self, pkt: bytes, conn_id: int) -> list[tuple[int, int]]:
+        """Send a TYPE_RESUME request until the server answers; returns the missing ranges."""
+        for attempt in range(self.max_retries + 1):
+            ranges = self._request(pkt, TYPE_RESUME, conn_id, Packet.parse_resume_reply, attempt)
+            if ranges is not None:
+                return ranges
+            print("Timeout waiting for resume reply")
+            self.rtt.backoff()
+        raise TimeoutError(f"No resume reply after {self.max_retries} retransmissions")
+
+    def _open(self) -> tuple[int, Setup]:
+        """
+        ID and Setup (chunk size, codec, FEC group) of a new transfer. They are
+        negotiated unless they are the defaults.
+        """
+        conn_id = random.getrandbits(32)
+        setup = Setup(MAX_PAYLOAD, 0, 0, 0)
+        if (self.probe_mtu or self.chunk_size != MAX_PAYLOAD or self.compress is not None
+                or self.fec[0]):
+            setup = self._negotiate(conn_id)
+        self.chunk = setup.chunk
+        return conn_id, setup
+
+    def _negotiate(self, conn_id: int) -> Setup:
+        """
+        TYPE_SETUP handshake: propose a chunk size, codec and FEC group, get
+        back the ones the server agrees to. A proposal that gets no answer may
+        be too big for the path (dropped without an ICMP error), so each retry
+        halves it, down to MAX_PAYLOAD.
+        """
+        codec = self.compress.id if self.compress is not None else 0
+        chunk = self._path_chunk() if self.probe_mtu else self.chunk_size
+        if self.fec[0]:
+            # Parity packets are FEC_EXTRA bytes bigger than the biggest data packet
+            chunk = max(1, chunk - FEC_EXTRA) if self.probe_mtu else min(chunk, MAX_CHUNK - FEC_EXTRA)
+        for attempt in range(self.max_retries + 1):
+            try:
+                agreed = self._request(Packet.create_setup(chunk, conn_id, codec, *self.fec), TYPE_SETUP,
+                                       conn_id, Packet.parse_setup, attempt)
+            except OSError as e:
+                if e.errno != errno.EMSGSIZE:
+                    raise
+                agreed = None   # larger than the MTU the kernel knows for the route
+            if agreed is not None:
+                return agreed
+            print(f"No setup reply for chunk size {chunk}")
+            self.rtt.backoff()
+            if chunk > MAX_PAYLOAD:
+                chunk = max(MAX_PAYLOAD, chunk // 2)
+        raise TimeoutError(f"No setup reply after {self.max_retries} retransmissions")
+
+    def _path_chunk(self) -> int:
+        """
+        Largest chunk whose packets fit the path MTU to the server, as the
+        kernel knows it. Also sets DF on our socket, so a bigger datagram fails
+        with EMSGSIZE instead of being fragmented.
+        """
+        try:
+            self.sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.connect((self.host, self.port))   # IP_MTU needs a route
+                s.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+                mtu = s.getsockopt(socket.IPPROTO_IP, IP_MTU)
+        except OSError:
+            return MAX_PAYLOAD  # no PMTU discovery on this platform
+        return max(1, min(MAX_CHUNK, mtu - IP_UDP_OVERHEAD - _HDR_LAST_SIZE))
+
+    def _request(self, pkt: bytes, reply_type: int, conn_id: int, parse, attempt: int):
+        """Send a handshake packet and wait one RTO for its reply; returns parse(payload) or None."""
+        addr = (self.host, self.port)
+        sent = time.monotonic()
+        deadline = sent + self.rtt.rto
+        self.io.send(pkt, addr)
+        while (now := time.monotonic()) < deadline:
+            for view, _ in self.io.recv_batch(deadline - now):
+                try:
+                    pkt_type, _, payload, _, ack_conn = Packet.parse_from(view)
+                    if pkt_type != reply_type or ack_conn != conn_id:
+                        continue
+                    reply = parse(payload)
+                except ValueError as e:
+                    print("Error parsing handshake reply:", e)
+                    continue
+                if attempt == 0:
+                    # Karn: only an unambiguous reply gives an RTT sample
+                    self.rtt.sample(time.monotonic() - sent)
+                return reply
+        return None
+
+    def send_file_striped(self, path: str, streams: int = 4):
+        """
+        Send a file as `streams` byte ranges over as many concurrent flows,
+        each with its own socket, window and congestion control, all driven
+        by one Engine on this thread. The server writes every range at its
+        offset, then checks the whole-file CRC32 carried in each stripe's
+        descriptor.
+        """
+        size = os.path.getsize(path)
+        conn_id, setup = self._open()
+        chunk = setup.chunk
+        packets = -(-size // chunk)
+        if min(streams, packets) <= 1:
+            return self.send_stream(_read_range(path, 0, size, chunk), conn_id=conn_id, setup=setup)
+
+        file_checksum = _file_crc(path)
+        # Stripes are a whole number of packets long, so only the very last packet is short
+        per = -(-packets // streams) * chunk
+        offsets = range(0, size, per)
+        group_id = random.getrandbits(32)
+        stripes = [StripeInfo(group_id, i, len(offsets), off, min(per, size - off), size, file_checksum)
+                   for i, off in enumerate(offsets)]
+
+        engine = Engine()
+        clients, senders = [], []
+        try:
+            for info in stripes:
+                client, cid, stream_setup = self, conn_id, setup
+                if info.index > 0:
+                    # The other flows ask for the size this one got
+                    client = UDPClient(self.host, self.port, metrics=self.metrics,
+                                       **dict(self.settings, chunk_size=chunk, probe_mtu=False))
+                    clients.append(client)
+                    cid, stream_setup = client._open()
+                senders.append(Sender(client, engine, _read_range(path, info.offset, info.length,
+                                                                  stream_setup.chunk),
+                                      stripe=info, conn_id=cid, setup=stream_setup))
+            for sender in senders:
+                sender.start()
+            engine.run(lambda: not all(sender.done for sender in senders))
+        finally:
+            for sender in senders:
+                sender.close()
+            engine.close()
+            for client in clients:
+                client.close()
+        print(f"Striped transfer complete ({len(stripes)} streams). "
+              f"Final CRC32 checksum: {file_checksum:08x}")
+
+    def send_stream(self, chunks, stripe: StripeInfo = None, conn_id: int = None, fchk: int = None,
+                    size: int = None, setup: Setup = None):
+        """
+        Send an iterable of payload chunks (each at most the agreed chunk size).
+        Chunks are pulled lazily as the window opens, and the file checksum
+        is updated as they go, so only the packets in flight stay in memory.
+        With `stripe`, SEQ 0 is its descriptor and the chunks follow from SEQ 1;
+        with `size`, SEQ 0 is a TYPE_META packet announcing the file size.
+        `setup` is what the server agreed to: with a codec, payloads are
+        compressed as one stream; with a FEC group, parity packets follow
+        every group of data packets.
+        `conn_id` and `fchk` (sent instead of the chunks' CRC) are given by a
+        resumed transfer, which was agreed on beforehand and sends only part of the file.
+        """
+        engine = Engine()
+        sender = Sender(self, engine, chunks, stripe, conn_id, fchk, size, setup)
+        try:
+            sender.start()
+            engine.run(lambda: not sender.done)
+        finally:
+            sender.close()
+            engine.close()
 
-           # TODO: If this is the last packet, include file_checksum
-            # pkt = Packet.create(......)
-            # else: normal packet
-            # pkt = Packet.create(......)
 
-            if i + 1000 >= len(data):
+class Sender:
+    """
+    Send state of one transfer, driven by an Engine: the window with a
+    retransmission timer per packet in flight, congestion control, and the
+    chunks still to send. The UDPClient it belongs to provides the socket,
+    settings and RTT estimator.
+    """
+    def __init__(self, client: UDPClient, engine: Engine, chunks, stripe: StripeInfo = None,
+                 conn_id: int = None, fchk: int = None, size: int = None, setup: Setup = None):
+        self.client = client
+        self.engine = engine
+        self.chunks = iter(chunks)
+        self.stripe = stripe
+        self.size = size
+        self.fchk = fchk
+        self.file_checksum = 0
+        # Look one chunk ahead to know which packet is the last one.
+        # An empty file still sends one (empty) last packet carrying FCHK
+        self.pending = next(self.chunks, b"")
+        self.last = None
+
+        # A fresh random ID per transfer keeps it apart from other clients' transfers
+        # and from late ACKs of our own previous one
+        if conn_id is None:
+            conn_id = random.getrandbits(32)
+        self.conn_id = client.conn_id = conn_id
+        self.win = SendWindow(client.window, client.mode)
+        self.stream = compression.Stream(compression.CODECS.get(setup.codec) if setup else None)
+        self.encoder = fec.Encoder(setup.fec_n, setup.fec_k) if setup and setup.fec_n else None
+        # With FEC, give a hole the time for its group's parity to arrive and
+        # rebuild it before counting it as lost
+        self.dupacks = client.dupacks = DUPACK_THRESHOLD + (setup.fec_n if self.encoder is not None else 0)
+        self.cc = client.cc = congestion.create(client.cc_name, max_cwnd=client.window)
+        self.recover = -1       # no new window reduction until seqs up to here are resolved
+        self.addr = (client.host, client.port)
+        # Packets sent together share a deadline and one timer: seq -> the
+        # list of seqs armed with it. ACKed seqs are just dropped from here,
+        # so their timer fires for nothing instead of being cancelled one by one
+        self.timers = {}
+        self.expired = []       # seqs whose timer fired this turn
+        self.metrics = client.metrics
+        self.trace = self.metrics.trace if self.metrics is not None else None
+        self.started = None
+        self.registered = False
+        self.done = False
+
+    def start(self):
+        """Send the first window; the engine does the rest."""
+        self.engine.register(self.client.sock, self._on_readable)
+        self.engine.add_hook(self._pump)
+        self.registered = True
+        self.client.engine = self.engine
+        now = self.started = time.monotonic()
+        if self.stripe is not None or self.size is not None:
+            if self.stripe is not None:
+                pkt = Packet.create_stripe(self.stripe, self.conn_id)
+            else:
+                pkt = Packet.create_meta(self.size, self.conn_id)
+            self._arm([self.win.push(pkt, now)], now)
+            self.client.io.send(pkt, self.addr)
+        self._pump(now)
+
+    def close(self):
+        """Stop being driven by the engine (done, or given up)."""
+        self.timers.clear()     # timers still in the wheel fire for nothing
+        if self.registered:
+            self.engine.unregister(self.client.sock)
+            self.engine.remove_hook(self._pump)
+            self.registered = False
+            self.client.engine = None
+
+    def _arm(self, seqs, now):
+        """One retransmission timer for packets (re)sent at `now`."""
+        group = list(seqs)
+        for seq in group:
+            self.timers[seq] = group
+        self.engine.call_at(now + self.client.rtt.rto, self._on_timer, group)
+
+    def _resent(self, seqs, now):
+        """Record retransmissions and re-arm their timers."""
+        win = self.win
+        for seq in seqs:
+            win.resent(seq, now)
+        self._arm([seq for seq in seqs if seq not in win.acked], now)
+
+    def _on_timer(self, group):
+        timers = self.timers
+        for seq in group:
+            # Not ACKed or re-armed since
+            if timers.get(seq) is group:
+                del timers[seq]
+                self.expired.append(seq)
+
+    def _pump(self, now):
+        """After every engine turn: resend what timed out, then fill the window."""
+        if self.done:
+            return
+        if self.expired:
+            expired, self.expired = self.expired, []
+            self._retransmit(expired, now)
+        client, win, conn_id, encoder, trace = self.client, self.win, self.conn_id, self.encoder, self.trace
+        # Fill the window: the send window bounds the SEQ span, cwnd the packets in flight
+        burst, seqs = [], []
+        while self.last is None and win.can_send() and win.in_flight() < self.cc.window():
+            seq = win.next_seq
+            chunk, self.pending = self.pending, next(self.chunks, None)
+            self.file_checksum = zlib.crc32(chunk, self.file_checksum)
+            # FCHK covers the file as it is, the packet CHK what is on the wire
+            codec_id, chunk = self.stream.encode(chunk)
+            pkt_type = TYPE_DATA | COMPRESSED if codec_id else TYPE_DATA
+            if self.pending is None:
                 # Last packet
-                pkt = Packet.create(seq, chunk, TYPE_DATA, file_checksum)
+                self.last = seq
+                if self.fchk is not None:
+                    self.file_checksum = self.fchk
+                pkt = Packet.create(seq, chunk, pkt_type, self.file_checksum, conn_id, client.csum)
             else:
                 # Normal packet
-                pkt = Packet.create(seq, chunk, TYPE_DATA)
-
-            self.sock.sendto(pkt, (self.host, self.port))
+                pkt = Packet.create(seq, chunk, pkt_type, conn_id=conn_id, csum=client.csum)
+            win.push(pkt, now)
+            seqs.append(seq)
+            burst.append(pkt)
+            if trace is not None:
+                trace("send", self.addr, conn_id, seq, pkt_type, len(pkt))
+            if encoder is not None:
+                # Parity goes out once per group and is never retransmitted or ACKed
+                last = self.last is not None
+                parity = encoder.add(seq, pkt_type, chunk, self.file_checksum if last else None)
+                if last:
+                    parity += encoder.flush()
+                burst.extend(Packet.create_fec(first, n, encoder.k, index, p, conn_id, client.csum)
+                             for first, n, index, p in parity)
+        if burst:
+            self._arm(seqs, now)
+            client.io.send_batch(burst, self.addr)
+            if self.metrics is not None:
+                self.metrics.observe("in_flight", win.in_flight(), COUNT_BOUNDS)
 
+    def _on_readable(self, now):
+        for view, _ in self.client.io.drain():
             try:
-                ack, _ = self.sock.recvfrom(2048)
-                ack_type, ack_seq, _, _ = Packet.parse(ack)
-                if ack_seq != seq:
-                    print(f"Unexpected ACK seq {ack_seq}, expected {seq}")
-            except socket.timeout:
-                print(f"Timeout waiting for ACK {seq}")
-
-            seq += 1
+                ack_type, ack_seq, payload, _, ack_conn = Packet.parse_from(view)
+                if ack_conn != self.conn_id:
+                    continue
+                if self.trace is not None:
+                    self.trace("recv", self.addr, ack_conn, ack_seq, ack_type, len(view))
+                if ack_type == TYPE_SACK:
+                    cum_ack, ranges = ack_seq, Packet.parse_sack(payload)
+                elif ack_type == TYPE_ACK:
+                    # Per-packet ACK; the server holds the last one until the file is complete
+                    cum_ack = self.last + 1 if ack_seq == self.last else 0
+                    ranges = [(ack_seq, ack_seq + 1)]
+                else:
+                    continue
+            except ValueError as e:
+                if self.metrics is not None and isinstance(e, ChecksumError):
+                    self.metrics.inc("checksum_failures")
+                print("Error parsing ACK:", e)
+                continue
+            if self._on_sack(cum_ack, ranges):
+                self._finish()
+                break
 
+    def _finish(self):
+        self.done = True
+        self.close()
+        if self.metrics is not None:
+            self.metrics.observe("transfer_seconds", time.monotonic() - self.started)
         # TODO: Print message confirming transfer complete
         # and that the final checksum was sent
-        print(f"Transfer complete. Final CRC32 checksum: {file_checksum:08x}")
+        print(f"Transfer complete. Final CRC32 checksum: {self.file_checksum:08x}")
+
+    def _on_sack(self, cum_ack, ranges) -> bool:
+        """Process one (S)ACK; returns True once the cumulative ACK covers the last packet."""
+        win, rtt_estimator = self.win, self.client.rtt
+        now = time.monotonic()
+        # Sample the RTT on the newest packet this ACK covers
+        top = max([cum_ack - 1] + [end - 1 for _, end in ranges])
+        rtt = win.rtt_sample(top, now)
+        if rtt is not None:
+            rtt_estimator.sample(rtt)
+            if self.metrics is not None:
+                self.metrics.observe("rtt_seconds", rtt)
+        newly = win.sack(cum_ack, ranges)
+        if self.last is not None and cum_ack > self.last:
+            return True
+        for seq in newly:
+            self.timers.pop(seq, None)
+            self.cc.on_ack(now, rtt_estimator.srtt)
+        holes = win.lost(self.dupacks)
+        if holes:
+            self._fast_retransmit(holes, now)
+        return False
+
+    def _retransmit(self, expired, now):
+        win, client = self.win, self.client
+        oldest = min(expired)
+        if win.retries[oldest] >= client.max_retries:
+            raise TimeoutError(f"No ACK for seq {oldest} after {client.max_retries} retransmissions")
+        print(f"Timeout waiting for ACK {oldest}")
+
+        # Exponential backoff, then resend per window mode (GBN: all, SR: expired only)
+        client.rtt.backoff()
+        self.cc.on_timeout(now)
+        self.recover = win.next_seq - 1
+        seqs = win.retransmit_seqs(expired)
+        client.io.send_batch([win.packets[seq] for seq in seqs], self.addr)
+        self._resent(seqs, now)
+        if self.metrics is not None:
+            self._count_retransmits("timeouts", seqs)
+
+    def _fast_retransmit(self, holes, now):
+        win = self.win
+        # Only one multiplicative decrease per window of data
+        if holes[0] > self.recover:
+            self.cc.on_loss(now)
+            self.recover = win.next_seq - 1
+        # Resend only the holes the SACKs reported
+        self.client.io.send_batch([win.packets[seq] for seq in holes], self.addr)
+        self._resent(holes, now)
+        if self.metrics is not None:
+            self._count_retransmits("fast_retransmits", holes)
+
+    def _count_retransmits(self, cause, seqs):
+        self.metrics.inc(cause)
+        self.metrics.inc("retransmits", len(seqs))
+        if self.trace is not None:
+            for seq in seqs:
+                pkt = self.win.packets[seq]
+                self.trace("retransmit", self.addr, self.conn_id, seq, Packet.parse_from(pkt).pkt_type, len(pkt))
+
+def _file_crc(path) -> int:
+    """CRC32 of a whole file, read in large blocks."""
+    crc = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            crc = zlib.crc32(block, crc)
+    return crc
+
+def _read_chunks(path, ranges, chunk=MAX_PAYLOAD):
+    """The chunks (`chunk`-sized pieces) of a file listed by [start, end) index ranges."""
+    with open(path, "rb") as f:
+        for start, end in ranges:
+            f.seek(start * chunk)
+            for _ in range(start, end):
+                yield f.read(chunk)
+
+def _read_range(path, offset, length, chunk=MAX_PAYLOAD):
+    """Chunks of at most `chunk` bytes covering [offset, offset + length) of a file."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while length > 0:
+            data = f.read(min(chunk, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="UDP File Client")
     parser.add_argument("--host", type=str, default="127.0.0.1", help="Server host")
     parser.add_argument("--port", type=int, default=6000, help="Server port")
     parser.add_argument("--file", type=str, required=True, help="File to send")
+    parser.add_argument("--window", type=int, default=32, help="Packets kept in flight")
+    parser.add_argument("--mode", choices=MODES, default=SELECTIVE_REPEAT,
+                        help="Retransmission mode: Go-Back-N or Selective Repeat")
+    parser.add_argument("--max-retries", type=int, default=10,
+                        help="Retransmissions per packet before giving up")
+    parser.add_argument("--cc", choices=sorted(congestion.ALGORITHMS), default="reno",
+                        help="Congestion control algorithm")
+    parser.add_argument("--no-batch", action="store_true",
+                        help="One syscall per datagram instead of batched I/O")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume an interrupted upload of this file (send only missing chunks)")
+    parser.add_argument("--streams", type=int, default=1,
+                        help="Send the file as this many byte ranges over concurrent flows")
+    parser.add_argument("--chunk-size", type=int, default=MAX_PAYLOAD,
+                        help="Payload bytes per packet to negotiate with the server")
+    parser.add_argument("--probe-mtu", action="store_true",
+                        help="Negotiate the largest chunk size that fits the path MTU")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Memory-map the file instead of reading it chunk by chunk")
+    parser.add_argument("--checksum", choices=sorted(checksums.BY_NAME), default="crc32",
+                        help="Checksum algorithm of the data packets")
+    parser.add_argument("--compress", choices=sorted(compression.BY_NAME), default=None,
+                        help="Compress the payloads with this codec, if the server supports it")
+    parser.add_argument("--fec", type=str, default=None, metavar="N:K",
+                        help="Send K parity packets after every N data packets (K=1: XOR, else Reed-Solomon)")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Write the cwnd trace (seconds,cwnd) to this CSV file")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Print the transfer's metrics as JSON at the end")
     args = parser.parse_args()
+    if args.streams > 1 and (args.resume or args.mmap):
+        # A striped transfer is neither resumable nor memory-mapped
+        parser.error("--streams cannot be combined with --resume or --mmap")
+    fec_group, fec_parity = map(int, args.fec.split(":")) if args.fec else (0, 1)
 
-    with open(args.file, "rb") as f:
-        data = f.read()
-
-    client = UDPClient(host=args.host, port=args.port)
-    client.send_data(data)
+    client = UDPClient(host=args.host, port=args.port, window=args.window, mode=args.mode,
+                       max_retries=args.max_retries, cc=args.cc, batch=not args.no_batch,
+                       chunk_size=args.chunk_size, probe_mtu=args.probe_mtu, checksum=args.checksum,
+                       compress=args.compress, fec_group=fec_group, fec_parity=fec_parity,
+                       metrics=Metrics(prefix="udp_client") if args.metrics else None)
+    if args.streams > 1:
+        client.send_file_striped(args.file, args.streams)
+    else:
+        client.send_file(args.file, resume=args.resume, use_mmap=args.mmap)
 
+    if args.trace:
+        with open(args.trace, "w") as f:
+            f.write("seconds,cwnd\n")
+            for t, cwnd in client.cc.trace:
+                f.write(f"{t:.6f},{cwnd:.2f}\n")
+    if args.metrics:
+        print("Metrics:", client.metrics.to_json())
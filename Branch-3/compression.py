@@ -0,0 +1,140 @@
+"""
+Payload compression for the packet layer.
+
+All payloads of one stream (one transfer, or one direction of a connection)
+share one compression context, so a small packet can refer back to text seen
+in earlier ones; compressed one by one, short log lines barely shrink. Every
+payload is flushed on its own, so it can be decompressed as soon as it
+arrives in order.
+
+    ID  name       codec
+    1   zlib       zlib level 6, one raw deflate stream (Z_SYNC_FLUSH after each payload)
+    2   zlib-fast  the same at level 1
+    3   lz4        LZ4 blocks with the previous 64 KiB of the stream as dictionary;
+                   needs the optional `lz4` package
+
+A payload that does not shrink is sent raw (codec ID 0). The sender then
+drops its context and sends the next 1, 2, 4, ... (up to 16) payloads raw
+without trying, so incompressible data costs next to nothing. The receiver
+drops its context on every raw payload, which keeps both sides in step.
+
+Every branch runs on its own, so Branch-2 and Branch-3 each carry a copy of
+this module. Keep the two the same: a fix goes into both (Branch-2's test 23
+checks that they match).
+"""
+import zlib
+from collections import namedtuple
+
+try:
+    import lz4.block as _lz4      # pip install lz4
+except ImportError:
+    _lz4 = None
+
+Codec = namedtuple("Codec", "id name compressor decompressor")
+
+MAX_SKIP = 16               # raw payloads sent without trying, at most, after one that did not shrink
+LZ4_DICT = 64 * 1024        # LZ4 dictionary: the latest bytes of the stream
+
+
+class _ZlibCompressor:
+    def __init__(self, level):
+        self.obj = zlib.compressobj(level, zlib.DEFLATED, -15)
+
+    def compress(self, data) -> bytes:
+        return self.obj.compress(data) + self.obj.flush(zlib.Z_SYNC_FLUSH)
+
+
+class _ZlibDecompressor:
+    def __init__(self):
+        self.obj = zlib.decompressobj(-15)
+
+    def decompress(self, data, limit: int) -> bytes:
+        out = self.obj.decompress(data, limit)
+        if self.obj.unconsumed_tail:
+            raise ValueError("Decompressed payload too large")
+        return out
+
+
+class _Lz4Compressor:
+    def __init__(self):
+        self.history = b""
+
+    def compress(self, data) -> bytes:
+        out = _lz4.compress(data, store_size=True, dict=self.history)
+        self.history = (self.history + data)[-LZ4_DICT:]
+        return out
+
+
+class _Lz4Decompressor:
+    def __init__(self):
+        self.history = b""
+
+    def decompress(self, data, limit: int) -> bytes:
+        if len(data) < 4 or int.from_bytes(data[:4], "little") > limit:
+            raise ValueError("Decompressed payload too large")
+        out = _lz4.decompress(data, dict=self.history)
+        self.history = (self.history + out)[-LZ4_DICT:]
+        return out
+
+
+ZLIB = Codec(1, "zlib", lambda: _ZlibCompressor(6), _ZlibDecompressor)
+ZLIB_FAST = Codec(2, "zlib-fast", lambda: _ZlibCompressor(1), _ZlibDecompressor)
+LZ4 = Codec(3, "lz4", _Lz4Compressor, _Lz4Decompressor)
+
+# Codecs this process can use, by ID and by name
+CODECS = {codec.id: codec for codec in (ZLIB, ZLIB_FAST, LZ4) if codec is not LZ4 or _lz4 is not None}
+BY_NAME = {codec.name: codec for codec in CODECS.values()}
+
+
+def get(name: str) -> Codec:
+    """Look up a codec by name ("zlib", "zlib-fast", "lz4")."""
+    try:
+        return BY_NAME[name]
+    except KeyError:
+        raise ValueError(f"Unknown or unavailable codec: {name}") from None
+
+
+class Stream:
+    """
+    Compression state of one stream. The sender calls `encode` on every
+    payload in order, the receiver `decode` on every payload in the same
+    order. `codec` (a Codec, or None to send everything raw) only matters to
+    the sender; the receiver follows the codec ID of each payload. Sending and
+    receiving state are separate, so one Stream can serve both directions of
+    a connection.
+    """
+    def __init__(self, codec: Codec = None):
+        self.codec = codec
+        self.compressor = None
+        self.skip = 0           # raw payloads still to send without trying
+        self.backoff = 1
+        self.decoder = None     # (codec, decompressor) of the receiving side
+
+    def encode(self, payload) -> tuple[int, bytes]:
+        """Return (codec ID, body) for the next payload; ID 0 means it is sent raw."""
+        if self.codec is not None and payload and not self.skip:
+            if self.compressor is None:
+                self.compressor = self.codec.compressor()
+            body = self.compressor.compress(payload)
+            if len(body) < len(payload):
+                self.backoff = 1
+                return self.codec.id, body
+            # Did not shrink: back off before trying again
+            self.skip = self.backoff
+            self.backoff = min(2 * self.backoff, MAX_SKIP)
+        elif self.skip:
+            self.skip -= 1
+        self.compressor = None      # every raw payload restarts the context
+        return 0, payload
+
+    def decode(self, codec_id: int, body, limit: int) -> bytes:
+        """The payload `encode` was given, from its codec ID and body (at most `limit` bytes)."""
+        if codec_id == 0:
+            self.decoder = None
+            return body
+        codec = CODECS.get(codec_id)
+        if codec is None:
+            raise ValueError("Unknown or unavailable codec")
+        if self.decoder is None or self.decoder[0] is not codec:
+            self.decoder = (codec, codec.decompressor())
+        return self.decoder[1].decompress(body, limit)
@@ -0,0 +1,151 @@
+"""
+Congestion control for the Branch-3 sender.
+
+The sender asks a `CongestionControl` strategy how many packets it may keep
+in flight (`window()`) and reports events to it:
+
+* `on_ack`     - a new packet was ACKed
+* `on_loss`    - fast retransmit (3 later packets ACKed, this one wasn't)
+* `on_timeout` - a retransmission timer fired
+
+Every change of the (integer) window is appended to `trace` as
+(seconds since start, cwnd), so a transfer can be plotted afterwards.
+
+Strategies: `Reno` (slow start + AIMD), `Cubic` (CUBIC-like growth after a
+loss) and `Fixed` (no congestion control, just the send window).
+"""
+import abc
+import time
+
+
+class CongestionControl(abc.ABC):
+    name = "base"
+
+    def __init__(self, initial_cwnd: float = 2, ssthresh: float = float("inf"), max_cwnd: float = 1024):
+        self.cwnd = float(initial_cwnd)
+        self.ssthresh = ssthresh
+        self.max_cwnd = max_cwnd
+        self.start = time.monotonic()
+        self.trace = []
+        self._record(self.start)
+
+    def window(self) -> int:
+        """Packets the sender may keep in flight."""
+        return max(1, int(self.cwnd))
+
+    @abc.abstractmethod
+    def on_ack(self, now: float, srtt=None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def on_loss(self, now: float):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def on_timeout(self, now: float):
+        raise NotImplementedError
+
+    def _set(self, cwnd: float, now: float):
+        before = self.window()
+        self.cwnd = min(max(cwnd, 1.0), self.max_cwnd)
+        if self.window() != before:
+            self._record(now)
+
+    def _record(self, now: float):
+        self.trace.append((now - self.start, self.cwnd))
+
+
+class Fixed(CongestionControl):
+    """No congestion control: the send window alone limits the sender."""
+    name = "fixed"
+
+    def __init__(self, max_cwnd: float = 1024, **kwargs):
+        super().__init__(initial_cwnd=max_cwnd, max_cwnd=max_cwnd)
+
+    def on_ack(self, now, srtt=None):
+        pass
+
+    def on_loss(self, now):
+        pass
+
+    def on_timeout(self, now):
+        pass
+
+
+class Reno(CongestionControl):
+    """Slow start, additive increase, multiplicative decrease."""
+    name = "reno"
+
+    def on_ack(self, now, srtt=None):
+        if self.cwnd < self.ssthresh:
+            # Slow start: +1 per ACK, doubles every RTT
+            self._set(self.cwnd + 1, now)
+        else:
+            # Congestion avoidance: +1 per RTT
+            self._set(self.cwnd + 1 / self.cwnd, now)
+
+    def on_loss(self, now):
+        # Multiplicative decrease, then continue in congestion avoidance
+        self.ssthresh = max(self.cwnd / 2, 2)
+        self._set(self.ssthresh, now)
+
+    def on_timeout(self, now):
+        # Back to slow start
+        self.ssthresh = max(self.cwnd / 2, 2)
+        self._set(1, now)
+
+
+class Cubic(CongestionControl):
+    """
+    CUBIC-like window growth (RFC 8312): after a loss the window follows
+    W(t) = C * (t - K)^3 + W_max, flattening out around the previous maximum.
+    """
+    name = "cubic"
+    C = 0.4
+    BETA = 0.7
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.w_max = 0.0
+        self.epoch = None   # time of the last reduction
+        self.k = 0.0
+
+    def on_ack(self, now, srtt=None):
+        if self.cwnd < self.ssthresh:
+            self._set(self.cwnd + 1, now)
+            return
+        if self.epoch is None:
+            self.epoch = now
+            self.w_max = max(self.w_max, self.cwnd)
+            self.k = ((self.w_max - self.cwnd) / self.C) ** (1 / 3)
+        t = now - self.epoch + (srtt or 0.0)
+        target = self.C * (t - self.k) ** 3 + self.w_max
+        if target > self.cwnd:
+            self._set(self.cwnd + (target - self.cwnd) / self.cwnd, now)
+        else:
+            # Plateau around W_max: grow very slowly
+            self._set(self.cwnd + 0.01 / self.cwnd, now)
+
+    def on_loss(self, now):
+        self._reduce(now)
+        self._set(self.ssthresh, now)
+
+    def on_timeout(self, now):
+        self._reduce(now)
+        self._set(1, now)
+
+    def _reduce(self, now):
+        self.w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * self.BETA, 2)
+        self.epoch = None
+
+
+ALGORITHMS = {cls.name: cls for cls in (Reno, Cubic, Fixed)}
+
+
+def create(name: str, **kwargs) -> CongestionControl:
+    """Build a congestion control strategy by name ("reno", "cubic", "fixed")."""
+    try:
+        return ALGORITHMS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown congestion control: {name}") from None
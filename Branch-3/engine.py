@@ -0,0 +1,243 @@
+"""
+Event loop for the Branch-3 transfers.
+
+`Engine` waits on any number of sockets with `selectors` (epoll on Linux)
+and runs timers, all on one thread:
+
+    engine = Engine()
+    engine.register(sock, on_readable)          # on_readable(now) when datagrams are queued
+    timer = engine.call_at(deadline, on_timeout, seq)
+    engine.cancel(timer)
+    engine.add_hook(after_turn)                 # after_turn(now) once per turn
+    engine.run(lambda: not done)
+
+Each turn waits for a readable socket or the next timer, calls the readable
+sockets' callbacks, fires the timers that are due, then calls every hook.
+The server sends the ACKs a turn produced from its hook, and the client
+refills its windows and resends what timed out from theirs. `wake()` may be
+called from another thread to end a wait early (e.g. on stop()).
+
+Timers live in a `TimerWheel`: LEVELS wheels of SLOTS slots, level 0 with
+one slot per TICK seconds and each level above turning SLOTS times slower.
+A timer goes into the lowest wheel that can hold it and moves one level
+down each time its slot comes round, so adding or cancelling one is O(1)
+and each is moved at most LEVELS - 1 times before it fires. That is what
+lets a sender keep a deadline per packet in flight: finding the next
+deadline or the expired ones no longer scans the window.
+"""
+import math
+import selectors
+import socket
+import time
+
+TICK = 0.001                # seconds per level-0 slot
+BITS = 8
+SLOTS = 1 << BITS           # slots per wheel
+LEVELS = 4                  # 2^32 ticks (about 50 days) before the overflow list
+_MASK = SLOTS - 1
+
+
+class Timer:
+    __slots__ = ("when", "tick", "callback", "args", "cancelled")
+
+    def __init__(self, when, tick, callback, args):
+        self.when = when
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class TimerWheel:
+    def __init__(self, now: float, tick: float = TICK):
+        self.tick = tick
+        self.current = int(now / tick)      # the last tick expired
+        self.wheels = [[[] for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self.counts = [0] * LEVELS          # timers stored per level, cancelled ones included
+        self.ready = []                     # due already when added
+        self.overflow = []                  # beyond the top wheel
+        self.live = 0                       # timers not fired or cancelled
+
+    def __len__(self):
+        return self.live
+
+    def add(self, when: float, callback, *args) -> Timer:
+        """Call `callback(*args)` once `expire` is given a time >= `when`."""
+        # Round up: a timer never fires before its time
+        timer = Timer(when, math.ceil(when / self.tick), callback, args)
+        self._place(timer)
+        self.live += 1
+        return timer
+
+    def cancel(self, timer: Timer):
+        """O(1): the timer stays in its slot and is skipped when the slot comes round."""
+        if not timer.cancelled:
+            timer.cancelled = True
+            self.live -= 1
+
+    def _place(self, timer):
+        tick, current = timer.tick, self.current
+        if tick <= current:
+            self.ready.append(timer)
+            return
+        # The lowest level whose slot differs from the current one's, with every level above equal
+        for level in range(LEVELS):
+            shift = BITS * (level + 1)
+            if tick >> shift == current >> shift:
+                self.wheels[level][tick >> (BITS * level) & _MASK].append(timer)
+                self.counts[level] += 1
+                return
+        self.overflow.append(timer)
+
+    def expire(self, now: float) -> list[Timer]:
+        """Advance to `now`; returns the timers that are due, in tick order."""
+        target = int(now / self.tick)
+        due, self.ready = self.ready, []
+        while self.current < target:
+            # Nothing on the lowest wheels: jump to just before the next slot of the first busy one
+            level = 0
+            while level < LEVELS and not self.counts[level]:
+                level += 1
+            if level == LEVELS and not self.overflow:
+                self.current = target
+                break
+            if level:
+                shift = BITS * min(level, LEVELS)
+                skip_to = ((self.current >> shift) + 1 << shift) - 1
+                if skip_to >= target:
+                    self.current = target
+                    break
+                self.current = skip_to
+            self.current += 1
+            current = self.current
+            # Cascade: at a slot boundary of a level, move that slot's timers down, top level first
+            if not current & ((1 << BITS * LEVELS) - 1) and self.overflow:
+                pending, self.overflow = self.overflow, []
+                for timer in pending:
+                    self._place(timer)
+            for upper in range(LEVELS - 1, 0, -1):
+                if not current & ((1 << BITS * upper) - 1):
+                    self._cascade(upper, current >> (BITS * upper) & _MASK)
+            slot = self.wheels[0][current & _MASK]
+            if slot:
+                self.counts[0] -= len(slot)
+                due.extend(slot)
+                slot.clear()
+            due.extend(self.ready)
+            self.ready.clear()
+        fired = [t for t in due if not t.cancelled]
+        for timer in fired:
+            timer.cancelled = True      # cancelling it later is a no-op
+        self.live -= len(fired)
+        return fired
+
+    def _cascade(self, level, index):
+        slot = self.wheels[level][index]
+        if slot:
+            self.counts[level] -= len(slot)
+            pending = slot[:]
+            slot.clear()
+            for timer in pending:
+                if not timer.cancelled:
+                    self._place(timer)
+
+    def next_due(self):
+        """
+        Time of the next tick that may fire a timer (or move timers down a
+        level), or None if there are none. Never later than the tick the first
+        timer fires on.
+        """
+        if self.ready:
+            return self.current * self.tick
+        if not self.live:
+            return None
+        for level in range(LEVELS):
+            if not self.counts[level]:
+                continue
+            shift = BITS * level
+            wheel, base = self.wheels[level], self.current >> shift
+            for index in range((base & _MASK) + 1, SLOTS):
+                if wheel[index]:
+                    return ((base & ~_MASK) + index << shift) * self.tick
+        # Only overflow timers: wake up when the top wheel turns over
+        shift = BITS * LEVELS
+        return ((self.current >> shift) + 1 << shift) * self.tick
+
+
+class Engine:
+    def __init__(self, tick: float = TICK):
+        self.selector = selectors.DefaultSelector()
+        self.timers = TimerWheel(time.monotonic(), tick)
+        self.hooks = []
+        # A socket pair to interrupt select() from another thread
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, self._drain_wake)
+
+    def register(self, sock, callback):
+        """Call `callback(now)` whenever `sock` has data to read."""
+        self.selector.register(sock, selectors.EVENT_READ, callback)
+
+    def unregister(self, sock):
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass    # not registered, or already closed
+
+    def call_at(self, when: float, callback, *args) -> Timer:
+        return self.timers.add(when, callback, *args)
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        return self.timers.add(time.monotonic() + delay, callback, *args)
+
+    def cancel(self, timer: Timer):
+        if timer is not None:
+            self.timers.cancel(timer)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def run_once(self, max_wait: float = None):
+        """One turn: wait, read, fire timers, call hooks."""
+        wait = max_wait
+        due = self.timers.next_due()
+        if due is not None:
+            until_due = max(due - time.monotonic(), 0.0)
+            wait = until_due if wait is None else min(wait, until_due)
+        events = self.selector.select(wait)
+        now = time.monotonic()
+        for key, _ in events:
+            key.data(now)
+        for timer in self.timers.expire(now):
+            timer.callback(*timer.args)
+        for hook in self.hooks:
+            hook(now)
+
+    def run(self, until, max_wait: float = None):
+        """Turn until `until()` is false."""
+        while until():
+            self.run_once(max_wait)
+
+    def wake(self):
+        """End the current wait early; safe to call from any thread."""
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass    # a wakeup is pending already, or the engine is closed
+
+    def _drain_wake(self, now):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def close(self):
+        self.selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
@@ -0,0 +1,254 @@
+"""
+Forward error correction for Branch-3 transfers.
+
+The sender cuts the DATA packets of a transfer into groups of N consecutive
+SEQs and sends K parity packets (TYPE_FEC) after each group. The receiver
+can rebuild any K packets of a group that went missing from the ones that
+arrived, without waiting for a retransmission.
+
+Parity runs over "symbols": a packet's TYPE byte, whether it carries FCHK,
+its LEN and FCHK, then the payload. Symbols are zero-padded to the longest
+one in the group, so rebuilt packets come back with their own length,
+COMPRESSED flag and FCHK.
+
+The code is a systematic Reed-Solomon code over GF(256) built on a Cauchy
+matrix, whose first row is scaled to all ones: with K = 1 the parity is
+plain XOR, and a single loss is rebuilt by XOR. Multiplying a whole payload
+by a constant is one `bytes.translate` and adding payloads is an XOR of
+Python ints, so no byte-at-a-time loop runs in Python.
+"""
+import struct
+
+MAX_SYMBOLS = 256           # N + K: GF(256) has room for that many Cauchy points
+
+# TYPE(1) HAS_FCHK(1) LEN(2) FCHK(4), in front of the payload
+SYMBOL_HEADER = struct.Struct("!BBHI")
+
+# GF(256) with the polynomial x^8 + x^4 + x^3 + x^2 + 1
+_EXP = [0] * 512
+_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    _EXP[_i] = _x
+    _LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+
+
+def _mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return _EXP[_LOG[a] + _LOG[b]]
+
+
+def _inv(a: int) -> int:
+    if a == 0:
+        raise ZeroDivisionError("0 has no inverse in GF(256)")
+    return _EXP[255 - _LOG[a]]
+
+
+_tables = {}
+
+
+def _table(c: int) -> bytes:
+    """translate() table multiplying every byte by `c`."""
+    table = _tables.get(c)
+    if table is None:
+        table = _tables[c] = bytes(_mul(c, x) for x in range(256))
+    return table
+
+
+def _scale(c: int, data: bytes) -> int:
+    """c * data, as an int to XOR with others."""
+    if c != 1:
+        data = data.translate(_table(c))
+    return int.from_bytes(data, "little")
+
+
+def _to_bytes(value: int, length: int) -> bytes:
+    return value.to_bytes(length, "little")
+
+
+_matrices = {}
+
+
+def parity_matrix(n: int, k: int) -> list[list[int]]:
+    """K x N coefficients: parity j is the sum of coefficient[j][i] * data i."""
+    if not 1 <= n or not 1 <= k or n + k > MAX_SYMBOLS:
+        raise ValueError("FEC group out of range")
+    matrix = _matrices.get((n, k))
+    if matrix is None:
+        # Cauchy matrix 1 / (x_j + y_i): every square submatrix is invertible,
+        # so any K losses can be undone. Scaling the columns keeps that, and
+        # makes row 0 all ones (XOR parity).
+        cauchy = [[_inv(j ^ (k + i)) for i in range(n)] for j in range(k)]
+        matrix = [[_mul(row[i], _inv(cauchy[0][i])) for i in range(n)] for row in cauchy]
+        _matrices[(n, k)] = matrix
+    return matrix
+
+
+def _invert(matrix: list[list[int]]) -> list[list[int]]:
+    """Inverse of a square matrix over GF(256), by Gauss-Jordan elimination."""
+    size = len(matrix)
+    rows = [row[:] + [int(i == j) for j in range(size)] for i, row in enumerate(matrix)]
+    for col in range(size):
+        pivot = next(r for r in range(col, size) if rows[r][col])
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        scale = _inv(rows[col][col])
+        rows[col] = [_mul(scale, v) for v in rows[col]]
+        for r in range(size):
+            factor = rows[r][col]
+            if r != col and factor:
+                rows[r] = [v ^ _mul(factor, p) for v, p in zip(rows[r], rows[col])]
+    return [row[size:] for row in rows]
+
+
+def symbol(pkt_type: int, payload, file_checksum: int = None) -> bytes:
+    """The bytes parity covers for one DATA packet."""
+    header = SYMBOL_HEADER.pack(pkt_type, file_checksum is not None, len(payload), file_checksum or 0)
+    return header + bytes(payload)
+
+
+def parse_symbol(data: bytes) -> tuple[int, bytes, int]:
+    """(TYPE byte, payload, FCHK or None) of a (possibly padded) symbol."""
+    pkt_type, has_fchk, length, file_checksum = SYMBOL_HEADER.unpack_from(data)
+    end = SYMBOL_HEADER.size + length
+    if end > len(data):
+        raise ValueError("Error in FEC symbol")
+    return pkt_type, data[SYMBOL_HEADER.size:end], file_checksum if has_fchk else None
+
+
+def encode(symbols: list[bytes], k: int) -> list[bytes]:
+    """K parity payloads for a group of symbols."""
+    matrix = parity_matrix(len(symbols), k)
+    length = max(len(s) for s in symbols)
+    padded = [s.ljust(length, b"\0") for s in symbols]
+    parity = []
+    for row in matrix:
+        value = 0
+        for c, data in zip(row, padded):
+            value ^= _scale(c, data)
+        parity.append(_to_bytes(value, length))
+    return parity
+
+
+def decode(symbols: dict, parity: dict, n: int, k: int) -> dict:
+    """
+    Rebuild missing symbols of a group. `symbols` maps the index (0..N-1) of
+    every symbol that arrived to its bytes, `parity` the index (0..K-1) of
+    every parity payload that arrived to its bytes. Returns {index: symbol}
+    for the missing ones, or {} if too many are missing.
+    """
+    missing = [i for i in range(n) if i not in symbols]
+    if not missing or len(missing) > len(parity):
+        return {}
+    matrix = parity_matrix(n, k)
+    rows = sorted(parity)[:len(missing)]
+    length = max(len(p) for p in parity.values())
+    # Take the symbols that arrived out of each parity: what is left only
+    # depends on the missing ones
+    remainders = []
+    for j in rows:
+        value = int.from_bytes(parity[j].ljust(length, b"\0"), "little")
+        for i, data in symbols.items():
+            value ^= _scale(matrix[j][i], data.ljust(length, b"\0"))
+        remainders.append(_to_bytes(value, length))
+    inverse = _invert([[matrix[j][i] for i in missing] for j in rows])
+    recovered = {}
+    for i, coefficients in zip(missing, inverse):
+        value = 0
+        for c, data in zip(coefficients, remainders):
+            value ^= _scale(c, data)
+        recovered[i] = _to_bytes(value, length)
+    return recovered
+
+
+class Encoder:
+    """Collects a transfer's DATA packets into groups and returns their parity."""
+    def __init__(self, n: int, k: int):
+        parity_matrix(n, k)     # validates n and k
+        self.n = n
+        self.k = k
+        self.first = None       # SEQ of the group's first packet
+        self.symbols = []
+
+    def add(self, seq: int, pkt_type: int, payload, file_checksum: int = None) -> list:
+        """
+        Add the next DATA packet. Returns [(first SEQ, N, index, parity)] once
+        its group is complete, else [].
+        """
+        if self.first is None:
+            self.first = seq
+        self.symbols.append(symbol(pkt_type, payload, file_checksum))
+        if len(self.symbols) < self.n:
+            return []
+        return self.flush()
+
+    def flush(self) -> list:
+        """Parity of a group cut short by the end of the transfer."""
+        if not self.symbols:
+            return []
+        n, first = len(self.symbols), self.first
+        parity = encode(self.symbols, self.k)
+        self.first, self.symbols = None, []
+        return [(first, n, j, p) for j, p in enumerate(parity)]
+
+
+class Decoder:
+    """
+    Receiving side: remembers the symbols of recent DATA packets and the
+    parity of groups that still miss some, and rebuilds what it can.
+    """
+    def __init__(self, n: int, k: int):
+        self.n = n
+        self.k = k
+        self.symbols = {}       # SEQ -> symbol
+        self.groups = {}        # first SEQ -> (N, {index: parity})
+
+    def add_data(self, seq: int, pkt_type: int, payload, file_checksum: int = None) -> list:
+        """Remember a DATA packet; returns [(SEQ, symbol)] it lets us rebuild."""
+        if seq in self.symbols:
+            return []
+        self.symbols[seq] = symbol(pkt_type, payload, file_checksum)
+        # Only a group whose parity came first (reordering) can gain from it
+        for first, (n, _) in self.groups.items():
+            if first <= seq < first + n:
+                return self._recover(first)
+        return []
+
+    def add_parity(self, first: int, n: int, index: int, parity) -> list:
+        """Remember a parity payload; returns [(SEQ, symbol)] it lets us rebuild."""
+        if not 1 <= n <= self.n or not 0 <= index < self.k:
+            raise ValueError("Error in FEC header")
+        if all(seq in self.symbols for seq in range(first, first + n)):
+            return []       # nothing lost (or already rebuilt)
+        group = self.groups.setdefault(first, (n, {}))
+        group[1][index] = bytes(parity)
+        return self._recover(first)
+
+    def _recover(self, first: int) -> list:
+        n, parity = self.groups[first]
+        have = {seq - first: self.symbols[seq] for seq in range(first, first + n) if seq in self.symbols}
+        rebuilt = decode(have, parity, n, self.k)
+        if not rebuilt and len(have) < n:
+            return []
+        del self.groups[first]
+        out = []
+        for i, data in sorted(rebuilt.items()):
+            self.symbols[first + i] = data
+            out.append((first + i, data))
+        return out
+
+    def discard_below(self, expected: int):
+        """
+        Forget what can no longer help once every SEQ before `expected` has
+        arrived: groups that ended before it, and packets too old to share a
+        group with a SEQ from `expected` on.
+        """
+        for old in [s for s in self.symbols if s < expected - self.n]:
+            del self.symbols[old]
+        for old in [f for f, (n, _) in self.groups.items() if f + n <= expected]:
+            del self.groups[old]
@@ -1,21 +1,102 @@
 import struct
 import zlib
+from collections import namedtuple
+from checksums import BACKENDS, by_id
+from fec import SYMBOL_HEADER
+
+try:
+    import numpy as np     # optional: vectorized headers in create_many
+except ImportError:
+    np = None
 
 MAGIC = 0xC0DE 
-VER   = 0x01 
+VER   = 0x02    # 0x02 added CONN
 TYPE_DATA = 0 
 TYPE_ACK  = 1
 TYPE_ERR  = 2
+TYPE_SACK = 3   # SEQ = cumulative ACK, payload = SACK ranges
+TYPE_STRIPE = 4 # SEQ 0 of a striped transfer, payload = StripeInfo
+TYPE_RESUME = 5 # handshake: client sends file ID/size/FCHK, server replies with missing chunk ranges
+TYPE_META = 6   # SEQ 0 of a transfer that announces its size, payload = SIZE (8 bytes)
+TYPE_SETUP = 7  # handshake: client proposes chunk size, codec and FEC group, server replies with the agreed ones
+TYPE_FEC = 8    # SEQ = first SEQ of a group of DATA packets, payload = FEC header + parity (see fec.py)
+COMPRESSED = 0x80   # TYPE flag: the payload is compressed with the transfer's codec
 
-# Base header: MAGIC(2) VER(1) TYPE(1) SEQ(4) LEN(2) CHK(4)
-_HDR_FMT = "!HBBIHI"
+# Base header: MAGIC(2) VER(1) TYPE(1) CONN(4) SEQ(4) LEN(2) CHK(4)
+# CONN identifies the transfer, so a server can run many at once.
+# The TYPE byte is the packet type in bits 0-3, the ID of the CHK
+# algorithm (see checksums.py; 0 = CRC32) in bits 4-6 and the COMPRESSED
+# flag in bit 7
+_HDR_FMT = "!HBBIIHI"
 _HDR_SIZE = struct.calcsize(_HDR_FMT)
-MAX_PAYLOAD = 1000 # Maximum payload size in bytes
+MAX_PAYLOAD = 1000 # Default payload (chunk) size in bytes
 
 # Last packet adds file checksum (FCHK, 4 bytes)
-_HDR_LAST_FMT = "!HBBIHI I"
+_HDR_LAST_FMT = "!HBBIIHI I"
 _HDR_LAST_SIZE = struct.calcsize(_HDR_LAST_FMT)
 
+# Largest chunk a transfer can negotiate: the biggest packet (the last one,
+# with FCHK) must still fit one UDP datagram over IPv4 (LEN itself allows 65535)
+MAX_CHUNK = 65507 - _HDR_LAST_SIZE
+
+# Precompiled structs for the buffer-oriented API
+_HDR = struct.Struct(_HDR_FMT)
+_HDR_LAST = struct.Struct(_HDR_LAST_FMT)
+_U32 = struct.Struct("!I")
+_CHK_OFFSET = 14            # CHK sits after MAGIC, VER, TYPE, CONN, SEQ, LEN
+_TYPE_MASK = 0x0F
+_CSUM_SHIFT = 4
+_CSUM_MASK = 0x07
+_BACKEND_UPDATES = tuple(backend.update for backend in BACKENDS)
+_ZERO_CHK = bytes(4)
+_crc32 = zlib.crc32
+
+# Result of Packet.parse_from; payload is a memoryview into the caller's buffer
+ParsedPacket = namedtuple("ParsedPacket", "pkt_type seq payload file_checksum conn_id")
+_new_parsed = tuple.__new__     # skips the namedtuple's Python-level __new__ on the hot path
+
+# SACK payload: a list of received ranges [start, end), 8 bytes each
+_RANGE = struct.Struct("!II")
+MAX_SACK_RANGES = MAX_PAYLOAD // _RANGE.size
+
+# Stripe descriptor: this transfer is byte range [offset, offset + length) of
+# file `group_id` (`size` bytes, whole-file CRC32 `file_checksum`), stripe
+# `index` of `count`
+StripeInfo = namedtuple("StripeInfo", "group_id index count offset length size file_checksum")
+_STRIPE = struct.Struct("!IHHQQQI")
+
+# Resume request: file ID (stable across attempts), file size, whole-file CRC32
+_RESUME = struct.Struct("!IQI")
+
+_META = struct.Struct("!Q")
+
+# chunk size, codec ID (see compression.py; 0 = none), FEC group: N data
+# packets protected by K parity packets (0, 0 = no FEC)
+_SETUP = struct.Struct("!HBBB")
+Setup = namedtuple("Setup", "chunk codec fec_n fec_k")
+
+# FEC header: N (packets in this group), K, index of this parity packet
+_FEC = struct.Struct("!BBB")
+# How much bigger a parity packet is than the largest DATA packet of the same chunk size
+FEC_EXTRA = _FEC.size + SYMBOL_HEADER.size - (_HDR_LAST_SIZE - _HDR_SIZE)
+
+_np_layouts = {}
+
+
+def _np_layout(chunk: int):
+    """NumPy record type of one full-size packet: the header fields, then `chunk` payload bytes."""
+    layout = _np_layouts.get(chunk)
+    if layout is None:
+        layout = _np_layouts[chunk] = np.dtype([
+            ("magic", ">u2"), ("ver", "u1"), ("type", "u1"), ("conn", ">u4"), ("seq", ">u4"),
+            ("len", ">u2"), ("chk", ">u4"), ("payload", "u1", (chunk,))])
+    return layout
+
+
+class ChecksumError(ValueError):
+    """CHK does not match the packet: corrupted on the way (counted apart from other errors)."""
+
+
 class Packet:
     @staticmethod
     def checksum(data: bytes) -> int:
@@ -29,109 +110,348 @@ class Packet:
         return zlib.crc32(data) & 0xFFFFFFFF
 
     @staticmethod
-    def create(seq: int, data: bytes, pkt_type: int = TYPE_DATA, file_checksum: int = None) -> bytes:
+    def create(seq: int, data: bytes, pkt_type: int = TYPE_DATA, file_checksum: int = None,
+               conn_id: int = 0, csum: int = 0) -> bytes:
         """
         Build a packet with header + payload.
         - Normal packets: include CHK
         - Last packet: include CHK + FCHK
+        - CONN: transfer ID chosen by the sender (0 if not given)
+        - csum: ID of the CHK algorithm (checksums.py), stored in TYPE
         """
         # TODO: 1) Ensure payload ≤ MAX_PAYLOAD
         ## chekcks the length of the data to be sent
         length = len(data)
-        if length > MAX_PAYLOAD:
+        if length > MAX_CHUNK:
             raise ValueError("Payload too large")
 
         # TODO: 2) Pack header with CHK=0 (and include FCHK if final packet)
+        pkt_type |= csum << _CSUM_SHIFT
         if file_checksum is not None:
             # checksum for last packet
-            header = struct.pack(_HDR_LAST_FMT, MAGIC, VER, pkt_type, seq, length, 0, file_checksum) 
+            header = _HDR_LAST.pack(MAGIC, VER, pkt_type, conn_id, seq, length, 0, file_checksum)
         else:
             # Normal packet
-            header = struct.pack(_HDR_FMT, MAGIC, VER, pkt_type, seq, length, 0)
+            header = _HDR.pack(MAGIC, VER, pkt_type, conn_id, seq, length, 0)
 
         # TODO: 3) Compute checksum over header+payload
-        CHK = Packet.checksum(header + data)
+        # (CRC of the header continued over the payload, no concatenation needed)
+        if csum:
+            update = by_id(csum).update
+            CHK = update(data, update(header))
+        else:
+            CHK = _crc32(data, _crc32(header))
 
         # TODO: 4) Repack header with correct CHK
         if file_checksum is not None:
             # Last packet
-            header = struct.pack(_HDR_LAST_FMT, MAGIC, VER, pkt_type, seq, length, CHK, file_checksum)
+            header = _HDR_LAST.pack(MAGIC, VER, pkt_type, conn_id, seq, length, CHK, file_checksum)
         else:
             # Normal packet
-            header = struct.pack(_HDR_FMT, MAGIC, VER, pkt_type, seq, length, CHK)
+            header = _HDR.pack(MAGIC, VER, pkt_type, conn_id, seq, length, CHK)
 
         # TODO: 5) Return header+payload
         return header + data
 
     @staticmethod
-    def parse(packet: bytes):
+    def pack_into(buf, offset: int, seq: int, data, pkt_type: int = TYPE_DATA,
+                  file_checksum: int = None, conn_id: int = 0, csum: int = 0) -> int:
         """
-        Parse packet into (pkt_type, seq, data, file_checksum or None).
-        Validate MAGIC, VER, LEN, CHK.
+        Write a packet into a caller-supplied bytearray/memoryview at `offset`
+        and return its size. The payload is copied once, straight into place;
+        the CRC runs over the header, then continues over `data`.
+        Passing a memoryview (reused across calls) is the fastest.
+        """
+        length = len(data)
+        if length > MAX_CHUNK:
+            raise ValueError("Payload too large")
+        update = by_id(csum).update if csum else _crc32
+        pkt_type |= csum << _CSUM_SHIFT
+        if file_checksum is None:
+            start = offset + _HDR_SIZE
+            end = start + length
+            if len(buf) < end:
+                raise ValueError("Buffer too small")
+            buf[start:end] = data
+            CHK = update(data, update(_HDR.pack(MAGIC, VER, pkt_type, conn_id, seq, length, 0)))
+            _HDR.pack_into(buf, offset, MAGIC, VER, pkt_type, conn_id, seq, length, CHK)
+        else:
+            start = offset + _HDR_LAST_SIZE
+            end = start + length
+            if len(buf) < end:
+                raise ValueError("Buffer too small")
+            buf[start:end] = data
+            CHK = update(data, update(_HDR_LAST.pack(MAGIC, VER, pkt_type, conn_id, seq, length, 0,
+                                                     file_checksum)))
+            _HDR_LAST.pack_into(buf, offset, MAGIC, VER, pkt_type, conn_id, seq, length, CHK, file_checksum)
+        return end - offset
+
+    @staticmethod
+    def parse_from(buf, nbytes: int = None) -> ParsedPacket:
+        """
+        Parse the first `nbytes` of `buf` (default: all of it) without copying.
+        Returns a ParsedPacket whose payload is a memoryview into `buf`, so it
+        is only valid until the buffer is reused.
         """
-        # TODO: 1) Ensure header is long enough. checks if the packet has at least the base header size
-        if len(packet) < _HDR_SIZE:
+        view = memoryview(buf)
+        if nbytes is not None:
+            view = view[:nbytes]
+        size = len(view)
+        if size < _HDR_SIZE:
             raise ValueError("Incomplete header")
 
-        # TODO: 2) Unpack base header, validate MAGIC & VER
-        base_header = packet[:_HDR_SIZE]
-        magic, ver, pkt_type, seq, length, CHK = struct.unpack(_HDR_FMT, base_header)
+        magic, ver, pkt_type, conn_id, seq, length, CHK = _HDR.unpack_from(view)
         if magic != MAGIC:
             raise ValueError("Error in magic")
         if ver != VER:
             raise ValueError("Error in version")
-
-        # TODO: 3) Check payload length matches LEN
-        if length > MAX_PAYLOAD:
+        if length > MAX_CHUNK:
             raise ValueError("Error in length")
 
         # determine whether this is a normal or last packet by total size
-        if len(packet) == _HDR_SIZE + length:
-            is_last = False
-        elif len(packet) == _HDR_LAST_SIZE + length:
-            is_last = True
+        if size == _HDR_SIZE + length:
+            hdr_size, file_checksum = _HDR_SIZE, None
+        elif size == _HDR_LAST_SIZE + length:
+            hdr_size, file_checksum = _HDR_LAST_SIZE, _U32.unpack_from(view, _HDR_SIZE)[0]
         else:
-            # Packet size does not match expected header + payload length
             raise ValueError("Error in length")
-        
-        # TODO: 4) Recompute checksum for a normal packet and compare with CHK
-        if not is_last:
-            # Extract the payload
-            payload = packet[_HDR_SIZE:_HDR_SIZE + length] #extract the payload
-
-            #checksum is recomputed over the header (with CHK=0) + payload
-            header_with_zero_chk = struct.pack(_HDR_FMT, magic, ver, pkt_type, seq, length, 0)
-            computed_chk = Packet.checksum(header_with_zero_chk + payload)
-
-            # Compare recomputed checksum with the CHK value from the packet
-            if computed_chk != CHK:
-                raise ValueError("Error in checksum")
-            
-            ## Return (type, sequence, payload, file_checksum=None)
-            return pkt_type, seq, payload, None
-
-        # TODO: 5) Handle last packet with FCHK: unpack last-header, validate,
-        # recompute checksum including the FCHK field in the header, and return
-        # the file checksum alongside payload.
-
-        #unpack the last packet header
-        last_header = packet[:_HDR_LAST_SIZE]
-        #unpack all fields include CHK and final file checksum
-        magic2, ver2, pkt_type2, seq2, length2, CHK2, file_checksum = struct.unpack(_HDR_LAST_FMT, last_header)
-
-        #Basic checks to ensure base fields didn't change
-        if (magic2 != magic) or (ver2 != ver) or (pkt_type2 != pkt_type) or (seq2 != seq) or (length2 != length) or (CHK2 != CHK):
-            raise ValueError("Malformed last header")
-
-        #Extract the payload
-        payload = packet[_HDR_LAST_SIZE:_HDR_LAST_SIZE + length]
-
-        #Recompute checksum over header (with CHK=0) + payload
-        header_with_zero_chk = struct.pack(_HDR_LAST_FMT, magic, ver, pkt_type, seq, length, 0, file_checksum)
-        computed_chk = Packet.checksum(header_with_zero_chk + payload)
-
-        #Compare recomputed checksum with the CHK value from the packet
-        if computed_chk != CHK:
-            raise ValueError("Error in checksum")
-
-        return pkt_type, seq, payload, file_checksum
+
+        # CRC over header with CHK=0 (FCHK unchanged) + payload, in three
+        # incremental steps instead of re-packing and concatenating
+        csum = pkt_type >> _CSUM_SHIFT & _CSUM_MASK
+        update = _crc32 if csum == 0 else by_id(csum).update
+        if update(view[_CHK_OFFSET + 4:], update(_ZERO_CHK, update(view[:_CHK_OFFSET]))) != CHK:
+            raise ChecksumError("Error in checksum")
+
+        return _new_parsed(ParsedPacket, (pkt_type & _TYPE_MASK, seq, view[hdr_size:], file_checksum, conn_id))
+
+    @staticmethod
+    def create_many(data, start_seq: int = 0, conn_id: int = 0, file_checksum: int = None,
+                    chunk: int = MAX_PAYLOAD, csum: int = 0, buf: bytearray = None) -> list:
+        """
+        Packetize `data` in one go: `chunk`-sized payloads with SEQs from
+        `start_seq`, the last one carrying FCHK if `file_checksum` is given.
+        All packets are built in one buffer and returned as memoryviews into
+        it; pass `buf` to reuse one across batches (the views of the previous
+        batch are overwritten). Full-size packets share one layout, so with NumPy
+        their headers and payloads are filled in as whole arrays; only the
+        CHKs are computed one by one (each over a contiguous header+payload).
+        """
+        data = memoryview(data).cast("B")
+        size = len(data)
+        if not 1 <= chunk <= MAX_CHUNK:
+            raise ValueError("Chunk size out of range")
+        count = -(-size // chunk)
+        if count == 0 and file_checksum is not None:
+            count = 1               # an empty file still sends its FCHK
+        # Every packet but a short or FCHK-carrying last one has the same layout
+        uniform = count - 1 if count and (file_checksum is not None or size % chunk) else count
+        stride = _HDR_SIZE + chunk
+        tail = size - uniform * chunk
+        last_hdr = _HDR_LAST_SIZE if file_checksum is not None else _HDR_SIZE
+        total = uniform * stride + (last_hdr + tail if count > uniform else 0)
+        if buf is None:
+            buf = bytearray(total)
+        elif len(buf) < total:
+            raise ValueError("Buffer too small")
+        view = memoryview(buf)
+        type_byte = TYPE_DATA | csum << _CSUM_SHIFT
+
+        if np is not None and uniform > 1:
+            rows = np.frombuffer(buf, _np_layout(chunk), count=uniform)
+            rows["magic"] = MAGIC
+            rows["ver"] = VER
+            rows["type"] = type_byte
+            rows["conn"] = conn_id
+            rows["seq"] = np.arange(start_seq, start_seq + uniform, dtype=np.uint32)
+            rows["len"] = chunk
+            rows["chk"] = 0         # the CRC below covers the field; `buf` may hold an old CHK
+            rows["payload"] = np.frombuffer(data, np.uint8, uniform * chunk).reshape(uniform, chunk)
+        else:
+            pack_header = _HDR.pack_into
+            for i in range(uniform):
+                off = i * stride
+                pack_header(buf, off, MAGIC, VER, type_byte, conn_id, start_seq + i, chunk, 0)
+                view[off + _HDR_SIZE:off + stride] = data[i * chunk:(i + 1) * chunk]
+
+        update = by_id(csum).update if csum else _crc32
+        pack_chk = _U32.pack_into
+        packets = []
+        for i in range(uniform):
+            pkt = view[i * stride:(i + 1) * stride]
+            pack_chk(buf, i * stride + _CHK_OFFSET, update(pkt))
+            packets.append(pkt)
+        if count > uniform:
+            off = uniform * stride
+            Packet.pack_into(buf, off, start_seq + uniform, data[uniform * chunk:], TYPE_DATA,
+                             file_checksum, conn_id, csum)
+            packets.append(view[off:total])
+        return packets
+
+    @staticmethod
+    def parse_many(buffers) -> list:
+        """
+        Validate and parse a batch of datagrams, like `parse_from` on each but
+        without its per-call overhead. A packet that fails validation gives
+        None in its place (`parse_from` on it tells why).
+        """
+        out = []
+        append = out.append
+        unpack = _HDR.unpack_from
+        u32 = _U32.unpack_from
+        for buf in buffers:
+            view = memoryview(buf)
+            size = len(view)
+            if size < _HDR_SIZE:
+                append(None)
+                continue
+            magic, ver, pkt_type, conn_id, seq, length, CHK = unpack(view)
+            if magic != MAGIC or ver != VER:
+                append(None)
+                continue
+            if size == _HDR_SIZE + length:
+                hdr_size, file_checksum = _HDR_SIZE, None
+            elif size == _HDR_LAST_SIZE + length:
+                hdr_size, file_checksum = _HDR_LAST_SIZE, u32(view, _HDR_SIZE)[0]
+            else:
+                append(None)
+                continue
+            csum = pkt_type >> _CSUM_SHIFT & _CSUM_MASK
+            if csum == 0:
+                update = _crc32
+            elif csum < len(_BACKEND_UPDATES):
+                update = _BACKEND_UPDATES[csum]
+            else:
+                append(None)
+                continue
+            if update(view[_CHK_OFFSET + 4:], update(_ZERO_CHK, update(view[:_CHK_OFFSET]))) != CHK:
+                append(None)
+                continue
+            append(_new_parsed(ParsedPacket, (pkt_type & _TYPE_MASK, seq, view[hdr_size:],
+                                              file_checksum, conn_id)))
+        return out
+
+    @staticmethod
+    def create_sack(cum_ack: int, ranges=(), conn_id: int = 0, csum: int = 0) -> bytes:
+        """
+        Build a selective ACK for transfer `conn_id`: every SEQ below `cum_ack`
+        was received, plus the [start, end) ranges above it (at most
+        MAX_SACK_RANGES are sent).
+        """
+        payload = b"".join(_RANGE.pack(start, end) for start, end in ranges[:MAX_SACK_RANGES])
+        return Packet.create(cum_ack, payload, TYPE_SACK, conn_id=conn_id, csum=csum)
+
+    @staticmethod
+    def checksum_id(packet) -> int:
+        """ID of the CHK algorithm a (validated) packet was sent with."""
+        return packet[3] >> _CSUM_SHIFT & _CSUM_MASK
+
+    @staticmethod
+    def is_compressed(packet) -> bool:
+        """Whether a (validated) packet's payload is compressed."""
+        return bool(packet[3] & COMPRESSED)
+
+    @staticmethod
+    def parse_sack(payload) -> list[tuple[int, int]]:
+        """Decode the [start, end) ranges carried by a TYPE_SACK packet."""
+        if len(payload) % _RANGE.size:
+            raise ValueError("Error in SACK ranges")
+        return list(_RANGE.iter_unpack(payload))
+
+    @staticmethod
+    def create_stripe(info: StripeInfo, conn_id: int = 0) -> bytes:
+        """Build the descriptor packet (SEQ 0) that opens one stripe of a striped transfer."""
+        return Packet.create(0, _STRIPE.pack(*info), TYPE_STRIPE, conn_id=conn_id)
+
+    @staticmethod
+    def parse_stripe(payload) -> StripeInfo:
+        """Decode the payload of a TYPE_STRIPE packet."""
+        if len(payload) != _STRIPE.size:
+            raise ValueError("Error in stripe descriptor")
+        return StripeInfo._make(_STRIPE.unpack(payload))
+
+    @staticmethod
+    def create_meta(size: int, conn_id: int = 0) -> bytes:
+        """Build the metadata packet (SEQ 0) announcing the size of the file that follows."""
+        return Packet.create(0, _META.pack(size), TYPE_META, conn_id=conn_id)
+
+    @staticmethod
+    def parse_meta(payload) -> int:
+        """Decode the file size from a TYPE_META payload."""
+        if len(payload) != _META.size:
+            raise ValueError("Error in metadata")
+        return _META.unpack(payload)[0]
+
+    @staticmethod
+    def create_setup(chunk: int, conn_id: int = 0, codec: int = 0, fec_n: int = 0, fec_k: int = 0) -> bytes:
+        """
+        Build a chunk size (and codec, FEC group) proposal. It is padded to the
+        size of the biggest packet the transfer would send (a full last packet,
+        with FCHK, or a parity packet), so an answer also proves the path
+        carries datagrams that large.
+        """
+        size = chunk + FEC_EXTRA if fec_n else chunk
+        if not 1 <= chunk or size > MAX_CHUNK:
+            raise ValueError("Chunk size out of range")
+        payload = _SETUP.pack(chunk, codec, fec_n, fec_k).ljust(size, b"\0")
+        return Packet.create(0, payload, TYPE_SETUP, 0, conn_id)
+
+    @staticmethod
+    def create_setup_reply(chunk: int, conn_id: int = 0, codec: int = 0, fec_n: int = 0,
+                           fec_k: int = 0) -> bytes:
+        return Packet.create(0, _SETUP.pack(chunk, codec, fec_n, fec_k), TYPE_SETUP, conn_id=conn_id)
+
+    @staticmethod
+    def parse_setup(payload) -> Setup:
+        """Decode a TYPE_SETUP request or reply."""
+        if len(payload) < _SETUP.size:
+            raise ValueError("Error in setup")
+        setup = Setup._make(_SETUP.unpack_from(payload))
+        if setup.chunk == 0:
+            raise ValueError("Error in setup")
+        return setup
+
+    @staticmethod
+    def create_fec(first_seq: int, n: int, k: int, index: int, parity: bytes, conn_id: int = 0,
+                   csum: int = 0) -> bytes:
+        """Build parity packet `index` of the group of `n` DATA packets starting at SEQ `first_seq`."""
+        return Packet.create(first_seq, _FEC.pack(n, k, index) + parity, TYPE_FEC, conn_id=conn_id, csum=csum)
+
+    @staticmethod
+    def parse_fec(payload) -> tuple[int, int, int, memoryview]:
+        """Decode (N, K, index, parity) from a TYPE_FEC payload."""
+        if len(payload) < _FEC.size:
+            raise ValueError("Error in FEC header")
+        n, k, index = _FEC.unpack_from(payload)
+        return n, k, index, payload[_FEC.size:]
+
+    @staticmethod
+    def create_resume(resume_id: int, size: int, file_checksum: int, conn_id: int) -> bytes:
+        """Ask the server which chunks of file `resume_id` it still needs for transfer `conn_id`."""
+        return Packet.create(0, _RESUME.pack(resume_id, size, file_checksum), TYPE_RESUME, conn_id=conn_id)
+
+    @staticmethod
+    def parse_resume(payload) -> tuple[int, int, int]:
+        """Decode a resume request into (resume_id, size, file_checksum)."""
+        if len(payload) != _RESUME.size:
+            raise ValueError("Error in resume request")
+        return _RESUME.unpack(payload)
+
+    @staticmethod
+    def create_resume_reply(ranges, conn_id: int) -> bytes:
+        """The server's answer: missing chunks as [start, end) ranges (at most MAX_SACK_RANGES)."""
+        payload = b"".join(_RANGE.pack(start, end) for start, end in ranges[:MAX_SACK_RANGES])
+        return Packet.create(0, payload, TYPE_RESUME, conn_id=conn_id)
+
+    @staticmethod
+    def parse_resume_reply(payload) -> list[tuple[int, int]]:
+        return Packet.parse_sack(payload)
+
+    @staticmethod
+    def parse(packet: bytes):
+        """
+        Parse packet into (pkt_type, seq, data, file_checksum or None).
+        Validate MAGIC, VER, LEN, CHK. (CONN is available from `parse_from`.)
+        """
+        pkt_type, seq, payload, file_checksum, _ = Packet.parse_from(packet)
+        return pkt_type, seq, bytes(payload), file_checksum
@@ -0,0 +1,313 @@
+"""
+Local network impairment relays for testing the transfers, without root or tc.
+
+LossyRelay sits between one UDP client and the server, forwarding datagrams
+both ways. Each direction is impaired on its own, in this order:
+
+    loss        random drop, or Gilbert-Elliott bursts: a "bad" state
+                entered with probability `burst_enter` per datagram and
+                left with `burst_exit`, dropping with `burst_loss` while in it
+    corrupt     flip one random bit of the datagram
+    duplicate   send the datagram twice
+    rate        token bucket of `rate` bytes/s with `bucket` bytes of burst;
+                datagrams queue behind it, and are dropped once the queue
+                would hold more than `queue` bytes
+    delay       fixed one-way `delay` plus uniform +-`jitter` seconds
+                (jitter alone can reorder)
+    reorder     hold a datagram back until the next one has gone
+
+All randomness comes from one seeded generator, so a run with the same seed
+and the same traffic drops, corrupts and delays the same datagrams. Runs in
+a background thread:
+
+    relay = LossyRelay(("127.0.0.1", 6000), loss=0.1, reorder=0.1, seed=1)
+    relay.start()
+    UDPClient(port=relay.port).send_data(data)
+    relay.stop()
+
+TCPRelay does the same for TCP connections (Branch-1/2), where only delay,
+jitter and the rate cap make sense: the kernel hides loss behind
+retransmission.
+"""
+import socket
+import random
+import threading
+import argparse
+import heapq
+import itertools
+import time
+
+
+class TokenBucket:
+    """
+    Shapes a flow to `rate` bytes/s, letting `bucket` bytes through at once
+    after an idle period. Holds at most `queue` bytes waiting.
+    """
+    def __init__(self, rate: float, bucket: int, queue: int):
+        self.rate = rate
+        self.bucket = bucket
+        self.queue = queue
+        self.tat = 0.0      # when the bucket would be full again (theoretical arrival time)
+
+    def departure(self, now: float, size: int):
+        """When a datagram of `size` bytes arriving `now` may leave, or None to drop it."""
+        tat = max(self.tat, now)
+        depart = max(now, tat + size / self.rate - self.bucket / self.rate)
+        if (depart - now) * self.rate > self.queue:
+            return None     # queue full: tail drop
+        self.tat = tat + size / self.rate
+        return depart
+
+
+class LossyRelay:
+    def __init__(self, target, host="127.0.0.1", port=0, loss=0.0, reorder=0.0, seed=None,
+                 delay=0.0, jitter=0.0, duplicate=0.0, corrupt=0.0,
+                 burst_enter=0.0, burst_exit=1.0, burst_loss=1.0,
+                 rate=None, bucket=16 * 1024, queue=256 * 1024):
+        self.target = target
+        self.loss = loss
+        self.reorder = reorder
+        self.delay = delay
+        self.jitter = jitter
+        self.duplicate = duplicate
+        self.corrupt = corrupt
+        self.burst_enter = burst_enter
+        self.burst_exit = burst_exit
+        self.burst_loss = burst_loss
+        self.rng = random.Random(seed)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.05)
+        self.port = self.sock.getsockname()[1]
+        self.client = None      # last address seen that is not the server
+        self.held = None        # (datagram, dest) delayed behind the next one
+        # Per direction (keyed by "to server"): Gilbert-Elliott state, token bucket
+        self.bad = {True: False, False: False}
+        self.buckets = {up: TokenBucket(rate, bucket, queue) for up in (True, False)} if rate else None
+        self.scheduled = []     # heap of (due, n, datagram, dest)
+        self.order = itertools.count()  # n: ties leave in arrival order
+        self.sent = 0
+        self.dropped = 0
+        self.reordered = 0
+        self.duplicated = 0
+        self.corrupted = 0
+        self.overflowed = 0     # dropped by a full rate-limit queue
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        self.sock.close()
+
+    def serve_forever(self):
+        while self.running:
+            timeout = 0.05
+            if self.scheduled:
+                timeout = min(timeout, max(self.scheduled[0][0] - time.monotonic(), 0))
+            self.sock.settimeout(timeout)
+            try:
+                data, addr = self.sock.recvfrom(65535)
+            except (socket.timeout, BlockingIOError):     # a timeout of 0 is non-blocking
+                self._flush(time.monotonic())
+                if not self.scheduled:
+                    # Don't hold a reordered datagram forever on an idle link
+                    self._release()
+                continue
+            if addr == self.target:
+                dest = self.client
+            else:
+                self.client = addr
+                dest = self.target
+            if dest is not None:
+                self._forward(data, dest, time.monotonic())
+            self._flush(time.monotonic())
+
+    def _forward(self, data, dest, now):
+        up = dest == self.target
+        if self._lost(up):
+            self.dropped += 1
+            return
+        if self.corrupt and self.rng.random() < self.corrupt:
+            bit = self.rng.randrange(len(data) * 8)
+            data = bytearray(data)
+            data[bit // 8] ^= 1 << (bit % 8)
+            self.corrupted += 1
+        copies = 1
+        if self.duplicate and self.rng.random() < self.duplicate:
+            copies = 2
+            self.duplicated += 1
+        for _ in range(copies):
+            due = now
+            if self.buckets is not None:
+                due = self.buckets[up].departure(now, len(data))
+                if due is None:
+                    self.overflowed += 1
+                    continue
+            if self.delay or self.jitter:
+                due += max(0.0, self.delay + self.rng.uniform(-self.jitter, self.jitter))
+            if due > now:
+                heapq.heappush(self.scheduled, (due, next(self.order), data, dest))
+            else:
+                self._send(data, dest)
+
+    def _lost(self, up: bool) -> bool:
+        if self.burst_enter:
+            # Gilbert-Elliott: move between the good and bad state, then drop per state
+            if self.bad[up]:
+                self.bad[up] = self.rng.random() >= self.burst_exit
+            else:
+                self.bad[up] = self.rng.random() < self.burst_enter
+            if self.bad[up]:
+                return self.rng.random() < self.burst_loss
+        return self.rng.random() < self.loss
+
+    def _send(self, data, dest):
+        """Last stage: reordering holds one datagram back behind the next."""
+        if self.held is None and self.rng.random() < self.reorder:
+            self.held = (data, dest)
+            self.reordered += 1
+            return
+        self.sock.sendto(data, dest)
+        self.sent += 1
+        self._release()
+
+    def _flush(self, now):
+        while self.scheduled and self.scheduled[0][0] <= now:
+            _, _, data, dest = heapq.heappop(self.scheduled)
+            self._send(data, dest)
+
+    def _release(self):
+        if self.held is not None:
+            data, dest = self.held
+            self.held = None
+            self.sock.sendto(data, dest)
+            self.sent += 1
+
+
+class TCPRelay:
+    """
+    Forwards every TCP connection to `target`, delaying the bytes each way by
+    `delay` (+-`jitter`) seconds and capping each direction at `rate` bytes/s.
+    Two threads per connection; byte order is kept.
+    """
+    def __init__(self, target, host="127.0.0.1", port=0, delay=0.0, jitter=0.0, rate=None,
+                 bucket=16 * 1024, seed=None):
+        self.target = target
+        self.delay = delay
+        self.jitter = jitter
+        self.rate = rate
+        self.bucket = bucket
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()    # the generator is shared by the pump threads
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(128)
+        self.sock.settimeout(0.05)
+        self.port = self.sock.getsockname()[1]
+        self.connections = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        self.sock.close()
+
+    def serve_forever(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError:
+                conn.close()
+                continue
+            self.connections += 1
+            for src, dst in ((conn, upstream), (upstream, conn)):
+                threading.Thread(target=self._pump, args=(src, dst), daemon=True).start()
+
+    def _pump(self, src, dst):
+        """Copy one direction, releasing each chunk at its due time."""
+        bucket = TokenBucket(self.rate, self.bucket, float("inf")) if self.rate else None
+        last_due = 0.0
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                now = time.monotonic()
+                due = bucket.departure(now, len(data)) if bucket is not None else now
+                if self.delay or self.jitter:
+                    with self.lock:
+                        extra = self.rng.uniform(-self.jitter, self.jitter)
+                    due += max(0.0, self.delay + extra)
+                # A stream keeps its order: never overtake the previous chunk
+                last_due = max(due, last_due)
+                wait = last_due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            # Pass the close on, so the other side sees EOF
+            for s in (src, dst):
+                try:
+                    s.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            src.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Network impairment relay (UDP, or TCP with --tcp)")
+    parser.add_argument("--port", type=int, required=True, help="Port to listen on")
+    parser.add_argument("--target-host", type=str, default="127.0.0.1", help="Server host")
+    parser.add_argument("--target-port", type=int, required=True, help="Server port")
+    parser.add_argument("--tcp", action="store_true", help="Relay TCP connections (delay, jitter, rate only)")
+    parser.add_argument("--loss", type=float, default=0.0, help="Drop probability per datagram")
+    parser.add_argument("--burst-enter", type=float, default=0.0,
+                        help="Gilbert-Elliott: probability per datagram of entering the bad state")
+    parser.add_argument("--burst-exit", type=float, default=1.0,
+                        help="Gilbert-Elliott: probability per datagram of leaving the bad state")
+    parser.add_argument("--burst-loss", type=float, default=1.0,
+                        help="Gilbert-Elliott: drop probability in the bad state")
+    parser.add_argument("--reorder", type=float, default=0.0, help="Reorder probability per datagram")
+    parser.add_argument("--duplicate", type=float, default=0.0, help="Duplication probability per datagram")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="Bit-flip probability per datagram")
+    parser.add_argument("--delay", type=float, default=0.0, help="One-way delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +- jitter in seconds")
+    parser.add_argument("--rate", type=float, default=None, help="Bandwidth cap per direction, bytes/s")
+    parser.add_argument("--bucket", type=int, default=16 * 1024, help="Token bucket burst, bytes")
+    parser.add_argument("--queue", type=int, default=256 * 1024, help="Rate-limit queue, bytes (UDP)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    args = parser.parse_args()
+
+    target = (args.target_host, args.target_port)
+    if args.tcp:
+        relay = TCPRelay(target, port=args.port, delay=args.delay, jitter=args.jitter, rate=args.rate,
+                         bucket=args.bucket, seed=args.seed)
+    else:
+        relay = LossyRelay(target, port=args.port, loss=args.loss, reorder=args.reorder, seed=args.seed,
+                           delay=args.delay, jitter=args.jitter, duplicate=args.duplicate,
+                           corrupt=args.corrupt, burst_enter=args.burst_enter, burst_exit=args.burst_exit,
+                           burst_loss=args.burst_loss, rate=args.rate, bucket=args.bucket, queue=args.queue)
+    print(f"Relaying 127.0.0.1:{relay.port} -> {args.target_host}:{args.target_port}")
+    relay.running = True
+    relay.serve_forever()
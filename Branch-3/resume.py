@@ -0,0 +1,161 @@
+"""
+Resumable transfers for the Branch-3 server.
+
+A resumable file is written chunk by chunk at its offset into a pre-sized
+partial file. An index kept next to it records which chunks are on disk and
+the CRC32 of each:
+
+    <part>.idx = HEADER | bitmap (1 bit per chunk) | CRC32 per chunk (4 bytes each)
+
+The index is flushed now and then (and when the session ends), so after an
+interruption - even a server crash - a new attempt only needs the chunks the
+index does not list. On reopening, every listed chunk is read back and checked
+against its CRC, so a chunk whose write never fully reached the disk is
+simply sent again.
+"""
+import os
+import struct
+import zlib
+
+_MAGIC = b"RIDX"
+_HEADER = struct.Struct("!4sQQI")   # magic, file size, chunk count, file CRC32
+
+
+class ResumeIndex:
+    def __init__(self, path: str, size: int, chunk_size: int, file_checksum: int):
+        self.path = path
+        self.size = size
+        self.chunk_size = chunk_size
+        self.chunks = max(1, -(-size // chunk_size))   # an empty file is one empty chunk
+        self.file_checksum = file_checksum
+        self.bitmap = bytearray((self.chunks + 7) // 8)
+        self.crcs = bytearray(4 * self.chunks)
+        self.dirty = False
+
+    def load(self) -> bool:
+        """Read the index from disk; False (and empty) if missing or for a different file."""
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return False
+        expected = _HEADER.size + len(self.bitmap) + len(self.crcs)
+        if len(raw) != expected or raw[:_HEADER.size] != self._header():
+            return False
+        self.bitmap[:] = raw[_HEADER.size:_HEADER.size + len(self.bitmap)]
+        self.crcs[:] = raw[_HEADER.size + len(self.bitmap):]
+        return True
+
+    def flush(self):
+        """Write the index atomically (temp file + rename), if anything changed."""
+        if not self.dirty:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self._header())
+            f.write(self.bitmap)
+            f.write(self.crcs)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def has(self, i: int) -> bool:
+        return bool(self.bitmap[i >> 3] & (1 << (i & 7)))
+
+    def mark(self, i: int, crc: int):
+        self.bitmap[i >> 3] |= 1 << (i & 7)
+        struct.pack_into("!I", self.crcs, 4 * i, crc)
+        self.dirty = True
+
+    def clear(self, i: int):
+        self.bitmap[i >> 3] &= ~(1 << (i & 7))
+        self.dirty = True
+
+    def count(self) -> int:
+        return sum(bin(b).count("1") for b in self.bitmap)
+
+    def complete(self) -> bool:
+        return self.count() == self.chunks
+
+    def missing_ranges(self, limit: int) -> list[tuple[int, int]]:
+        """
+        Missing chunks as at most `limit` [start, end) ranges. If there are
+        more, the last range runs to the end of the file (some chunks that
+        are already there get sent again).
+        """
+        ranges = []
+        start = None
+        for i in range(self.chunks):
+            if not self.has(i):
+                if start is None:
+                    start = i
+            elif start is not None:
+                ranges.append((start, i))
+                start = None
+        if start is not None:
+            ranges.append((start, self.chunks))
+        if len(ranges) > limit:
+            ranges = ranges[:limit - 1] + [(ranges[limit - 1][0], self.chunks)]
+        return ranges
+
+    def verify(self, fd: int) -> int:
+        """Unmark chunks whose data on disk does not match their CRC; returns how many."""
+        bad = 0
+        for i in range(self.chunks):
+            if self.has(i):
+                data = os.pread(fd, self.chunk_length(i), i * self.chunk_size)
+                if zlib.crc32(data) != struct.unpack_from("!I", self.crcs, 4 * i)[0]:
+                    self.clear(i)
+                    bad += 1
+        return bad
+
+    def chunk_length(self, i: int) -> int:
+        return min(self.chunk_size, self.size - i * self.chunk_size)
+
+    def _header(self) -> bytes:
+        return _HEADER.pack(_MAGIC, self.size, self.chunks, self.file_checksum)
+
+
+class ResumeFile:
+    """Partial output file plus its index, for one resumable file on the server."""
+    def __init__(self, path: str, resume_id: int, size: int, chunk_size: int, file_checksum: int):
+        self.path = path
+        self.resume_id = resume_id
+        self.part = f"{path}.{resume_id:08x}.part"
+        self.index = ResumeIndex(self.part + ".idx", size, chunk_size, file_checksum)
+        existed = os.path.exists(self.part)
+        self.fd = os.open(self.part, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(self.fd, size)
+        # Without the partial file the index means nothing
+        if existed and self.index.load():
+            self.index.verify(self.fd)
+        self.closed = False
+
+    def write(self, i: int, chunk):
+        os.pwrite(self.fd, chunk, i * self.index.chunk_size)
+        self.index.mark(i, zlib.crc32(chunk))
+
+    def close(self):
+        """Keep the partial file and index for a later attempt."""
+        if not self.closed:
+            self.closed = True
+            self.index.flush()
+            os.close(self.fd)
+
+    def commit(self) -> bool:
+        """
+        Check the whole file against its CRC32. On success move it into place
+        and drop the index; on failure delete both so the next attempt starts over.
+        """
+        self.close()
+        crc = 0
+        with open(self.part, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                crc = zlib.crc32(block, crc)
+        ok = self.index.complete() and crc == self.index.file_checksum
+        if ok:
+            os.replace(self.part, self.path)
+        else:
+            os.remove(self.part)
+        if os.path.exists(self.index.path):
+            os.remove(self.index.path)
+        return ok
@@ -0,0 +1,44 @@
+"""
+Retransmission timeout (RTO) estimation for the Branch-3 sender.
+
+Jacobson/Karels estimator as in RFC 6298:
+
+    RTTVAR = (1 - beta) * RTTVAR + beta * |SRTT - R|
+    SRTT   = (1 - alpha) * SRTT + alpha * R
+    RTO    = SRTT + K * RTTVAR
+
+Each timeout doubles the RTO (exponential backoff) until a fresh sample
+arrives. Samples from retransmitted packets must not be fed in (Karn's
+algorithm); `SendWindow.rtt_sample` takes care of that.
+"""
+
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+
+
+class RTTEstimator:
+    def __init__(self, initial_rto: float = 1.0, min_rto: float = 0.02, max_rto: float = 8.0):
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial_rto
+
+    def sample(self, rtt: float):
+        """Feed one RTT measurement (seconds) and recompute the RTO."""
+        if self.srtt is None:
+            # First measurement
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+        self.rto = self._clamp(self.srtt + K * self.rttvar)
+
+    def backoff(self):
+        """Double the RTO after a timeout."""
+        self.rto = self._clamp(self.rto * 2)
+
+    def _clamp(self, rto: float) -> float:
+        return min(max(rto, self.min_rto), self.max_rto)
@@ -1,59 +1,661 @@
+import os
+import mmap
 import socket
+import time
 import zlib
 import argparse
-from packet import Packet, TYPE_ACK, TYPE_DATA
+from packet import (Packet, ChecksumError, TYPE_DATA, TYPE_STRIPE, TYPE_RESUME, TYPE_META, TYPE_SETUP,
+                    TYPE_FEC, COMPRESSED, MAX_PAYLOAD, MAX_CHUNK, MAX_SACK_RANGES, FEC_EXTRA, _HDR_LAST_SIZE)
+from window import RecvWindow
+from compression import CODECS, Stream
+import fec
+from batchio import BatchIO
+from engine import Engine
+from resume import ResumeFile
+from supervisor import Supervisor
+from metrics import Metrics, MetricsServer, COUNT_BOUNDS
+
+# Counters kept in `UDPServer.stats` (summed over workers by the supervisor)
+STATS_KEYS = ("packets", "bytes", "errors", "transfers", "failed", "evicted", "recovered")
+
+SWEEP_INTERVAL = 0.5    # seconds between checks for idle sessions
+RCVBUF = 4 << 20        # socket receive buffer to ask for
+
+
+class Session:
+    """Receive state of one transfer, identified by (client address, CONN)."""
+    def __init__(self, addr, conn_id, window, path, now):
+        self.addr = addr
+        self.conn_id = conn_id
+        self.window = RecvWindow(window)
+        self.path = path        # final output file
+        self.out = None         # partial output file, written in order as data arrives
+        self.crc = 0            # rolling CRC32 of everything written so far
+        self.last_seq = None    # seq of the packet carrying FCHK
+        self.fchk = None
+        self.started = now
+        self.last_active = now
+        self.since_ack = 0      # packets received since the last SACK
+        self.ack_timer = None   # engine timer of the delayed SACK, if one is armed
+        self.group = None       # StripeGroup, if this transfer is one stripe of a file
+        self.index = None       # stripe index within the group
+        self.pos = 0            # file offset of the next byte of the stripe
+        self.resume = None      # ResumeFile, if this is a resumable transfer
+        self.ranges = None      # chunks it sends, in order (SEQ n is the n-th of them)
+        self.chunk_ids = None
+        self.mapped = None      # MappedFile, if the transfer announced its size
+        self.chunk = MAX_PAYLOAD    # payload size agreed in a TYPE_SETUP handshake
+        self.csum = 0           # checksum ID the client sends with; its SACKs use the same
+        self.codec = 0          # codec ID agreed in the TYPE_SETUP handshake (0: none)
+        self.stream = None      # its decompression state
+        self.fec = None         # fec.Decoder, if a FEC group was agreed
+
+    def write(self, chunks, first_seq):
+        """Store the chunks that just became in order (SEQs first_seq, first_seq + 1, ...)."""
+        if not chunks:
+            return
+        if self.stream is not None:
+            # Payloads are queued with their codec ID in front; decode them in order
+            chunks = [self.stream.decode(c[0], c[1:], self.chunk) if c else c for c in chunks]
+        if self.mapped is not None:
+            # Payloads were copied into the map on arrival; only data that came
+            # before the metadata packet is still left to place
+            for seq, chunk in enumerate(chunks, first_seq):
+                if chunk:
+                    self.mapped.write(seq, chunk)
+            return
+        if self.resume is not None:
+            for chunk in chunks:
+                self.resume.write(next(self.chunk_ids), chunk)
+            return
+        if self.group is not None:
+            for chunk in chunks:
+                # Positioned write: each stripe fills its own byte range of the shared file
+                if not self.group.closed:
+                    os.pwrite(self.group.fd, chunk, self.pos)
+                self.pos += len(chunk)
+                self.crc = zlib.crc32(chunk, self.crc)
+            return
+        if self.out is None:
+            self.out = open(f"{self.path}.{self.conn_id:08x}.part", "wb")
+        for chunk in chunks:
+            self.out.write(chunk)
+            self.crc = zlib.crc32(chunk, self.crc)
+
+    def discard(self):
+        if self.mapped is not None:
+            self.mapped.close(keep=False)
+        if self.resume is not None:
+            # Keep what arrived for the next attempt
+            self.resume.close()
+        if self.out is not None:
+            self.out.close()
+            os.remove(self.out.name)
+            self.out = None
+
+
+class MappedFile:
+    """
+    Output file preallocated to the size announced by TYPE_META and mapped
+    into memory: every payload is copied once, straight to its place in the
+    page cache, and the kernel writes it back.
+    """
+    def __init__(self, path, conn_id, size, chunk):
+        self.path = path
+        self.chunk = chunk
+        self.part = f"{path}.{conn_id:08x}.part"
+        self.size = size
+        self.fd = os.open(self.part, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        if size:
+            try:
+                # Reserve the blocks now, so a full disk shows up here and not as SIGBUS later
+                os.posix_fallocate(self.fd, 0, size)
+            except (AttributeError, OSError):
+                os.ftruncate(self.fd, size)
+        self.mm = mmap.mmap(self.fd, size) if size else None   # an empty file cannot be mapped
+
+    def write(self, seq, data):
+        """Place the payload of DATA packet `seq` (SEQ 0 is the metadata packet)."""
+        offset = (seq - 1) * self.chunk
+        end = offset + len(data)
+        if offset < 0 or end > self.size:
+            raise ValueError("Data beyond the announced file size")
+        self.mm[offset:end] = data
+
+    def checksum(self) -> int:
+        return zlib.crc32(self.mm) if self.mm is not None else 0
+
+    def close(self, keep):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            if keep:
+                os.replace(self.part, self.path)
+            else:
+                os.remove(self.part)
+
+
+class StripeGroup:
+    """A file arriving as several stripes (transfers), written into one partial file by offset."""
+    def __init__(self, key, info, path, now):
+        self.key = key
+        self.info = info
+        self.path = path
+        self.part = f"{path}.{info.group_id:08x}.part"
+        self.fd = os.open(self.part, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.ftruncate(self.fd, info.size)
+        self.done = set()       # indexes of the stripes received completely
+        self.closed = False
+        self.last_active = now
+
+    def close(self, keep=False):
+        if not self.closed:
+            self.closed = True
+            os.close(self.fd)
+            if not keep:
+                os.remove(self.part)
+
+    def checksum(self) -> int:
+        """CRC32 of the whole file, read back from disk once every stripe is in."""
+        crc = 0
+        with open(self.part, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                crc = zlib.crc32(block, crc)
+        return crc
 
 
 class UDPServer:
-    def __init__(self, host="127.0.0.1", port=6000, outfile="received.bin"):
+    """
+    Receives any number of concurrent transfers. Each (client address, CONN)
+    pair gets its own `Session`: receive window, partial output file and ACK
+    timer. Sessions idle for `idle_timeout` seconds are evicted and their
+    partial file deleted.
+
+    `outfile` may contain "{id}", which is replaced by the transfer ID (hex)
+    so every transfer keeps its own file. Otherwise each completed transfer
+    replaces `outfile` (atomically, so it is never a mix of two transfers).
+
+    A striped file arrives as several transfers that open with a TYPE_STRIPE
+    descriptor; they share one StripeGroup (and "{id}" is the group ID).
+
+    A resumable transfer starts with a TYPE_RESUME handshake and is written
+    to a ResumeFile, which outlives the session (and the server) until the
+    file is complete ("{id}" is the file's resume ID).
+
+    A transfer may open with a TYPE_SETUP handshake to use chunks larger (or
+    smaller) than MAX_PAYLOAD, up to `max_chunk`.
+
+    With `metrics` (see metrics.py), the server also exports its stats, the
+    socket's I/O counters, checksum failures, datagrams per receive batch,
+    transfer durations and open sessions, and traces every packet.
+    """
+    def __init__(self, host="127.0.0.1", port=6000, outfile="received.bin", window=64, batch=True,
+                 ack_every=16, ack_delay=0.005, idle_timeout=10.0, max_sessions=1024,
+                 reuse_port=False, stats=None, max_chunk=MAX_CHUNK, rcvbuf=RCVBUF, metrics=None):
         self.host = host
         self.port = port
         self.outfile = outfile
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if reuse_port:
+            # Several worker processes share the port; the kernel hashes each flow to one of them
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        # Room for a full window of large datagrams (the kernel caps it at net.core.rmem_max)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
         self.sock.bind((self.host, self.port))
-        self.buffer = {}
+        self.stats = stats if stats is not None else dict.fromkeys(STATS_KEYS, 0)
+        self.max_chunk = max_chunk
+        # Receive buffers fit the biggest packet of the largest chunk size we agree to
+        self.io = BatchIO(self.sock, batch=batch, bufsize=_HDR_LAST_SIZE + max_chunk + FEC_EXTRA)
+        self.running = False
+        self.window = window
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions = {}      # (addr, conn_id) -> Session
+        self.finished = {}      # (addr, conn_id) -> (last_seq, time), to re-ACK late retransmits
+        self.groups = {}        # (client host, group_id) -> StripeGroup
+        self.resumable = {}     # resume_id -> Session currently receiving that file
+        # Delayed ACKs: one SACK per `ack_every` packets or `ack_delay` seconds,
+        # or right away when something arrives out of order
+        self.ack_every = ack_every
+        self.ack_delay = ack_delay
+        self.acks_pending = set()   # sessions with a SACK due, now or when their timer fires
+        self.acks_now = set()       # ... of which those to send at the end of this turn
+        self.engine = None
+        self.out = {}               # addr -> ACKs queued this turn
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.include(self.stats)
+            metrics.include(self.io.stats)
+            metrics.gauge("sessions", lambda: len(self.sessions))
+            metrics.gauge("acks_pending", lambda: len(self.acks_pending))
 
     def start(self):
         print(f"Server listening on {self.host}:{self.port}")
-        while True:
-            packet, addr = self.sock.recvfrom(2048)
+        self.running = True
+        self.engine = Engine()
+        self.engine.register(self.sock, self._on_readable)
+        # Send the ACKs of everything handled in a turn in one go, at its end
+        self.engine.add_hook(self._flush)
+        self.engine.call_later(SWEEP_INTERVAL, self._on_sweep)
+        try:
+            self.engine.run(lambda: self.running)
+        finally:
+            self.engine.close()
+        # Stopped: keep the progress of unfinished resumable transfers
+        for session in self.resumable.values():
+            session.resume.close()
+
+    def stop(self):
+        self.running = False
+        if self.engine is not None:
+            self.engine.wake()
+        self.sock.close()
+
+    def _on_readable(self, now):
+        metrics = self.metrics
+        trace = metrics.trace if metrics is not None else None
+        try:
+            batch = self.io.drain()
+        except OSError:
+            if not self.running:
+                return  # socket closed by stop()
+            raise
+        if metrics is not None and batch:
+            # How many datagrams were waiting in the socket buffer
+            metrics.observe("recv_batch", len(batch), COUNT_BOUNDS)
+        out = self.out
+        parsed = Packet.parse_many([view for view, _ in batch])
+        for (view, addr), pkt in zip(batch, parsed):
+            self.stats["packets"] += 1
+            self.stats["bytes"] += len(view)
             try:
-                pkt_type, seq, data, fchk = Packet.parse(packet)
-                if pkt_type == TYPE_DATA:
-                    # Store chunk
-                    self.buffer[seq] = data
-
-                    # Send ACK back
-                    ack = Packet.create(seq, b"", TYPE_ACK)
-                    self.sock.sendto(ack, addr)
-
-                    # If final packet received, validate and write file
-                    if fchk is not None:
-                        # TODO: Reassemble full data from buffer
-                        full_data = b"".join(
-                            self.buffer[i] for i in sorted(self.buffer)
-                        )
-                        calc = zlib.crc32(full_data) & 0xFFFFFFFF
-                        if calc == fchk:
-                            print(f"File received correctly. Writing to {self.outfile}")
-                            with open(self.outfile, "wb") as f:
-                                f.write(full_data)
-                        else:
-                            print("File checksum mismatch!")
-                        # Reset for next transfer
-                        self.buffer.clear()
+                if pkt is None:
+                    Packet.parse_from(view)     # invalid: raises with the reason
+                if trace is not None:
+                    trace("recv", addr, pkt.conn_id, pkt.seq, pkt.pkt_type, len(view))
+                self._handle(pkt, view, addr, out, now)
             except Exception as e:
+                self.stats["errors"] += 1
+                if metrics is not None and isinstance(e, ChecksumError):
+                    metrics.inc("checksum_failures")
                 print("Error parsing packet:", e)
 
+    def _flush(self, now):
+        """Hook run after every engine turn: send the SACKs that are due and all queued ACKs."""
+        out = self.out
+        if self.acks_now:
+            for session in list(self.acks_now):
+                self._ack(out, session)
+        if not out:
+            return
+        trace = self.metrics.trace if self.metrics is not None else None
+        if trace is not None:
+            for addr, pkts in out.items():
+                for pkt in pkts:
+                    sent = Packet.parse_from(pkt)
+                    trace("send", addr, sent.conn_id, sent.seq, sent.pkt_type, len(pkt))
+        try:
+            for addr, pkts in out.items():
+                self.io.send_batch(pkts, addr)
+        except OSError:
+            if not self.running:
+                return  # socket closed by stop() while sending
+            raise
+        finally:
+            out.clear()
+
+    def _on_sweep(self):
+        self._sweep(time.monotonic())
+        if self.running:
+            self.engine.call_later(SWEEP_INTERVAL, self._on_sweep)
+
+    def _handle(self, pkt, view, addr, out, now):
+        """Process one parsed datagram, queueing any ACK to send back in `out`."""
+        pkt_type, seq, data, fchk, conn_id = pkt
+        if pkt_type == TYPE_SETUP:
+            self._setup(addr, conn_id, data, out, now)
+            return
+        if pkt_type == TYPE_RESUME:
+            self._resume(addr, conn_id, data, out, now)
+            return
+        if pkt_type == TYPE_FEC:
+            self._fec(addr, conn_id, seq, data, out, now)
+            return
+        if pkt_type != TYPE_DATA and pkt_type != TYPE_STRIPE and pkt_type != TYPE_META:
+            return
+        key = (addr, conn_id)
+        session = self.sessions.get(key)
+        if session is None:
+            if key in self.finished:
+                # Retransmit from a transfer that already finished (its last ACK got lost)
+                self._queue_ack(out, addr, conn_id, self.finished[key][0] + 1,
+                                csum=Packet.checksum_id(view))
+                return
+            if len(self.sessions) >= self.max_sessions:
+                # Too many transfers at once: drop, the sender will retry
+                return
+            session = Session(addr, conn_id, self.window, self.outfile.replace("{id}", f"{conn_id:08x}"), now)
+            self.sessions[key] = session
+        session.last_active = now
+        session.csum = Packet.checksum_id(view)
+        if session.fec is None or pkt_type != TYPE_DATA:
+            self._receive(session, pkt_type, seq, data, fchk, view, out, now)
+            return
+        # Keep a copy for rebuilding others of its group; it may complete a group itself
+        raw_type = TYPE_DATA | COMPRESSED if Packet.is_compressed(view) else TYPE_DATA
+        rebuilt = session.fec.add_data(seq, raw_type, data, fchk)
+        self._receive(session, pkt_type, seq, data, fchk, view, out, now)
+        self._rebuild(session, rebuilt, out, now)
+
+    def _receive(self, session, pkt_type, seq, data, fchk, view, out, now):
+        """Take a DATA, STRIPE or META packet into its session."""
+        addr, conn_id = session.addr, session.conn_id
+        if pkt_type == TYPE_STRIPE:
+            # SEQ 0 of a stripe: join (or start) its group; it carries no file data
+            if seq != 0:
+                return
+            if session.group is None:
+                self._join_group(session, Packet.parse_stripe(data), now)
+            data = b""
+        elif pkt_type == TYPE_META:
+            # SEQ 0 announces the size: preallocate and map the output file
+            if seq != 0:
+                return
+            if session.mapped is None:
+                session.mapped = MappedFile(session.path, conn_id, Packet.parse_meta(data), session.chunk)
+            data = b""
+        if session.group is not None:
+            session.group.last_active = now
+        window = session.window
+        if not window.in_window(seq):
+            # Beyond the receive window: drop, the sender will retry
+            return
+
+        # Write chunk(s) that are now in order straight to disk
+        in_order = seq == window.expected
+        first = window.expected
+        if session.stream is not None:
+            if pkt_type == TYPE_DATA:
+                data = bytes((session.codec if Packet.is_compressed(view) else 0,)) + data
+        elif Packet.is_compressed(view):
+            raise ValueError("Compressed payload without an agreed codec")
+        elif session.mapped is not None and seq > 0 and seq >= first:
+            # Into the map at once, in any order: the window only tracks which SEQs arrived
+            session.mapped.write(seq, data)
+            data = b""
+        session.write(window.offer(seq, data), first)
+        if fchk is not None:
+            session.last_seq, session.fchk = seq, fchk
+
+        # If every packet up to the last one arrived, validate and write
+        if session.last_seq is not None and window.expected > session.last_seq:
+            self._finish(session, now)
+            # The cumulative ACK only covers the last packet once the file is
+            # on disk: it tells the sender the whole transfer is done
+            self._queue_ack(out, addr, conn_id, session.last_seq + 1, csum=session.csum)
+            return
+
+        # Coalesce ACKs, but report gaps and duplicates at once (they drive fast retransmit)
+        session.since_ack += 1
+        if not in_order or session.since_ack >= self.ack_every:
+            self._ack_due(session)
+        elif session not in self.acks_pending:
+            session.ack_timer = self.engine.call_at(now + self.ack_delay, self._ack_due, session)
+            self.acks_pending.add(session)
+
+    def _ack_due(self, session):
+        """Send the session's SACK at the end of this turn."""
+        self.engine.cancel(session.ack_timer)
+        session.ack_timer = None
+        self.acks_pending.add(session)
+        self.acks_now.add(session)
+
+    def _fec(self, addr, conn_id, seq, data, out, now):
+        """Parity of the group of DATA packets starting at `seq`: rebuild what it can."""
+        session = self.sessions.get((addr, conn_id))
+        if session is None or session.fec is None:
+            return      # transfer done, or FEC not agreed
+        session.last_active = now
+        n, k, index, parity = Packet.parse_fec(data)
+        if k != session.fec.k:
+            raise ValueError("Error in FEC header")
+        session.fec.discard_below(session.window.expected)
+        self._rebuild(session, session.fec.add_parity(seq, n, index, parity), out, now)
+
+    def _rebuild(self, session, rebuilt, out, now):
+        """Handle packets rebuilt from parity as if they had just arrived."""
+        for seq, symbol in rebuilt:
+            pkt_type, payload, fchk = fec.parse_symbol(symbol)
+            pkt = Packet.create(seq, payload, pkt_type, fchk, session.conn_id, session.csum)
+            self.stats["recovered"] += 1
+            self._handle(Packet.parse_from(pkt), pkt, session.addr, out, now)
+
+    def _ack(self, out, session):
+        self._queue_ack(out, session.addr, session.conn_id, session.window.expected,
+                        session.window.sack_ranges(), session.csum)
+        session.since_ack = 0
+        self._cancel_ack(session)
+
+    def _cancel_ack(self, session):
+        self.engine.cancel(session.ack_timer)
+        session.ack_timer = None
+        self.acks_pending.discard(session)
+        self.acks_now.discard(session)
+
+    def _queue_ack(self, out, addr, conn_id, cum_ack, ranges=(), csum=0):
+        out.setdefault(addr, []).append(Packet.create_sack(cum_ack, ranges, conn_id, csum))
+
+    def _setup(self, addr, conn_id, data, out, now):
+        """
+        Chunk size, codec and FEC handshake: agree on the smaller of the
+        client's proposed chunk size and `max_chunk`, on its codec if this
+        server has it, and on its FEC group if that is a valid one.
+        """
+        key = (addr, conn_id)
+        session = self.sessions.get(key)
+        if session is None:
+            if key in self.finished or len(self.sessions) >= self.max_sessions:
+                return
+            session = Session(addr, conn_id, self.window, self.outfile.replace("{id}", f"{conn_id:08x}"), now)
+            setup = Packet.parse_setup(data)
+            session.chunk = min(setup.chunk, self.max_chunk)
+            if setup.codec in CODECS:
+                session.codec, session.stream = setup.codec, Stream()
+            if setup.fec_n and setup.fec_k and setup.fec_n + setup.fec_k <= fec.MAX_SYMBOLS:
+                session.fec = fec.Decoder(setup.fec_n, setup.fec_k)
+            self.sessions[key] = session
+        session.last_active = now
+        fec_n, fec_k = (session.fec.n, session.fec.k) if session.fec is not None else (0, 0)
+        # Sent again for a repeated request (the first reply got lost)
+        out.setdefault(addr, []).append(
+            Packet.create_setup_reply(session.chunk, conn_id, session.codec, fec_n, fec_k))
+
+    def _resume(self, addr, conn_id, data, out, now):
+        """Handshake of a resumable transfer: reply with the chunks still missing."""
+        key = (addr, conn_id)
+        session = self.sessions.get(key)
+        if session is None or session.resume is None:
+            if session is None:
+                if key in self.finished or len(self.sessions) >= self.max_sessions:
+                    return
+                session = Session(addr, conn_id, self.window, self.outfile, now)
+            resume_id, size, fchk = Packet.parse_resume(data)
+            session.path = self.outfile.replace("{id}", f"{resume_id:08x}")
+            previous = self.resumable.get(resume_id)
+            if (previous is not None and previous.resume.index.file_checksum == fchk
+                    and previous.resume.index.chunk_size == session.chunk):
+                # The client restarted while its old session was still open: take the file over
+                session.resume, previous.resume = previous.resume, None
+                self._close_session(previous)
+            else:
+                if previous is not None:
+                    self._close_session(previous)
+                session.resume = ResumeFile(session.path, resume_id, size, session.chunk, fchk)
+            # Always ask for at least the last chunk: its FCHK packet is what completes the transfer
+            session.ranges = session.resume.index.missing_ranges(MAX_SACK_RANGES) or \
+                [(session.resume.index.chunks - 1, session.resume.index.chunks)]
+            session.chunk_ids = (i for start, end in session.ranges for i in range(start, end))
+            self.sessions[key] = session
+            self.resumable[resume_id] = session
+            missing = sum(end - start for start, end in session.ranges)
+            print(f"Resuming {session.path}: {missing} of {session.resume.index.chunks} chunks needed")
+        session.last_active = now
+        # Sent again for a repeated request (the first reply got lost)
+        out.setdefault(addr, []).append(Packet.create_resume_reply(session.ranges, conn_id))
+
+    def _close_session(self, session):
+        """Drop a session; a resumable one keeps its partial file and index."""
+        del self.sessions[(session.addr, session.conn_id)]
+        self._cancel_ack(session)
+        if session.resume is not None and self.resumable.get(session.resume.resume_id) is session:
+            del self.resumable[session.resume.resume_id]
+        session.discard()
+
+    def _join_group(self, session, info, now):
+        key = (session.addr[0], info.group_id)
+        group = self.groups.get(key)
+        if group is None:
+            path = self.outfile.replace("{id}", f"{info.group_id:08x}")
+            group = self.groups[key] = StripeGroup(key, info, path, now)
+        session.group = group
+        session.index = info.index
+        session.pos = info.offset
+
+    def _finish(self, session, now):
+        # Everything is already on disk; only the checksum is left to check
+        key = (session.addr, session.conn_id)
+        del self.sessions[key]
+        self._cancel_ack(session)
+        self.finished[key] = (session.last_seq, now)
+        if self.metrics is not None:
+            self.metrics.observe("transfer_seconds", now - session.started)
+        if session.group is not None:
+            self._finish_stripe(session)
+            return
+        if session.mapped is not None:
+            ok = session.mapped.checksum() == session.fchk
+            session.mapped.close(keep=ok)
+            if ok:
+                print(f"File received correctly. Writing to {session.path}")
+                self.stats["transfers"] += 1
+            else:
+                print("File checksum mismatch!")
+                self.stats["failed"] += 1
+            return
+        if session.resume is not None:
+            del self.resumable[session.resume.resume_id]
+            if session.resume.commit():
+                print(f"File received correctly. Writing to {session.path}")
+                self.stats["transfers"] += 1
+            else:
+                print("File checksum mismatch!")
+                self.stats["failed"] += 1
+            return
+        session.out.close()
+        if session.crc == session.fchk:
+            print(f"File received correctly. Writing to {session.path}")
+            os.replace(session.out.name, session.path)
+            self.stats["transfers"] += 1
+        else:
+            print("File checksum mismatch!")
+            self.stats["failed"] += 1
+            os.remove(session.out.name)
+
+    def _finish_stripe(self, session):
+        group = session.group
+        if group.closed:
+            return
+        if session.crc != session.fchk:
+            print("Stripe checksum mismatch!")
+            self._drop_group(group, "failed")
+            return
+        group.done.add(session.index)
+        if len(group.done) < group.info.count:
+            return
+        # Last stripe in: check the whole file
+        del self.groups[group.key]
+        group.close(keep=True)
+        if group.checksum() == group.info.file_checksum:
+            print(f"File received correctly ({group.info.count} stripes). Writing to {group.path}")
+            os.replace(group.part, group.path)
+            self.stats["transfers"] += 1
+        else:
+            print("File checksum mismatch!")
+            os.remove(group.part)
+            self.stats["failed"] += 1
+
+    def _drop_group(self, group, reason):
+        del self.groups[group.key]
+        group.close()
+        self.stats[reason] += 1
+
+    def _sweep(self, now):
+        """Evict sessions that went idle, and forget transfers finished long ago."""
+        for session in list(self.sessions.values()):
+            if now - session.last_active > self.idle_timeout:
+                print(f"Transfer {session.conn_id:08x} from {session.addr} timed out")
+                self._close_session(session)
+                self.stats["evicted"] += 1
+        # Persist resume progress, so a crash loses at most one sweep interval of it
+        for session in self.resumable.values():
+            session.resume.index.flush()
+        for group in list(self.groups.values()):
+            if now - group.last_active > self.idle_timeout:
+                print(f"Striped transfer {group.info.group_id:08x} timed out")
+                self._drop_group(group, "evicted")
+        for key, (_, finished_at) in list(self.finished.items()):
+            if now - finished_at > self.idle_timeout:
+                del self.finished[key]
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="UDP File Server")
     parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind")
     parser.add_argument("--port", type=int, default=6000, help="Port to bind")
     parser.add_argument(
-        "--outfile", type=str, default="received.bin", help="File to save received data"
+        "--outfile", type=str, default="received.bin",
+        help="File to save received data ('{id}' is replaced by the transfer ID)"
     )
+    parser.add_argument("--window", type=int, default=64, help="Receive window in packets")
+    parser.add_argument("--no-batch", action="store_true",
+                        help="One syscall per datagram instead of batched I/O")
+    parser.add_argument("--ack-every", type=int, default=16, help="Send a SACK every N packets")
+    parser.add_argument("--ack-delay", type=float, default=0.005,
+                        help="... or after this many seconds, whichever comes first")
+    parser.add_argument("--idle-timeout", type=float, default=10.0,
+                        help="Seconds before an idle transfer is dropped")
+    parser.add_argument("--max-sessions", type=int, default=1024,
+                        help="Transfers received at the same time")
+    parser.add_argument("--max-chunk", type=int, default=MAX_CHUNK,
+                        help="Largest chunk size a client may negotiate, in bytes")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes sharing the port via SO_REUSEPORT")
+    parser.add_argument("--stats-interval", type=float, default=10.0,
+                        help="Seconds between aggregated stats lines (with --workers)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve /metrics and /metrics.json on this port (worker N: port + N)")
     args = parser.parse_args()
 
-    server = UDPServer(host=args.host, port=args.port, outfile=args.outfile)
-    server.start()
+    def make_server(worker=None, stats=None):
+        outfile = args.outfile
+        if worker is not None:
+            # Each worker receives its own transfers, so each gets its own file
+            root, ext = os.path.splitext(outfile)
+            outfile = f"{root}.{worker}{ext}"
+        metrics = None
+        if args.metrics_port is not None:
+            metrics = Metrics(prefix="udp_server")
+            MetricsServer(metrics, port=args.metrics_port + (worker or 0)).start()
+        return UDPServer(host=args.host, port=args.port, outfile=outfile, window=args.window,
+                         batch=not args.no_batch, ack_every=args.ack_every, ack_delay=args.ack_delay,
+                         idle_timeout=args.idle_timeout, max_sessions=args.max_sessions,
+                         reuse_port=worker is not None, stats=stats, max_chunk=args.max_chunk,
+                         metrics=metrics)
+
+    if args.workers > 1:
+        Supervisor(make_server, args.workers, STATS_KEYS, interval=args.stats_interval).run()
+    else:
+        make_server().start()
@@ -0,0 +1,120 @@
+"""
+Multi-process mode for the server.
+
+`Supervisor` forks N worker processes. Each one runs its own server bound to
+the same port with SO_REUSEPORT, and the kernel spreads incoming flows across
+them. For UDP the choice of worker is a hash of the (source, destination)
+address pair. A client sends a whole transfer from one socket, so all of a
+transfer's datagrams reach the same worker, and no transfer state has to be
+shared between processes.
+
+Each worker counts events in its own `SharedStats` block of shared memory.
+The supervisor sums them, prints the totals now and then, and restarts any
+worker that exits.
+
+Every branch runs on its own, so each one carries a copy of this module.
+Keep their code the same: a fix goes into all three (Branch-2's test 23
+checks that they match; only the docstrings differ).
+"""
+import multiprocessing
+import signal
+import time
+
+
+class SharedStats:
+    """
+    Integer counters in shared memory, used like a dict: stats["packets"] += 1.
+    Only one worker writes each block, so no lock is needed.
+    """
+    def __init__(self, keys, ctx=multiprocessing):
+        self.keys = tuple(keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.values = ctx.RawArray("q", len(self.keys))
+
+    def __getitem__(self, key):
+        return self.values[self.index[key]]
+
+    def __setitem__(self, key, value):
+        self.values[self.index[key]] = value
+
+    def as_dict(self) -> dict:
+        return dict(zip(self.keys, self.values[:]))
+
+
+class Supervisor:
+    def __init__(self, make_server, workers: int, keys, interval: float = 10.0,
+                 restart_delay: float = 1.0):
+        """
+        `make_server(worker_index, stats)` builds a server (with SO_REUSEPORT)
+        inside the worker process; its `start()` must serve until killed.
+        """
+        self.ctx = multiprocessing.get_context("fork")
+        self.make_server = make_server
+        self.stats = [SharedStats(keys, self.ctx) for _ in range(workers)]
+        self.procs = [None] * workers
+        self.spawned = [0.0] * workers
+        self.interval = interval
+        self.restart_delay = restart_delay
+        self.restarts = 0
+        self.running = False
+
+    def run(self):
+        """Start the workers and keep them running until SIGINT/SIGTERM."""
+        self.running = True
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        for i in range(len(self.procs)):
+            self._spawn(i)
+        print(f"Supervisor started {len(self.procs)} workers")
+        last_report = time.monotonic()
+        try:
+            while self.running:
+                time.sleep(0.1)
+                now = time.monotonic()
+                for i, proc in enumerate(self.procs):
+                    # Crash loops (e.g. the port is taken) restart at most once per restart_delay
+                    if not proc.is_alive() and self.running and now - self.spawned[i] >= self.restart_delay:
+                        print(f"Worker {i} (pid {proc.pid}) exited with code {proc.exitcode}, restarting")
+                        self.restarts += 1
+                        self._spawn(i)
+                if self.interval and now - last_report >= self.interval:
+                    print("Stats:", self.totals())
+                    last_report = now
+        finally:
+            self.shutdown()
+            print("Stats:", self.totals())
+
+    def stop(self):
+        self.running = False
+
+    def shutdown(self):
+        for proc in self.procs:
+            if proc is not None and proc.is_alive():
+                proc.terminate()
+        for proc in self.procs:
+            if proc is not None:
+                proc.join()
+
+    def totals(self) -> dict:
+        """Counters summed over all workers, plus the number of restarts."""
+        totals = dict.fromkeys(self.stats[0].keys, 0)
+        for stats in self.stats:
+            for key, value in stats.as_dict().items():
+                totals[key] += value
+        totals["restarts"] = self.restarts
+        return totals
+
+    def _spawn(self, i):
+        proc = self.ctx.Process(target=self._worker, args=(i,), daemon=True)
+        proc.start()
+        self.procs[i] = proc
+        self.spawned[i] = time.monotonic()
+
+    def _worker(self, i):
+        # The supervisor handles Ctrl-C and terminates the workers itself
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self.make_server(i, self.stats[i]).start()
+
+    def _on_signal(self, signum, frame):
+        self.stop()
@@ -3,11 +3,21 @@ import threading
 import time
 import socket
 import zlib
+import tempfile
+import subprocess
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from packet import Packet, TYPE_DATA, TYPE_ACK
+from packet import Packet, TYPE_DATA, TYPE_ACK, TYPE_SACK, MAX_CHUNK
 from client import UDPClient
 from server import UDPServer
+from relay import LossyRelay, TCPRelay, TokenBucket
+import packet
+import checksums
+import compression
+import fec
+import metrics
+import engine
+from window import RecvWindow
 
 HOST = "127.0.0.1"
 PORT = 6200
@@ -15,7 +25,8 @@ PORT = 6200
 class TestPublic(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
-        cls.server = UDPServer(host=HOST, port=PORT)
+        cls.outfile = os.path.join(tempfile.mkdtemp(), "received.bin")
+        cls.server = UDPServer(host=HOST, port=PORT, outfile=cls.outfile)
         cls.thread = threading.Thread(target=cls.server.start, daemon=True)
         cls.thread.start()
         time.sleep(0.5)
@@ -23,6 +34,7 @@ class TestPublic(unittest.TestCase):
     # 1. Can talk to each other
     def test_can_talk(self):
         client = UDPClient(host=HOST, port=PORT)
+        self.addCleanup(client.close)
         client.send_data(b"hello world")
 
     # 2. Can parse headers
@@ -58,6 +70,510 @@ class TestPublic(unittest.TestCase):
         self.assertEqual(parsed, data)
         self.assertEqual(fchk, fullchk)
 
+    # 6. Pipelined transfer, Selective Repeat
+    def test_window_selective_repeat(self):
+        data = os.urandom(50_000)
+        with UDPClient(host=HOST, port=PORT, window=16, mode="sr") as client:
+            client.send_data(data)
+        with open(self.outfile, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    # 7. Pipelined transfer, Go-Back-N
+    def test_window_go_back_n(self):
+        data = os.urandom(50_500)
+        with UDPClient(host=HOST, port=PORT, window=8, mode="gbn") as client:
+            client.send_data(data)
+        with open(self.outfile, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    # 8. Retransmission recovers from loss and reordering
+    def test_lossy_relay(self):
+        relay = LossyRelay((HOST, PORT), loss=0.1, reorder=0.1, seed=4)
+        relay.start()
+        try:
+            data = os.urandom(100_000)
+            with UDPClient(host=HOST, port=relay.port, window=16) as client:
+                client.send_data(data)
+        finally:
+            relay.stop()
+        self.assertGreater(relay.dropped, 0)
+        with open(self.outfile, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    # 9. Congestion window ramps up and backs off on loss
+    def test_congestion_control_trace(self):
+        for cc in ("reno", "cubic"):
+            relay = LossyRelay((HOST, PORT), loss=0.05, seed=7)
+            relay.start()
+            try:
+                data = os.urandom(200_000)
+                client = UDPClient(host=HOST, port=relay.port, window=64, cc=cc)
+                self.addCleanup(client.close)
+                client.send_data(data)
+            finally:
+                relay.stop()
+            cwnds = [c for _, c in client.cc.trace]
+            self.assertGreater(max(cwnds), cwnds[0])
+            self.assertLess(min(cwnds[cwnds.index(max(cwnds)):]), max(cwnds))
+            with open(self.outfile, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    # 10. Streaming a file from disk
+    def test_send_file_streaming(self):
+        path = os.path.join(tempfile.mkdtemp(), "input.bin")
+        data = os.urandom(2_000_500)
+        with open(path, "wb") as f:
+            f.write(data)
+        with UDPClient(host=HOST, port=PORT, window=64) as client:
+            client.send_file(path)
+        with open(self.outfile, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    # 11. Batched and per-datagram I/O both deliver the file
+    def test_batched_io(self):
+        data = os.urandom(300_000)
+        for batch in (True, False):
+            client = UDPClient(host=HOST, port=PORT, window=64, batch=batch)
+            self.addCleanup(client.close)
+            client.send_data(data)
+            with open(self.outfile, "rb") as f:
+                self.assertEqual(f.read(), data)
+            stats = client.io.stats
+            self.assertGreaterEqual(stats["sent"], 300)
+            if batch and client.io.gso:
+                self.assertLess(stats["send_calls"], stats["sent"])
+
+    # 12. SACK packets carry a cumulative ACK and received ranges
+    def test_sack_packet(self):
+        pkt = Packet.create_sack(5, [(7, 9), (12, 13)])
+        t, cum, payload, _ = Packet.parse(pkt)
+        self.assertEqual((t, cum), (TYPE_SACK, 5))
+        self.assertEqual(Packet.parse_sack(payload), [(7, 9), (12, 13)])
+
+    # 13. Coalesced ACKs: far fewer ACKs than data packets
+    def test_coalesced_acks(self):
+        stats = self.server.io.stats
+        received, sent = stats["received"], stats["sent"]
+        with UDPClient(host=HOST, port=PORT, window=64) as client:
+            client.send_data(os.urandom(500_000))
+        self.assertLess((stats["sent"] - sent) * 5, stats["received"] - received)
+
+    # 14. --workers: transfers are served across processes and crashed workers restart
+    def test_workers(self):
+        outdir = tempfile.mkdtemp()
+        proc = subprocess.Popen(
+            [sys.executable, "server.py", "--port", str(PORT + 1), "--workers", "2",
+             "--outfile", os.path.join(outdir, "received.bin")],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, text=True)
+        try:
+            time.sleep(0.5)
+            sent = []
+            for _ in range(4):
+                sent.append(os.urandom(100_000))
+                with UDPClient(host=HOST, port=PORT + 1) as client:
+                    client.send_data(sent[-1])
+            with open(f"/proc/{proc.pid}/task/{proc.pid}/children") as f:
+                workers = f.read().split()
+            self.assertEqual(len(workers), 2)
+            os.kill(int(workers[0]), 9)
+            time.sleep(1.5)
+            sent.append(os.urandom(100_000))
+            with UDPClient(host=HOST, port=PORT + 1) as client:
+                client.send_data(sent[-1])
+            for name in os.listdir(outdir):
+                with open(os.path.join(outdir, name), "rb") as f:
+                    self.assertIn(f.read(), sent)
+        finally:
+            proc.terminate()
+            out, _ = proc.communicate()
+        self.assertIn("restarting", out)
+        totals = out.strip().splitlines()[-1]
+        self.assertIn("'restarts': 1", totals)
+
+    # 15. Concurrent transfers each get their own session and file
+    def test_concurrent_transfers(self):
+        outdir = tempfile.mkdtemp()
+        server = UDPServer(host=HOST, port=PORT + 2, outfile=os.path.join(outdir, "{id}.bin"))
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        results = []
+        def upload():
+            client = UDPClient(host=HOST, port=PORT + 2, window=16)
+            data = os.urandom(50_000)
+            client.send_data(data)
+            client.close()
+            results.append((client.conn_id, data))
+        uploads = [threading.Thread(target=upload) for _ in range(50)]
+        for t in uploads:
+            t.start()
+        for t in uploads:
+            t.join()
+        server.stop()
+        thread.join()
+        self.assertEqual(len(results), 50)
+        for conn_id, data in results:
+            with open(os.path.join(outdir, f"{conn_id:08x}.bin"), "rb") as f:
+                self.assertEqual(f.read(), data)
+        self.assertEqual(server.stats["transfers"], 50)
+        self.assertEqual(server.sessions, {})
+
+    # 16. Idle sessions are evicted and their partial file removed
+    def test_idle_eviction(self):
+        outdir = tempfile.mkdtemp()
+        server = UDPServer(host=HOST, port=PORT + 3, outfile=os.path.join(outdir, "out.bin"),
+                           idle_timeout=0.2)
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.sendto(Packet.create(0, b"abc", TYPE_DATA, conn_id=7), (HOST, PORT + 3))
+        time.sleep(0.2)
+        self.assertEqual(len(server.sessions), 1)
+        time.sleep(1.0)
+        server.stop()
+        thread.join()
+        sock.close()
+        self.assertEqual(server.sessions, {})
+        self.assertEqual(server.stats["evicted"], 1)
+        self.assertEqual(os.listdir(outdir), [])
+
+    # 17. Striped transfer: byte ranges over concurrent flows, reassembled by offset
+    def test_striped_transfer(self):
+        path = os.path.join(tempfile.mkdtemp(), "input.bin")
+        data = os.urandom(1_500_300)
+        with open(path, "wb") as f:
+            f.write(data)
+        transfers = self.server.stats["transfers"]
+        with UDPClient(host=HOST, port=PORT, window=32) as client:
+            client.send_file_striped(path, streams=4)
+        with open(self.outfile, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(self.server.stats["transfers"], transfers + 1)
+        self.assertEqual(self.server.groups, {})
+
+    # 18. An interrupted resumable upload continues where it stopped
+    def test_resume(self):
+        outdir = tempfile.mkdtemp()
+        outfile = os.path.join(outdir, "out.bin")
+        path = os.path.join(tempfile.mkdtemp(), "input.bin")
+        data = os.urandom(20_000_000)
+        with open(path, "wb") as f:
+            f.write(data)
+
+        server = UDPServer(host=HOST, port=PORT + 4, outfile=outfile)
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        errors = []
+        def upload():
+            try:
+                with UDPClient(host=HOST, port=PORT + 4, max_retries=2, max_rto=0.1) as client:
+                    client.send_file(path, resume=True)
+            except TimeoutError as e:
+                errors.append(e)
+        uploader = threading.Thread(target=upload)
+        uploader.start()
+        # Kill the server partway through
+        while not server.resumable or next(iter(server.resumable.values())).resume.index.count() < 5000:
+            time.sleep(0.01)
+        server.stop()
+        thread.join()
+        uploader.join()
+        self.assertEqual(len(errors), 1)
+        self.assertFalse(os.path.exists(outfile))
+
+        server = UDPServer(host=HOST, port=PORT + 4, outfile=outfile)
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        with UDPClient(host=HOST, port=PORT + 4, window=64) as client:
+            client.send_file(path, resume=True)
+        server.stop()
+        thread.join()
+        with open(outfile, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(os.listdir(outdir), ["out.bin"])
+        # Only the missing part was sent the second time
+        self.assertLess(server.stats["packets"], 20_000 - 4000)
+
+    # 19. Memory-mapped transfer: payloads land in the mapped output file in any order
+    def test_mmap_transfer(self):
+        path = os.path.join(tempfile.mkdtemp(), "input.bin")
+        data = os.urandom(300_500)
+        with open(path, "wb") as f:
+            f.write(data)
+        transfers = self.server.stats["transfers"]
+        relay = LossyRelay((HOST, PORT), loss=0.1, reorder=0.1, seed=5)
+        relay.start()
+        try:
+            with UDPClient(host=HOST, port=relay.port, window=16) as client:
+                client.send_file(path, use_mmap=True)
+        finally:
+            relay.stop()
+        self.assertGreater(relay.dropped, 0)
+        with open(self.outfile, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(self.server.stats["transfers"], transfers + 1)
+
+    # 20. Chunk size: negotiated per transfer, capped by the server, probed from the path MTU
+    def test_chunk_negotiation(self):
+        path = os.path.join(tempfile.mkdtemp(), "input.bin")
+        data = os.urandom(1_000_000)
+        with open(path, "wb") as f:
+            f.write(data)
+
+        outfile = os.path.join(tempfile.mkdtemp(), "out.bin")
+        server = UDPServer(host=HOST, port=PORT + 5, outfile=outfile, max_chunk=4000)
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        try:
+            for use_mmap in (False, True):
+                client = UDPClient(host=HOST, port=PORT + 5, chunk_size=9000)
+                self.addCleanup(client.close)
+                client.send_file(path, use_mmap=use_mmap)
+                self.assertEqual(client.chunk, 4000)
+                with open(outfile, "rb") as f:
+                    self.assertEqual(f.read(), data)
+            # 250 data packets, not 1000
+            self.assertLess(server.stats["packets"], 2 * 300)
+        finally:
+            server.stop()
+            thread.join()
+
+        # Loopback's MTU allows the largest chunk a datagram can hold
+        client = UDPClient(host=HOST, port=PORT, probe_mtu=True)
+        self.addCleanup(client.close)
+        client.send_file(path)
+        self.assertEqual(client.chunk, MAX_CHUNK)
+        with open(self.outfile, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    # 21. Checksum backends: chosen by the sender, named in the header
+    def test_checksum_backends(self):
+        for name in ("crc32c", "adler32"):
+            csum = checksums.get(name).id
+            pkt = Packet.create(5, b"hello", TYPE_DATA, conn_id=9, csum=csum)
+            self.assertEqual(Packet.checksum_id(pkt), csum)
+            self.assertEqual(Packet.parse_from(pkt)[:2], (TYPE_DATA, 5))
+            corrupted = bytearray(pkt)
+            corrupted[-1] ^= 0x01
+            with self.assertRaises(ValueError):
+                Packet.parse_from(corrupted)
+        # CRC32C check value
+        self.assertEqual(checksums.CRC32C.update(b"123456789"), 0xE3069283)
+
+        data = os.urandom(50_000)
+        for name in sorted(checksums.BY_NAME):
+            with UDPClient(host=HOST, port=PORT, checksum=name) as client:
+                client.send_data(data)
+            with open(self.outfile, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    # 22. Batch packetizer: same packets as one create() each, with or without NumPy
+    def test_create_parse_many(self):
+        data = os.urandom(10_500)
+        expected = [Packet.create(3 + i, data[i * 1000:(i + 1) * 1000], TYPE_DATA,
+                                  0xABCD if i == 10 else None, 42) for i in range(11)]
+        saved = packet.np
+        try:
+            for np in (saved, None):
+                packet.np = np
+                pkts = Packet.create_many(data, 3, 42, 0xABCD)
+                self.assertEqual([bytes(p) for p in pkts], expected)
+                # A reused buffer still holds the previous batch's CHKs
+                buf = bytearray(len(data) + 11 * packet._HDR_LAST_SIZE)
+                Packet.create_many(os.urandom(len(data)), 3, 42, 0xABCD, buf=buf)
+                pkts = Packet.create_many(data, 3, 42, 0xABCD, buf=buf)
+                self.assertEqual([bytes(p) for p in pkts], expected)
+        finally:
+            packet.np = saved
+        self.assertEqual(Packet.create_many(b"", file_checksum=0)[0].tobytes(),
+                         Packet.create(0, b"", TYPE_DATA, 0))
+
+        bad = bytearray(expected[0])
+        bad[-1] ^= 0x01
+        parsed = Packet.parse_many(expected[:2] + [bad])
+        self.assertEqual([(p.seq, bytes(p.payload)) for p in parsed[:2]],
+                         [(3, data[:1000]), (4, data[1000:2000])])
+        self.assertIsNone(parsed[2])
+        self.assertEqual(Packet.parse_many(expected)[-1].file_checksum, 0xABCD)
+
+    # 23. Compression: text shrinks, random data goes raw, both arrive intact
+    def test_compression(self):
+        text = b"".join(b"%d INFO request served in %d ms\n" % (i, i % 97) for i in range(5000))
+        data = text + os.urandom(30_000) + text[:20_000]
+        stream, receiver = compression.Stream(compression.ZLIB), compression.Stream()
+        encoded = [stream.encode(data[i:i + 1000]) for i in range(0, len(data), 1000)]
+        self.assertLess(sum(len(body) for _, body in encoded[:50]), 50 * 1000 // 4)
+        self.assertIn(0, [codec_id for codec_id, _ in encoded])
+        self.assertEqual(b"".join(receiver.decode(c, body, 1000) for c, body in encoded), data)
+
+        for name in sorted(compression.BY_NAME):
+            relay = LossyRelay((HOST, PORT), loss=0.05, reorder=0.05, seed=3)
+            relay.start()
+            try:
+                with UDPClient(host=HOST, port=relay.port, compress=name) as client:
+                    client.send_data(data)
+            finally:
+                relay.stop()
+            with open(self.outfile, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    # 24. FEC: any K losses of a group are rebuilt; transfers recover without retransmitting
+    def test_fec(self):
+        symbols = [fec.symbol(TYPE_DATA, os.urandom(i * 37), 7 if i == 5 else None) for i in range(6)]
+        parity = fec.encode(symbols, 3)
+        have = {i: s for i, s in enumerate(symbols) if i not in (0, 2, 5)}
+        rebuilt = fec.decode(have, dict(enumerate(parity)), 6, 3)
+        for i in (0, 2, 5):
+            self.assertEqual(fec.parse_symbol(rebuilt[i]), fec.parse_symbol(symbols[i]))
+        self.assertEqual(fec.decode(have, {0: parity[0]}, 6, 3), {})
+
+        data = os.urandom(200_000)
+        before = self.server.stats["recovered"]
+        for group, parity in ((8, 1), (10, 3)):
+            relay = LossyRelay((HOST, PORT), loss=0.05, reorder=0.05, seed=2)
+            relay.start()
+            try:
+                with UDPClient(host=HOST, port=relay.port, fec_group=group, fec_parity=parity) as client:
+                    client.send_data(data)
+            finally:
+                relay.stop()
+            with open(self.outfile, "rb") as f:
+                self.assertEqual(f.read(), data)
+        self.assertGreater(self.server.stats["recovered"], before)
+
+    # 25. Impairment relay: bursts, delay, jitter, duplicates, bit flips and a rate cap
+    def test_impairments(self):
+        bucket = TokenBucket(rate=1000, bucket=500, queue=1000)
+        self.assertEqual([bucket.departure(0.0, 250) for _ in range(2)], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.departure(0.0, 500), 0.5)
+        self.assertIsNone(bucket.departure(0.0, 1000))
+
+        data = os.urandom(300_000)
+        relay = LossyRelay((HOST, PORT), seed=4, delay=0.005, jitter=0.002, duplicate=0.02, corrupt=0.02,
+                           burst_enter=0.01, burst_exit=0.3, loss=0.005, rate=4_000_000)
+        relay.start()
+        start = time.time()
+        try:
+            with UDPClient(host=HOST, port=relay.port) as client:
+                client.send_data(data)
+        finally:
+            relay.stop()
+        with open(self.outfile, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertGreaterEqual(time.time() - start, (len(data) - 16 * 1024) / 4_000_000)
+        for counter in (relay.dropped, relay.duplicated, relay.corrupted):
+            self.assertGreater(counter, 0)
+
+        # TCP: an echo through a relay adding 50 ms each way
+        echo = socket.socket()
+        echo.bind((HOST, 0))
+        echo.listen()
+        def serve():
+            conn, _ = echo.accept()
+            while chunk := conn.recv(4096):
+                conn.sendall(chunk)
+            conn.close()
+        threading.Thread(target=serve, daemon=True).start()
+        relay = TCPRelay(echo.getsockname(), delay=0.05)
+        relay.start()
+        try:
+            with socket.create_connection((HOST, relay.port)) as s:
+                start = time.time()
+                s.sendall(b"ping")
+                self.assertEqual(s.recv(4096), b"ping")
+                self.assertGreaterEqual(time.time() - start, 0.1)
+        finally:
+            relay.stop()
+            echo.close()
+
+    # 26. Metrics: client and server count retransmits, RTT, checksum failures; tracing sees every packet
+    def test_metrics(self):
+        outdir = tempfile.mkdtemp()
+        events = []
+        server_metrics = metrics.Metrics(prefix="udp_server")
+        server = UDPServer(host=HOST, port=PORT + 5, outfile=os.path.join(outdir, "out.bin"),
+                           metrics=server_metrics)
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        client_metrics = metrics.Metrics(trace=lambda *event: events.append(event))
+        relay = LossyRelay((HOST, PORT + 5), loss=0.05, corrupt=0.05, seed=6)
+        relay.start()
+        try:
+            with UDPClient(host=HOST, port=relay.port, metrics=client_metrics) as client:
+                client.send_data(os.urandom(100_000))
+        finally:
+            relay.stop()
+            server.stop()
+            thread.join()
+
+        client, srv = client_metrics.snapshot(), server_metrics.snapshot()
+        self.assertGreater(client["counters"]["retransmits"], 0)
+        self.assertEqual(client["histograms"]["transfer_seconds"]["count"], 1)
+        self.assertGreater(client["histograms"]["rtt_seconds"]["count"], 0)
+        self.assertGreater(client["counters"]["sent"], 100)
+        self.assertEqual(srv["counters"]["transfers"], 1)
+        self.assertGreater(srv["counters"]["checksum_failures"], 0)
+        self.assertEqual(srv["gauges"]["sessions"], 0)
+        self.assertEqual({e[0] for e in events}, {"send", "recv", "retransmit"})
+        self.assertEqual(len([e for e in events if e[0] == "send"]), 100)
+        text = server_metrics.to_prometheus()
+        self.assertIn("udp_server_transfers_total 1", text)
+        self.assertIn("# TYPE udp_server_recv_batch histogram", text)
+
+    # 27. Timer wheel fires timers in order, never early, across levels
+    def test_timer_wheel(self):
+        wheel = engine.TimerWheel(0.0, tick=0.001)
+        fired = []
+        # Level 0, a higher level, and beyond the top wheel
+        whens = [0.0005, 0.003, 0.2, 2.5, 700.0, 5e6, 0.003]
+        timers = [wheel.add(when, fired.append, when) for when in whens]
+        wheel.cancel(timers[1])
+        wheel.cancel(timers[1])     # no-op
+        self.assertEqual(len(wheel), 6)
+        self.assertLessEqual(wheel.next_due(), 0.001)
+        for t in wheel.expire(0.0005):
+            t.callback(*t.args)
+        self.assertEqual(fired, [])     # rounded up to the next tick
+        for now in (0.001, 0.0029, 0.003, 0.199, 0.2, 2.5, 699.0, 700.0, 5e6):
+            for t in wheel.expire(now):
+                self.assertGreaterEqual(now, t.when)
+                t.callback(*t.args)
+        self.assertEqual(fired, [0.0005, 0.003, 0.2, 2.5, 700.0, 5e6])
+        self.assertEqual(len(wheel), 0)
+        self.assertIsNone(wheel.next_due())
+
+        # The engine runs a timer and a socket callback on one thread
+        loop = engine.Engine()
+        a, b = socket.socketpair()
+        got = []
+        try:
+            loop.register(a, lambda now: got.append(a.recv(16)))
+            loop.call_later(0.01, b.send, b"ping")
+            loop.run(lambda: not got, max_wait=1.0)
+        finally:
+            loop.close()
+            a.close()
+            b.close()
+        self.assertEqual(got, [b"ping"])
+
+    # 28. Receive ring buffer: in-order flush, duplicates, SACK ranges across the wrap
+    def test_recv_ring(self):
+        window = RecvWindow(4)
+        self.assertEqual(window.offer(1, b"b"), [])
+        self.assertEqual(window.offer(1, b"x"), [])     # duplicate: the first copy stays
+        self.assertEqual(window.offer(4, b"e"), [])     # beyond the window
+        self.assertEqual(window.sack_ranges(), [(1, 2)])
+        self.assertEqual([bytes(c) for c in window.offer(0, b"a")], [b"a", b"b"])
+        self.assertEqual(window.offer(0, b"a"), [])     # already delivered
+        # Slots 0 and 1 are reused for SEQ 4 and 5; a bigger payload grows every slot
+        self.assertEqual(window.offer(4, b"eeee"), [])
+        self.assertEqual(window.offer(5, b"f"), [])
+        self.assertEqual(window.sack_ranges(), [(4, 6)])
+        self.assertEqual(window.offer(3, b"d"), [])
+        self.assertEqual(window.sack_ranges(), [(3, 6)])
+        self.assertEqual([bytes(c) for c in window.offer(2, b"c")], [b"c", b"d", b"eeee", b"f"])
+        self.assertEqual(window.expected, 6)
+        self.assertEqual(window.sack_ranges(), [])
+
 if __name__ == "__main__":
     unittest.main()
 
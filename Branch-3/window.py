@@ -0,0 +1,202 @@
+"""
+Sliding windows for the Branch-3 UDP transfer.
+
+The sender keeps up to `size` packets in flight instead of waiting for
+each ACK (stop-and-wait). Two retransmission modes are supported:
+
+* Go-Back-N (GBN): on timeout, resend every packet from the window base.
+* Selective Repeat (SR): on timeout, resend only the packets not yet ACKed.
+
+The receiver accepts packets inside [expected, expected + size), buffers
+out-of-order ones and hands back whatever becomes contiguous.
+"""
+
+GO_BACK_N = "gbn"
+SELECTIVE_REPEAT = "sr"
+MODES = (GO_BACK_N, SELECTIVE_REPEAT)
+
+
+class SendWindow:
+    def __init__(self, size: int = 32, mode: str = SELECTIVE_REPEAT):
+        if size < 1:
+            raise ValueError("Window size must be at least 1")
+        if mode not in MODES:
+            raise ValueError(f"Unknown window mode: {mode}")
+        self.size = size
+        self.mode = mode
+        self.base = 0        # oldest seq not yet ACKed
+        self.next_seq = 0    # next seq to hand out
+        self.packets = {}    # seq -> encoded packet, for everything in flight
+        self.acked = set()   # seqs >= base that were ACKed out of order
+        self.sent_at = {}    # seq -> time of the last transmission
+        self.retries = {}    # seq -> number of retransmissions so far
+
+    def can_send(self) -> bool:
+        return self.next_seq < self.base + self.size
+
+    def push(self, pkt: bytes, now: float = 0.0) -> int:
+        """Register an encoded packet as in flight and return its seq."""
+        seq = self.next_seq
+        self.packets[seq] = pkt
+        self.sent_at[seq] = now
+        self.retries[seq] = 0
+        self.next_seq += 1
+        return seq
+
+    def resent(self, seq: int, now: float):
+        """Record a retransmission of `seq` (its timer is the sender's to re-arm)."""
+        self.sent_at[seq] = now
+        self.retries[seq] += 1
+
+    def ack(self, seq: int) -> bool:
+        """Mark `seq` as ACKed and slide the base. Returns True if it was new."""
+        if seq < self.base or seq >= self.next_seq or seq in self.acked:
+            return False
+        self.acked.add(seq)
+        while self.base in self.acked:
+            base = self.base
+            self.acked.discard(base)
+            del self.packets[base], self.sent_at[base], self.retries[base]
+            self.base += 1
+        return True
+
+    def sack(self, cum_ack: int, ranges) -> list[int]:
+        """
+        Apply a selective ACK: every seq below `cum_ack`, plus the [start, end)
+        ranges. Returns the seqs that were newly ACKed.
+        """
+        newly = []
+        for start, end in [(self.base, cum_ack)] + list(ranges):
+            for seq in range(max(start, self.base), min(end, self.next_seq)):
+                if self.ack(seq):
+                    newly.append(seq)
+        return newly
+
+    def lost(self, threshold: int) -> list[int]:
+        """
+        Holes to fast-retransmit: unacked seqs, not resent yet, with at least
+        `threshold` later packets ACKed (the SACK version of 3 duplicate ACKs).
+        """
+        holes = []
+        above = 0
+        for seq in range(self.next_seq - 1, self.base - 1, -1):
+            if seq in self.acked:
+                above += 1
+            elif above >= threshold and not self.retries[seq]:
+                holes.append(seq)
+        holes.reverse()
+        return holes
+
+    def rtt_sample(self, seq: int, now: float):
+        """
+        RTT for an ACK of `seq`, or None if it must not be sampled: already
+        ACKed, or retransmitted (Karn's algorithm, the ACK is ambiguous).
+        """
+        if seq not in self.packets or seq in self.acked or self.retries[seq]:
+            return None
+        return now - self.sent_at[seq]
+
+    def in_flight(self) -> int:
+        return self.next_seq - self.base - len(self.acked)
+
+    def retransmit_seqs(self, expired: list[int]) -> list[int]:
+        """Seqs to resend after `expired` timed out, according to the window mode."""
+        if self.mode == GO_BACK_N:
+            return list(range(self.base, self.next_seq))
+        return sorted(expired)
+
+
+class RecvWindow:
+    """
+    Out-of-order payloads wait in a ring of `size` slots in one bytearray,
+    SEQ s in slot s % size, with a byte per slot saying whether it is taken.
+    Storing, spotting a duplicate and flushing a chunk are all O(1), and the
+    memory stays at `size` slots however long the transfer is. Slots are as
+    big as the largest payload seen so far (the ring is reallocated if a
+    bigger one arrives, which only happens near the start of a transfer).
+    """
+    def __init__(self, size: int = 64):
+        if size < 1:
+            raise ValueError("Window size must be at least 1")
+        self.size = size
+        self.expected = 0    # next in-order seq
+        self.slot = 0        # bytes per slot (0 until something arrives out of order)
+        self.ring = bytearray()
+        self.view = memoryview(self.ring)
+        self.present = bytearray(size)      # 1 if the slot holds a payload
+        self.lengths = [0] * size           # payload bytes in each slot
+        self.held = 0        # payloads waiting in the ring
+
+    def in_window(self, seq: int) -> bool:
+        return seq < self.expected + self.size
+
+    def offer(self, seq: int, data) -> list:
+        """
+        Accept a payload and return the chunks that are now in order.
+        Duplicates and packets beyond the window are ignored. Chunks taken
+        from the ring are views into it, valid until the next offer.
+        """
+        expected = self.expected
+        if seq != expected:
+            if seq < expected or seq >= expected + self.size:
+                return []
+            # Out of order: copy it into its slot, `data` may be a view into a reused buffer
+            i = seq % self.size
+            if self.present[i]:
+                return []   # duplicate
+            n = len(data)
+            if n > self.slot:
+                self._grow(n)
+            start = i * self.slot
+            self.view[start:start + n] = data
+            self.lengths[i] = n
+            self.present[i] = 1
+            self.held += 1
+            return []
+        expected += 1
+        if not self.held:
+            self.expected = expected
+            return [data]
+        ready = [data]
+        present, size, slot, view, lengths = self.present, self.size, self.slot, self.view, self.lengths
+        i = expected % size
+        while present[i]:
+            present[i] = 0
+            start = i * slot
+            ready.append(view[start:start + lengths[i]])
+            expected += 1
+            i = expected % size
+        self.held -= len(ready) - 1
+        self.expected = expected
+        return ready
+
+    def _grow(self, n: int):
+        """Make every slot hold at least `n` bytes, keeping what is held."""
+        slot = max(n, 2 * self.slot)
+        ring = bytearray(self.size * slot)
+        for i in range(self.size):
+            if self.present[i]:
+                old = i * self.slot
+                ring[i * slot:i * slot + self.lengths[i]] = self.view[old:old + self.lengths[i]]
+        self.ring, self.view, self.slot = ring, memoryview(ring), slot
+
+    def sack_ranges(self) -> list[tuple[int, int]]:
+        """Out-of-order data held, as [start, end) ranges for a SACK."""
+        ranges = []
+        if not self.held:
+            return ranges
+        # The slots in SEQ order from `expected`; runs of taken ones are the ranges
+        first = self.expected % self.size
+        present = self.present[first:] + self.present[:first]
+        end = 0
+        while (start := present.find(1, end)) >= 0:
+            end = present.find(0, start)
+            if end < 0:
+                end = self.size
+            ranges.append((self.expected + start, self.expected + end))
+        return ranges
+
+    def reset(self):
+        self.expected = 0
+        self.present[:] = bytes(self.size)
+        self.held = 0
@@ -0,0 +1,36 @@
+"""
+Benchmark suite for all three branches.
+
+    python -m bench                                  # every scenario
+    python -m bench branch3.transfer --quick         # one scenario, small counts
+    python -m bench --out run.json
+    python -m bench --baseline main.json --tolerance 0.15
+
+Every branch has its own `client`, `server` and `packet` modules, so each
+scenario runs in a subprocess (`python -m bench.branch2 packet '{...}'`)
+with only its branch on the path. The scenario prints its results as JSON.
+Results of the whole run are one JSON document:
+
+    {"meta": {...}, "results": {"branch2.packet": {"create_16B_ops": ..., ...}, ...}}
+
+Metric names end in their unit. `_ops`, `_rps`, `_pps` and `_MBps` are
+better when higher. `_ms` and `_s` are better when lower. That is what
+`--baseline` compares on.
+"""
+
+# Scenario -> (parameters, parameters with --quick)
+SCENARIOS = {
+    "branch2.packet": ({"sizes": [16, 4096], "count": 200_000},
+                       {"sizes": [16, 4096], "count": 20_000}),
+    "branch3.packet": ({"sizes": [100, 1000, 8000], "count": 200_000},
+                       {"sizes": [1000], "count": 20_000}),
+    "branch1.rps": ({"concurrency": [1, 8, 64], "requests": 4000},
+                    {"concurrency": [1, 8], "requests": 500}),
+    "branch2.rps": ({"concurrency": [1, 8, 64], "requests": 20_000},
+                    {"concurrency": [1, 8], "requests": 2000}),
+    "branch3.transfer": ({"sizes_mb": [1, 16], "loss": [0.0, 0.01, 0.05], "rtt_ms": [0, 20], "repeat": 3},
+                         {"sizes_mb": [1], "loss": [0.0, 0.05], "rtt_ms": [0, 20], "repeat": 1}),
+}
+
+HIGHER_IS_BETTER = ("_ops", "_rps", "_pps", "_MBps")
+LOWER_IS_BETTER = ("_ms", "_s")
@@ -0,0 +1,90 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+from bench import SCENARIOS, HIGHER_IS_BETTER, LOWER_IS_BETTER
+from bench.common import ROOT
+
+
+def run_scenario(name: str, params: dict, timeout: float) -> dict:
+    """Run one scenario in its own interpreter; returns its results."""
+    module, scenario = name.split(".")
+    proc = subprocess.run([sys.executable, "-m", f"bench.{module}", scenario, json.dumps(params)],
+                          cwd=ROOT, capture_output=True, text=True, timeout=timeout)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def metadata(quick: bool) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "quick": quick,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Metrics that got worse than `baseline` by more than `tolerance` (0.1 = 10%)."""
+    regressions = []
+    for scenario, metrics in results.items():
+        for key, value in metrics.items():
+            old = baseline.get(scenario, {}).get(key)
+            if not old:
+                continue
+            if key.endswith(HIGHER_IS_BETTER):
+                change = value / old - 1
+            elif key.endswith(LOWER_IS_BETTER):
+                change = old / value - 1 if value else 0.0
+            else:
+                continue
+            # change < 0: worse, as a fraction of the baseline
+            print(f"{scenario:18s} {key:34s} {old:14,.2f} -> {value:14,.2f} {change:+7.1%}", file=sys.stderr)
+            if change < -tolerance:
+                regressions.append(f"{scenario} {key}: {change:+.1%}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmarks of all three branches")
+    parser.add_argument("scenarios", nargs="*", choices=[[]] + sorted(SCENARIOS), metavar="scenario",
+                        help=f"Scenarios to run (default: all): {', '.join(sorted(SCENARIOS))}")
+    parser.add_argument("--quick", action="store_true", help="Small counts, for a smoke run")
+    parser.add_argument("--out", type=str, default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="Compare with the results in this JSON file; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Slowdown allowed against the baseline (0.1 = 10%%)")
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds allowed per scenario")
+    args = parser.parse_args()
+
+    report = {"meta": metadata(args.quick), "results": {}}
+    for name in args.scenarios or sorted(SCENARIOS):
+        params = SCENARIOS[name][1 if args.quick else 0]
+        print(f"Running {name} {json.dumps(params)}", file=sys.stderr)
+        report["results"][name] = run_scenario(name, params, args.timeout)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report["results"], json.load(f)["results"], args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,22 @@
+"""Branch-1 scenarios: one request per connection, against the sync and asyncio servers."""
+from bench import common
+
+BRANCH_DIR = common.use_branch("Branch-1")
+from client import HelloClient     # noqa: E402  (Branch-1 must be on the path first)
+
+
+def bench_rps(concurrency=(1, 8, 64), requests: int = 4000) -> dict:
+    """Requests per second and latency at each concurrency (client threads)."""
+    results = {}
+    for mode, args in (("sync", ()), ("async", ("--async",))):
+        with common.server(BRANCH_DIR, *args) as port:
+            client = HelloClient(common.HOST, port)
+            for c in concurrency:
+                stats = common.load(lambda: client.send_and_receive("bench"), requests, c)
+                for key, value in stats.items():
+                    results[f"{mode}_c{c}_{key}"] = value
+    return results
+
+
+if __name__ == "__main__":
+    common.main({"rps": bench_rps})
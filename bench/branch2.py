@@ -0,0 +1,45 @@
+"""Branch-2 scenarios: packet encode/decode, and request/response against the asyncio server."""
+import threading
+from bench import common
+
+BRANCH_DIR = common.use_branch("Branch-2")
+from client import HelloClient     # noqa: E402  (Branch-2 must be on the path first)
+from packet import Packet, TYPE_DATA   # noqa: E402
+
+
+def bench_packet(sizes=(16, 4096), count: int = 200_000) -> dict:
+    """Packet.create and Packet.parse calls per second, per payload size."""
+    results = {}
+    for size in sizes:
+        msg = common.payload(size).hex()[:size]
+        pkt = Packet.create(msg, TYPE_DATA)
+        results[f"create_{size}B_ops"] = common.rate(lambda: Packet.create(msg, TYPE_DATA), count)
+        results[f"parse_{size}B_ops"] = common.rate(lambda: Packet.parse(pkt), count)
+    return results
+
+
+def bench_rps(concurrency=(1, 8, 64), requests: int = 20_000) -> dict:
+    """
+    Requests per second and latency at each concurrency, with a new
+    connection per request and with one kept-alive connection per thread.
+    """
+    results = {}
+    with common.server(BRANCH_DIR, "--async") as port:
+        for mode, keepalive in (("oneshot", False), ("keepalive", True)):
+            local = threading.local()   # HelloClient is not thread-safe: one per thread
+
+            def request():
+                if not hasattr(local, "client"):
+                    local.client = HelloClient(common.HOST, port, keepalive=keepalive)
+                local.client.send_and_receive("bench")
+
+            for c in concurrency:
+                # Fewer one-shot requests: each costs a TCP handshake
+                count = requests if keepalive else requests // 5
+                for key, value in common.load(request, count, c).items():
+                    results[f"{mode}_c{c}_{key}"] = value
+    return results
+
+
+if __name__ == "__main__":
+    common.main({"packet": bench_packet, "rps": bench_rps})
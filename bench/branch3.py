@@ -0,0 +1,77 @@
+"""Branch-3 scenarios: packet encode/decode, and file transfers over loopback through LossyRelay."""
+import os
+import statistics
+import tempfile
+import threading
+import time
+from bench import common
+
+common.use_branch("Branch-3")
+from client import UDPClient       # noqa: E402  (Branch-3 must be on the path first)
+from packet import Packet, TYPE_DATA   # noqa: E402
+from relay import LossyRelay       # noqa: E402
+from server import UDPServer       # noqa: E402
+
+
+def bench_packet(sizes=(100, 1000, 8000), count: int = 200_000) -> dict:
+    """
+    Packet.create, parse_from and pack_into calls per second per payload
+    size, and packets per second through create_many/parse_many.
+    """
+    results = {}
+    for size in sizes:
+        data = common.payload(size)
+        pkt = Packet.create(7, data, TYPE_DATA, conn_id=1)
+        buf = bytearray(len(pkt))
+        results[f"create_{size}B_ops"] = common.rate(lambda: Packet.create(7, data, TYPE_DATA, conn_id=1), count)
+        results[f"parse_from_{size}B_ops"] = common.rate(lambda: Packet.parse_from(pkt), count)
+        results[f"pack_into_{size}B_ops"] = common.rate(
+            lambda: Packet.pack_into(buf, 0, 7, data, conn_id=1), count)
+        # Batches of 256 packets
+        batch = common.payload(256 * size)
+        pkts = Packet.create_many(batch, chunk=size)
+        batches = max(1, count // 256)
+        results[f"create_many_{size}B_pps"] = 256 * common.rate(lambda: Packet.create_many(batch, chunk=size), batches)
+        results[f"parse_many_{size}B_pps"] = 256 * common.rate(lambda: Packet.parse_many(pkts), batches)
+    return results
+
+
+def bench_transfer(sizes_mb=(1, 16), loss=(0.0, 0.01, 0.05), rtt_ms=(0,), repeat: int = 3) -> dict:
+    """
+    MB/s of send_data over loopback through a LossyRelay (seeded, so every
+    run drops the same packets), per size, loss rate and round-trip time the
+    relay adds; the median of `repeat`.
+    """
+    results = {}
+    server = UDPServer(port=0, outfile=os.path.join(tempfile.mkdtemp(), "received.bin"))
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    try:
+        for size in sizes_mb:
+            data = common.payload(size * 1_000_000)
+            for rate, rtt in ((rate, rtt) for rate in loss for rtt in rtt_ms):
+                runs = []
+                for i in range(repeat):
+                    relay = LossyRelay((common.HOST, server.sock.getsockname()[1]), loss=rate, seed=i,
+                                       delay=rtt / 2000)
+                    relay.start()
+                    client = UDPClient(port=relay.port, window=64, min_rto=0.05)
+                    start = time.perf_counter()
+                    try:
+                        client.send_data(data)
+                    finally:
+                        relay.stop()
+                        client.close()
+                    runs.append(time.perf_counter() - start)
+                elapsed = statistics.median(runs)
+                name = f"{size}MB_loss{rate:g}" + (f"_rtt{rtt:g}ms" if rtt else "")
+                results[f"{name}_s"] = elapsed
+                results[f"{name}_MBps"] = size / elapsed
+    finally:
+        server.stop()
+        thread.join()
+    return results
+
+
+if __name__ == "__main__":
+    common.main({"packet": bench_packet, "transfer": bench_transfer})
@@ -0,0 +1,112 @@
+"""Helpers shared by the branch benchmark modules."""
+import contextlib
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = "127.0.0.1"
+
+
+def use_branch(branch: str) -> str:
+    """Put `Branch-N` first on the import path; returns its directory."""
+    path = os.path.join(ROOT, branch)
+    sys.path.insert(0, path)
+    return path
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def server(branch_dir: str, *args):
+    """Run a branch's `server.py` on a free port for the duration of the block."""
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, "server.py", "--port", str(port), *args],
+                            cwd=branch_dir, stdout=subprocess.DEVNULL)
+    try:
+        for _ in range(200):
+            try:
+                socket.create_connection((HOST, port)).close()
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.025)
+        yield port
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def payload(size: int, seed: int = 0) -> bytes:
+    """The same pseudo-random bytes on every run."""
+    return random.Random(seed).randbytes(size)
+
+
+def rate(fn, count: int, repeat: int = 3) -> float:
+    """Calls of `fn` per second, the best of `repeat` runs of `count` calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+def percentile(samples: list, p: float) -> float:
+    """Nearest-rank percentile of sorted `samples`."""
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+def load(request, count: int, concurrency: int) -> dict:
+    """
+    Run `count` requests split over `concurrency` threads; each thread calls
+    `request()` in a loop. Returns throughput and latency percentiles.
+    """
+    share = max(1, count // concurrency)
+    latencies = [[] for _ in range(concurrency)]
+    errors = []
+
+    def worker(out):
+        try:
+            for _ in range(share):
+                start = time.perf_counter()
+                request()
+                out.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(out,)) for out in latencies]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    samples = sorted(s for out in latencies for s in out)
+    return {
+        "rps": len(samples) / elapsed,
+        "p50_ms": 1000 * percentile(samples, 50),
+        "p99_ms": 1000 * percentile(samples, 99),
+        "max_ms": 1000 * samples[-1],
+    }
+
+
+def main(scenarios: dict):
+    """Entry point of a branch module: `python -m bench.branchN <scenario> '<json params>'`."""
+    name, params = sys.argv[1], json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+    # Branch code reports progress with print(); only the JSON goes to stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = scenarios[name](**params)
+    print(json.dumps(results))